@@ -0,0 +1,69 @@
+"""Keep a game board up to date with the move lists lichess sends."""
+
+#  NicLink-lichess is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or ( at your option ) any later version.
+#
+#  NicLink-lichess is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+from collections.abc import Callable
+
+import chess
+
+logger = logging.getLogger("nl_lichess")
+
+
+def update_board(
+    board: chess.Board,
+    moves: list[str],
+    move_list: list[str],
+    new_board: Callable[[], chess.Board],
+) -> chess.Board:
+    """bring a board up to date with the move list of a game state. Only the
+    moves that are new are made. If the moves we have are not the start of
+    the list, ie: after a takeback, the board is taken back to where they
+    agree first. If that fails, every move is made again on a new board.
+    @param: board - the game board, changed in place
+    @param: moves - the moves made on board in uci, kept up to date
+    @param: move_list - every move of the game in uci, [""] for none
+    @param: new_board - makes a board at the start of the game
+    @returns: the game board, a new one if the moves were made again
+    """
+    if move_list == [""]:
+        move_list = []
+
+    try:
+        # lichess only adds moves, so check the last one we have first
+        agreed = len(moves)
+        if len(move_list) < agreed or (moves and move_list[agreed - 1] != moves[-1]):
+            agreed = 0
+            for ours, theirs in zip(moves, move_list):
+                if ours != theirs:
+                    break
+                agreed += 1
+            logger.info(
+                "game moves diverge after move %s, taking back %s moves",
+                agreed,
+                len(moves) - agreed,
+            )
+            while len(moves) > agreed:
+                board.pop()
+                moves.pop()
+
+        for move in move_list[len(moves) :]:
+            board.push_uci(move)
+            moves.append(move)
+
+    except (IndexError, ValueError) as err:
+        logger.warning(
+            "could not follow the game moves, making them all again: %s", err
+        )
+        board = new_board()
+        moves.clear()
+        for move in move_list:
+            board.push_uci(move)
+            moves.append(move)
+
+    return board
@@ -20,6 +20,7 @@ import importlib.util
 import logging
 import logging.handlers
 import os
+import signal
 
 # sys stuff
 import sys
@@ -39,6 +40,7 @@ from serial import SerialException
 
 # NicLink shit
 from nicsoft.niclink import NicLinkManager
+from nicsoft.niclink.latency import HAS_MOVED, MOVE_SENT
 from nicsoft.niclink.nl_exceptions import (
     ExitNicLink,
     IllegalMove,
@@ -50,8 +52,11 @@ from nicsoft.niclink.nl_exceptions import (
 # external chess clock functionality
 from .chess_clock import ChessClock
 from .game import Game as LichessGame  # game is already a class
+from .game_board import update_board
 from .game_state import GameState
 from .game_start import GameStart
+from .scheduler import GameScheduler
+from .state_worker import StateWorker
 
 # === command line ===
 # parsing command line arguments
@@ -63,12 +68,27 @@ parser.add_argument("--quiet", action="store_true")
 parser.add_argument("--debug", action="store_true")
 parser.add_argument("--logging", action="store_true")
 parser.add_argument("--learning", action="store_true")
+# record the positions the board reports to a frame log, see niclink/recorder.py
+parser.add_argument(
+    "--record",
+    help="record the board positions to this file. If the board can not "
+    "notify NicLink of changes, only the positions seen when it is polled "
+    "are recorded",
+)
+# use the board over bluetooth, not usb
+parser.add_argument("--bluetooth", action="store_true")
+# send a move made on the board during the opponent's turn as soon as their
+# move comes in
+parser.add_argument("--premove", action="store_true")
 args = parser.parse_args()
 
 # === global variables ===
 global logger
 global game
 game = None
+# plays the correspondence games, if --correspondence is set
+global scheduler
+scheduler = None
 logger = logging.getLogger("nl_lichess")
 
 # the script dir, used to import the lila token file
@@ -91,6 +111,11 @@ else:
     CHESS_CLOCK = False
 logger.info("CHESS_CLOCK: %s", CHESS_CLOCK)
 
+if args.premove:
+    PREMOVE = True
+else:
+    PREMOVE = False
+
 # === constants ===
 # refresh refresh delay for NicLink and Lichess
 REFRESH_DELAY = 0.5
@@ -185,8 +210,6 @@ class Game(threading.Thread):
         global nl_inst, logger
         super().__init__(**kwargs)
 
-        # for await move to signal a move has been made
-        self.has_moved = threading.Event()
         # berserk board_client
         self.berserk_board_client = berserk_client.board
         # id of the game we are playing
@@ -199,6 +222,16 @@ class Game(threading.Thread):
 
         # the most reasontly parsed game_state, in a GameState class wrapper
         self.game_state = GameState(self.current_state["state"])
+        # handles the game states one at a time, the newest first. Cancelling
+        # it sets game_over, so a handler waiting in await_move returns. see
+        # state_worker.py
+        self.worker = StateWorker(
+            self.handle_state_change,
+            logger,
+            name=f"game {game_id} states",
+            # reset() makes a new game_over, so get it when cancelled
+            wake=lambda: nl_inst.game_over.set(),
+        )
 
         # === niclink options ===
         self.bluetooth = bluetooth
@@ -213,18 +246,21 @@ class Game(threading.Thread):
             self.chess960 = True
         else:
             nl_inst.reset()  # reset niclink for a new game
-            self.game_board = chess.Board()
             self.chess960 = False  # not 960
-            nl_inst.set_game_board(self.game_board)
+        # the game as lichess has it, kept up to date one state at a time by
+        # update_game_board(). NicLink gets copies, as it makes our moves on
+        # it's own board
+        self.game_board = self.new_game_board()
+        # the moves made on game_board, in uci
+        self.game_moves: list[str] = []
+        if not self.chess960:
+            nl_inst.set_game_board(self.game_board.copy())
 
         logger.info("game init w id: %s", game_id)
 
-        # if white, make the first move
-        if self.playing_white and self.current_state["state"]["moves"] == "":
-            self.make_first_move()
-        # if we are joining a game in progress or move second
-        else:
-            self.handle_state_change(GameState(self.current_state["state"]))
+        # make the first move if we are white, or catch up with a game in
+        # progress, once the worker is started
+        self.worker.put(self.game_state)
 
     def run(self) -> None:
         """Run the thread until game is through.
@@ -233,7 +269,7 @@ class Game(threading.Thread):
         then kill it w self.game_done()
         """
         global nl_inst, logger
-        state_change_thread = None
+        self.worker.start()
 
         for event in self.stream:
             logger.debug("event in self.stream: %s", event)
@@ -249,31 +285,12 @@ class Game(threading.Thread):
 
                 self.game_state = GameState(event)
 
-                logger.debug("state_change_thread is: %s", state_change_thread)
-                # if there is a state_change_thread
-                if state_change_thread is not None:
-
-                    # if there is another state change thread still
-                    # running running, join it
-                    # while checking for game over
-                    while state_change_thread.is_alive():
-                        if state_change_thread.is_alive():
-                            logger.debug(
-                                "trying to join state_change_thread, \
-                                it is alive."
-                            )
-                            # check that the game is not over.
-                            # Will call game_done if so.
-                            self.check_for_game_over(self.game_state)
-                            # try to join state_change_thread with
-                            # a one second time_out
-                            state_change_thread.join(timeout=REFRESH_DELAY)
-
-                # start new state change thread
-                state_change_thread = threading.Thread(
-                    target=self.handle_state_change, args=(self.game_state,)
-                )
-                state_change_thread.start()
+                # check that the game is not over, the worker may be waiting
+                # on the board. Will call game_done if so.
+                self.check_for_game_over(self.game_state)
+                # the worker handles it once it is free, a state waiting for
+                # it is stale now and is dropped
+                self.worker.put(self.game_state)
 
             elif event["type"] == "chatLine":
                 self.handle_chat_line(event)
@@ -316,6 +333,8 @@ class Game(threading.Thread):
         """
         global logger, nl_inst
         logger.info("\nGame.game_done(GameState) entered.\n GameState %s", game_state)
+        # no more states to handle
+        self.worker.cancel()
         # signal the side that won on the board by lighting up that side
         # if there is an external clock, display gameover message
         if game_state is not None:
@@ -344,51 +363,17 @@ class Game(threading.Thread):
         nl_inst.gameover_lights()
         sleep(1)
         nl_inst.turn_off_all_leds()
+        # the correspondence games can have the board back
+        release_board()
 
         # stop the thread
         raise NicLinkGameOver("Game over")
 
-    def await_move_thread(self, fetch_list: list) -> None:
-        """Await move in a way that does not stop the user from exiting.
-
-        when move is found, set it to index 0 on fetch_list in UCI.
-
-        Notes
-        -----
-        This function should be ran in it's own Thread.
-        """
-        global logger, nl_inst
-        logger.debug("\nGame.await_move_thread(...) entered\n")
-        try:
-            move = nl_inst.await_move()  # await move from e-board the move from niclink
-            logger.debug(
-                "await_move_thread(...): move from chessboard %s. setting it to index 0 of the passed list, \
-and setting moved event",
-                move,
-            )
-
-            fetch_list.insert(0, move)
-            self.has_moved.set()  # set the Event
-
-        except KeyboardInterrupt as err:
-            log_handled_exception(err)
-            print("KeyboardInterrupt: bye")
-            sys.exit(0)
-        except ResponseError as err:
-            logger.info(
-                "\nResponseError on make_move(). This causes us to just return\n\n"
-            )
-            log_handled_exception(err)
-            raise NoMove("ResponseError in Game.await_move_thread thread.")
-        else:
-            logger.info("Game.await_move_thread(...) Thread got move: %s", move)
-            raise SystemExit(
-                "exiting Game.await_move_thread thread, everything is good."
-            )
-
-    def make_move(self, move: str) -> None:
+    def make_move(self, move: str, on_game_board: bool = False) -> None:
         """Make a move in a lichess game with self.gameId.
         @param - move: UCI move string ie: e4e5
+        @param - on_game_board: the move is already made on NicLink's game
+                 board, ie: a premove
         @side_effect: talkes to lichess, sending the move
         """
         global logger, nl_inst
@@ -404,7 +389,9 @@ and setting moved event",
                 if move is None:
                     raise IllegalMove("Move is None")
                 self.berserk_board_client.make_move(self.game_id, move)
-                nl_inst.make_move_game_board(move)
+                nl_inst.latency.finish(MOVE_SENT)
+                if not on_game_board:
+                    nl_inst.make_move_game_board(move)
                 logger.debug("move sent to lichess: %s", move)
 
                 # once move has been made set
@@ -444,69 +431,54 @@ Will only try twice before calling game_done"
                 print("Illegal move")
                 break
 
-    def make_first_move(self) -> None:
-        """make the first move in a lichess game, before stream starts"""
-        global nl_inst, logger, REFRESH_DELAY
-        logger.info("making the first move in the game")
-        move = nl_inst.await_move()
-        # HACK:
-        while move is None:
-            move = nl_inst.await_move()
-            sleep(REFRESH_DELAY)
-        # make the move
-        self.make_move(move)
-
-    def get_move_from_chessboard(self, tmp_chessboard: chess.Board) -> str:
-        """get a move from the chessboard, and return it in UCI"""
-        global nl_inst, logger, REFRESH_DELAY
+    def get_move_from_chessboard(
+        self, tmp_chessboard: chess.Board | None = None
+    ) -> str:
+        """get a move from the chessboard, and return it in UCI
+        @param: tmp_chessboard - set as the NicLink game board first. If None
+                the NicLink game board is already set
+        """
+        global nl_inst, logger
         logger.debug(
             "get_move_from_chessboard() entered. Geting move from ext board.\n"
         )
 
         # set this board as NicLink game board
-        nl_inst.set_game_board(tmp_chessboard)
+        if tmp_chessboard is not None:
+            nl_inst.set_game_board(tmp_chessboard)
 
         logger.debug(
-            "NicLink set_game_board(tmp_chessboard) set. board prior to move fen %s\n fen I see external: %s\n",
-            tmp_chessboard.fen(),
+            "NicLink game board set. board prior to move fen %s\n fen I see external: %s\n",
+            nl_inst.game_board.fen(),
             nl_inst.get_fen(),
         )
-        # the move_fetch_list is for getting the move and await_move_thread in
-        # a thread is it does not block
-        move_fetch_list = []
-        get_move_thread = threading.Thread(
-            target=self.await_move_thread, args=(move_fetch_list,), daemon=True
-        )
+        # we are in the worker thread, so wait on the board right here. The
+        # stream thread sets nl_inst.game_over if the game ends meanwhile,
+        # and await_move returns None
+        move = nl_inst.await_move()
+        if move is None:
+            raise NoMove("No move in get_move_from_chessboard(...)")
 
-        get_move_thread.start()
-        # wait for a move on chessboard
-        while not nl_inst.game_over.is_set() or self.check_for_game_over(
-            # TODO: FIND MORE EFFICIENT WAY
-            GameState(self.current_state["state"])
-        ):
-            if self.has_moved.is_set():
-                move = move_fetch_list[0]
-                self.has_moved.clear()
-                return move
-            sleep(REFRESH_DELAY)
-        raise NoMove("No move in get_move_from_chessboard(...)")
-
-    def update_tmp_chessboard(self, move_list: list[str]) -> chess.Board:
-        """create a tmp chessboard with the given move list played on it."""
-        global nl_inst, logger
+        nl_inst.latency.mark(HAS_MOVED)
+        return move
+
+    def new_game_board(self) -> chess.Board:
+        """get a board at the start of this game"""
         # if there is a starting fen, use it
         if self.chess960:
-            tmp_chessboard = chess.Board(self.starting_fen)
-        else:
-            tmp_chessboard = chess.Board()
-
-        # if the move list is not empty
-        if move_list != [""]:
-            for move in move_list:
-                # make the moves on a board
-                tmp_chessboard.push_uci(move)
-
-        return tmp_chessboard
+            return chess.Board(self.starting_fen)
+        return chess.Board()
+
+    def update_game_board(self, move_list: list[str]) -> chess.Board:
+        """bring the game board up to date with the move list of a game
+        state, see game_board.update_board
+        @param: move_list - every move of the game in uci, [""] for none
+        @returns: the game board
+        """
+        self.game_board = update_board(
+            self.game_board, self.game_moves, move_list, self.new_game_board
+        )
+        return self.game_board
 
     def handle_move(self, game_state: GameState) -> None:
         """signal there was a move in game, signal the external clock
@@ -541,11 +513,11 @@ Will only try twice before calling game_done"
 
         # get all the moves of the game
         moves = game_state.get_moves()
-        # update a tmp chessboard with the current state
-        tmp_chessboard = self.update_tmp_chessboard(moves)
+        # make the new moves on the game board
+        game_board = self.update_game_board(moves)
 
         # check for game over
-        result = tmp_chessboard.outcome()
+        result = game_board.outcome()
         if result is not None:
             # set the winner var
             if result.winner is None:
@@ -568,13 +540,32 @@ Will only try twice before calling game_done"
             # stop the thread (this does some cleanup and throws an exception)
             self.game_done(game_state=game_state)
 
+        our_turn = game_board.turn == self.playing_white
+        premove = None
+        if our_turn:
+            # NicLink's game board is this one from here on, so the move
+            # detector and premove index are made once for this ply
+            nl_inst.set_game_board(game_board.copy())
+            if PREMOVE:
+                # the player may have moved while it was the opponent's turn.
+                # look before the beep and led's, they take time
+                premove = nl_inst.premove_for()
+
         # a move was made
         self.handle_move(game_state)
 
         # is it our turn?
-        if tmp_chessboard.turn == self.playing_white:
+        if our_turn:
+            if premove is not None:
+                # the premove is on the chessboard already, so NicLink's game
+                # board has it too while it is sent
+                logger.info("sending premove %s", premove)
+                nl_inst.make_move_game_board(premove)
+                self.make_move(premove, on_game_board=True)
+                return
+
             # get our move from chessboard
-            move = self.get_move_from_chessboard(tmp_chessboard)
+            move = self.get_move_from_chessboard()
 
             # make the move
             logger.debug(
@@ -624,17 +615,22 @@ def handle_game_start(game_start: GameStart, chess_clock: bool = False) -> None:
     @param chess_clock: ase we using an external chess clock?
     @global berserk_client: client made for ous session with lila
     @global game: Game class object, global bc has to be accessed everywhere
+    @global scheduler: plays the correspondence games
     """
-    global berserk_client, logger, game, nl_inst
+    global berserk_client, logger, game, nl_inst, scheduler
 
     # check if game speed is correspondence, skip if !--correspondence set
-    if not correspondence:
-        if game_start["game"]["speed"] == "correspondence":
+    if game_start["game"]["speed"] == "correspondence":
+        if scheduler is None:
             logger.info(
                 "skipping correspondence game w/ id: %s\n",
                 game_start["game"]["id"],
             )
-            return
+        else:
+            # the scheduler plays every correspondence game, on the board
+            # in turn
+            scheduler.add_game(LichessGame(game_start["game"]))
+        return
 
     # signal game start
     nl_inst.signal_lights(6)
@@ -672,13 +668,20 @@ def handle_game_start(game_start: GameStart, chess_clock: bool = False) -> None:
                 "the game thread is still alive, a new game can not be started"
             )
 
-        game = Game(
-            berserk_client,
-            game_data.id,
-            playing_white,
-            starting_fen=game_fen,
-            chess_clock=chess_clock,
-        )
+        # the correspondence games leave the board to this one, until
+        # game_done gives it back
+        lease_board()
+        try:
+            game = Game(
+                berserk_client,
+                game_data.id,
+                playing_white,
+                starting_fen=game_fen,
+                chess_clock=chess_clock,
+            )
+        except Exception:
+            release_board()
+            raise
         game.daemon = True
 
         logger.info("|| starting Game thread for game with id: %s\n", game_data.id)
@@ -693,6 +696,22 @@ def handle_game_start(game_start: GameStart, chess_clock: bool = False) -> None:
         sys.exit(0)
 
 
+def lease_board() -> None:
+    """take the board from the correspondence games for a real time one,
+    if they are played. see GameScheduler.lease_board
+    """
+    global scheduler
+    if scheduler is not None:
+        scheduler.lease_board()
+
+
+def release_board() -> None:
+    """give the board back to the correspondence games, if they are played"""
+    global scheduler
+    if scheduler is not None:
+        scheduler.release_board()
+
+
 def handle_ongoing_game(gm: LichessGame) -> None:
     """Handle joining a game that is already underway."""
     print("\n$$$ joining game in progress $$$\n")
@@ -716,9 +735,19 @@ def handle_resign(event=None) -> None:
 
 
 # entry point
+def dump_latency(signum=None, frame=None) -> None:
+    """log and print the move latency histograms. Is the SIGUSR1 handler,
+    ie: kill -USR1 <pid>
+    """
+    global nl_inst
+    summary = nl_inst.latency.summary()
+    logger.info(summary)
+    print(summary)
+
+
 def main():
     """Handle startup, and initiation of stuff."""
-    global berserk_client, nl_inst, REFRESH_DELAY, logger
+    global berserk_client, nl_inst, REFRESH_DELAY, logger, scheduler
 
     print("=== NicLink lichess main entered ===")
     simplejson_spec = importlib.util.find_spec("simplejson")
@@ -734,9 +763,18 @@ The berserk lichess client will not work with simplejson.
     try:
         # FIX-ME: I do not want any driver logging now
         # nl_inst = NicLinkManager(refresh_delay=REFRESH_DELAY, logger=logger)
-        nl_inst = NicLinkManager(refresh_delay=REFRESH_DELAY, logger=None)
+        nl_inst = NicLinkManager(
+            refresh_delay=REFRESH_DELAY, logger=None, bluetooth=args.bluetooth
+        )
         nl_inst.start()
 
+        if args.record:
+            nl_inst.start_recording(args.record)
+
+        # dump the move latency on demand. There is no SIGUSR1 on windows
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, dump_latency)
+
     except ExitNicLink:
         logger.error("ExitNicLink exception caught in main()")
         print("Thank's for using NicLink")
@@ -799,6 +837,12 @@ The berserk lichess client will not work with simplejson.
         logger.error("cannot get lichess account info: %s", e)
         print(f"cannot get lichess account info: {e}")
         sys.exit(-1)
+
+    if correspondence:
+        # follow the correspondence games, and play them when no real time
+        # game has the board leased
+        scheduler = GameScheduler(berserk_client, nl_inst, logger)
+        scheduler.start()
     try:
 
         # main program loop
@@ -821,6 +865,10 @@ The berserk lichess client will not work with simplejson.
                         logger.info("\ngameFull received\n")
                         handle_resign(event)
                         print("GAME FULL received")
+                    elif event["type"] == "gameFinish":
+                        logger.info("gameFinish received: %s", event)
+                        if scheduler is not None:
+                            scheduler.remove_game(event["game"]["id"])
 
                     # check for kill switch
                     if nl_inst.kill_switch.is_set():
@@ -0,0 +1,408 @@
+"""Play many correspondence games on one board, one after another."""
+
+#  NicLink-lichess is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or ( at your option ) any later version.
+#
+#  NicLink-lichess is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+### how it works ###
+# lichess sends a gameStart for every game when the event stream is opened,
+# and a gameFinish when one ends. Those add and remove the games followed
+# here. The event stream does not have the moves, so the position of every
+# game, and whose turn it is, is polled for all of them at once from the
+# ongoing games every CORRESPONDENCE_POLL seconds, rather than a stream per
+# game. An opponent's move is seen up to that long after it is made. The
+# scheduler takes the game we have the least time left in, shows where the
+# board differs from it until it is set up, and waits for our move. Then on
+# to the next game. Setting up the position of another game we are to move
+# in switches to that game.
+#
+# the board is leased to a real time game with lease_board(). The scheduler
+# holds the lease itself while it plays, so only one of them uses the board
+# at a time.
+
+import logging
+import threading
+import time
+
+import chess
+from berserk.exceptions import ResponseError
+
+from nicsoft.niclink import NicLinkManager
+from nicsoft.niclink.nl_exceptions import IllegalMove, NoMove
+from nicsoft.niclink.position import (
+    board_fen_from_position,
+    position_from_board,
+    position_hash,
+)
+
+from .game import Game as LichessGame
+
+# how often to get the ongoing games, in seconds
+CORRESPONDENCE_POLL = 60.0
+
+# the most ongoing games lichess gives at once
+MAX_GAMES = 50
+
+# how long to wait on the board before looking at the games again, in seconds
+BOARD_WAIT = 1.0
+
+
+class ScheduledGame:
+    """a correspondence game followed by the GameScheduler, and it's board"""
+
+    def __init__(self, game: LichessGame) -> None:
+        """follow a game
+        @param: game - the game from a gameStart, or the ongoing games
+        """
+        self.id = game.id
+        self.playing_white = game.playing_white()
+        self.board = chess.Board(game.fen)
+        # the hash of the board's position, see niclink/position.py
+        self.hash = position_hash(position_from_board(self.board))
+        self.last_move: str | None = game.lastMove or None
+        self.is_my_turn = game.is_my_turn()
+        # None if there is no clock
+        self.seconds_left: float | None = game.secondsLeft
+
+    def update(self, game: LichessGame) -> bool:
+        """bring the game up to date with the same game from lichess
+        @param: game - the game from the ongoing games
+        @returns: if the position changed
+        """
+        self.is_my_turn = game.is_my_turn()
+        self.seconds_left = game.secondsLeft
+        if game.fen == self.board.fen():
+            return False
+
+        # the board is one move behind most of the time, so make just that
+        # move if it gets us there. Else start over from the fen
+        last_move = game.lastMove or None
+        try:
+            if last_move is None:
+                raise ValueError("no last move")
+            self.board.push_uci(last_move)
+            if self.board.fen() != game.fen:
+                raise ValueError("the last move does not reach the fen")
+        except ValueError:
+            self.board = chess.Board(game.fen)
+        self.last_move = last_move
+        self.hash = position_hash(position_from_board(self.board))
+        return True
+
+    def made_move(self, move: str) -> None:
+        """we made a move in this game
+        @param: move - the move in uci
+        """
+        self.board.push_uci(move)
+        self.hash = position_hash(position_from_board(self.board))
+        self.last_move = move
+        self.is_my_turn = False
+
+    def urgency(self) -> tuple[float, str]:
+        """sort key, the game with the least time left first"""
+        if self.seconds_left is None:
+            return (float("inf"), self.id)
+        return (self.seconds_left, self.id)
+
+    def __str__(self) -> str:
+        fen = self.board.fen()
+        return f"ScheduledGame({self.id}, my turn: {self.is_my_turn}, fen: {fen})"
+
+
+class GameScheduler(threading.Thread):
+    """follow every ongoing correspondence game, and rotate the board
+    through the ones where it is our turn
+    """
+
+    def __init__(
+        self,
+        berserk_client,
+        nl_inst: NicLinkManager,
+        logger: logging.Logger,
+        poll_delay: float = CORRESPONDENCE_POLL,
+    ) -> None:
+        """make a scheduler, start() it to begin playing
+        @param: berserk_client - the lichess client
+        @param: nl_inst - the board to play on
+        @param: logger - where to log
+        @param: poll_delay - how often to get the ongoing games in seconds
+        """
+        threading.Thread.__init__(self, name="GameScheduler", daemon=True)
+
+        self.berserk_client = berserk_client
+        self.nl_inst = nl_inst
+        self.logger = logger
+        self.poll_delay = poll_delay
+
+        # held by whoever is using the board, the scheduler or a real time
+        # game. see lease_board()
+        self._board_lock = threading.Lock()
+        # set while a real time game wants the board, or has it
+        self._wanted = threading.Event()
+
+        # guards everything bellow, and is notified when the games change
+        self._cond = threading.Condition()
+        # game id -> ScheduledGame
+        self.games: dict[str, ScheduledGame] = {}
+        # the game on the board, None if there is none
+        self.current: ScheduledGame | None = None
+        # time.monotonic() of the last refresh()
+        self._refreshed = 0.0
+        self._stopped = False
+        # is the board leased to a real time game
+        self._leased = False
+
+    ### following the games ###
+    def add_game(self, game: LichessGame) -> None:
+        """follow a game, from a gameStart"""
+        with self._cond:
+            if game.id in self.games:
+                self.games[game.id].update(game)
+            else:
+                self.games[game.id] = ScheduledGame(game)
+                self.logger.info("GameScheduler: following game %s", game.id)
+            self._cond.notify_all()
+
+    def remove_game(self, game_id: str) -> None:
+        """stop following a game, ie: it is over"""
+        with self._cond:
+            if self.games.pop(game_id, None) is not None:
+                self.logger.info("GameScheduler: game %s is over", game_id)
+            self._cond.notify_all()
+
+    def refresh(self) -> None:
+        """get every ongoing correspondence game from lichess, and bring the
+        games we follow up to date. Games that are not there anymore are over
+        """
+        try:
+            ongoing = self.berserk_client.games.get_ongoing(count=MAX_GAMES)
+        except ResponseError as err:
+            self.logger.error("GameScheduler: can not get the ongoing games: %s", err)
+            return
+
+        games = [
+            LichessGame(game) for game in ongoing if game["speed"] == "correspondence"
+        ]
+        with self._cond:
+            self._refreshed = time.monotonic()
+            ids = set()
+            for game in games:
+                ids.add(game.id)
+                if game.id in self.games:
+                    self.games[game.id].update(game)
+                else:
+                    self.games[game.id] = ScheduledGame(game)
+            # lichess only gives MAX_GAMES, so only drop games if all came
+            if len(ongoing) < MAX_GAMES:
+                for game_id in set(self.games) - ids:
+                    del self.games[game_id]
+            self._cond.notify_all()
+
+    def waiting_games(self) -> list[ScheduledGame]:
+        """get the games where it is our turn, the least time left first"""
+        with self._cond:
+            waiting = [game for game in self.games.values() if game.is_my_turn]
+        return sorted(waiting, key=ScheduledGame.urgency)
+
+    def next_game(self) -> ScheduledGame | None:
+        """get the game to put on the board next, None if we are not to move
+        in any
+        """
+        waiting = self.waiting_games()
+        return waiting[0] if waiting else None
+
+    ### the board lease ###
+    def lease_board(self) -> None:
+        """take the board for a real time game. Blocks until the scheduler
+        has left it, at most BOARD_WAIT after it is asked to. Give it back
+        with release_board()
+        """
+        self._wanted.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._board_lock.acquire()
+        with self._cond:
+            self._leased = True
+        self.logger.info("GameScheduler: board leased to a real time game")
+
+    def release_board(self) -> None:
+        """give the board back after lease_board(). Does nothing if it is not
+        leased, so it can be called for every way a game ends
+        """
+        with self._cond:
+            if not self._leased:
+                return
+            self._leased = False
+            self._wanted.clear()
+            self._board_lock.release()
+            self._cond.notify_all()
+        self.logger.info("GameScheduler: board given back")
+
+    ### playing ###
+    def run(self) -> None:
+        """play the games where it is our turn, until stopped"""
+        while not self._stopped:
+            if time.monotonic() - self._refreshed >= self.poll_delay:
+                self.refresh()
+
+            game = None if self._wanted.is_set() else self.next_game()
+            if game is None or not self._board_lock.acquire(blocking=False):
+                # wait for a game to be added, the board to be given back, or
+                # the next refresh
+                with self._cond:
+                    self._cond.wait(timeout=self.poll_delay)
+                continue
+
+            try:
+                self.play(game)
+            except Exception as err:
+                self.logger.error("GameScheduler: playing %s failed: %s", game, err)
+            finally:
+                self.current = None
+                self._board_lock.release()
+
+    def stop(self) -> None:
+        """stop playing, the board is left at the next board change"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def play(self, game: ScheduledGame) -> None:
+        """put a game on the board and wait for our move in it. Setting up
+        another game we are to move in switches to that one. The scheduler
+        must hold the board
+        @param: game - a game where it is our turn
+        """
+        nl_inst = self.nl_inst
+        # not reset(), other threads wait on the Events it replaces
+        nl_inst.clear_game()
+        set_up = False
+        while game is not None:
+            self.current = game
+            nl_inst.set_game_board(game.board.copy())
+            self.logger.info(
+                "GameScheduler: your move in correspondence game %s\n%s",
+                game.id,
+                game.board,
+            )
+
+            game, set_up = self._play(game, set_up)
+
+    def _play(
+        self, game: ScheduledGame, set_up: bool
+    ) -> tuple[ScheduledGame | None, bool]:
+        """set up a game on the board, and send our move in it
+        @param: game - the game on the board
+        @param: set_up - is the board already set up for it
+        @returns: (the game to switch to, None if done, if it is set up)
+        """
+        nl_inst = self.nl_inst
+        seq = nl_inst.board_seq
+        # have we shown the opponent's last move
+        shown = False
+        while self._playing(game) and not self._wanted.is_set():
+            if not set_up:
+                set_up = self._is_set_up(game)
+                if not set_up:
+                    other = self._set_up_game()
+                    if other is not None and other is not game:
+                        return other, True
+                    seq = nl_inst.wait_for_board_change(seq, BOARD_WAIT)
+                    continue
+
+            if not shown:
+                # the board is the game now, show the opponent's last move
+                shown = True
+                if game.last_move is not None:
+                    nl_inst.opponent_moved(game.last_move)
+                nl_inst.beep()
+
+            try:
+                seq = nl_inst.board_seq
+                move = nl_inst.poll_for_move()
+            except NoMove:
+                move = None
+            except IllegalMove:
+                # the board is not a move from the game. Another game being
+                # set up, or pieces knocked over. poll_for_move shows the diff
+                other = self._set_up_game()
+                if other is not None and other is not game:
+                    return other, True
+                move = None
+
+            if move is None:
+                seq = nl_inst.wait_for_board_change(seq, BOARD_WAIT)
+                continue
+
+            # the move is not for this game if a real time game asked for the
+            # board while we read it, or the game no longer wants it
+            if self._wanted.is_set() or not self._playing(game):
+                self.logger.warning(
+                    "GameScheduler: not sending %s, %s is not on the board",
+                    move,
+                    game,
+                )
+                return None, False
+            self._send_move(game, move)
+            return None, False
+
+        return None, False
+
+    def _playing(self, game: ScheduledGame) -> bool:
+        """is a game still followed, and ours to move in"""
+        with self._cond:
+            followed = self.games.get(game.id) is game
+        return (
+            followed
+            and game.is_my_turn
+            and not self._stopped
+            and not self.nl_inst.kill_switch.is_set()
+        )
+
+    def _is_set_up(self, game: ScheduledGame) -> bool:
+        """is the board the game's position? If not show where it differs"""
+        nl_inst = self.nl_inst
+        if nl_inst.check_game_board_against_external():
+            return True
+
+        position = nl_inst.get_position()
+        if position:
+            external_board = chess.Board(None)
+            external_board.set_board_fen(board_fen_from_position(position))
+            nl_inst.show_board_diff(external_board, game.board)
+        return False
+
+    def _set_up_game(self) -> ScheduledGame | None:
+        """get the waiting game the board is set up for, if any"""
+        position = self.nl_inst.get_position()
+        if not position:
+            return None
+        board_hash = self.nl_inst.external_hash(position)
+        for game in self.waiting_games():
+            if game.hash == board_hash:
+                return game
+        return None
+
+    def _send_move(self, game: ScheduledGame, move: str) -> None:
+        """send our move in a game to lichess
+        @param: game - the game the move is in
+        @param: move - the move in uci
+        """
+        try:
+            self.berserk_client.board.make_move(game.id, move)
+        except ResponseError as err:
+            self.logger.error(
+                "GameScheduler: move %s in %s failed: %s", move, game, err
+            )
+            # find out where the game is
+            self._refreshed = 0.0
+            return
+
+        self.logger.info("GameScheduler: sent %s in %s", move, game.id)
+        # the board is the position after the move now
+        self.nl_inst.make_move_game_board(move)
+        with self._cond:
+            game.made_move(move)
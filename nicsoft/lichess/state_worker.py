@@ -0,0 +1,104 @@
+"""Handle the states of a lichess game one at a time, in one thread."""
+
+#  NicLink-lichess is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or ( at your option ) any later version.
+#
+#  NicLink-lichess is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import threading
+from collections.abc import Callable
+
+from nicsoft.niclink.nl_exceptions import NicLinkGameOver, NoMove
+
+from .game_state import GameState
+
+
+class StateWorker(threading.Thread):
+    """Call a handler with the newest GameState of a game, in it's own thread.
+
+    There is one slot for a state waiting to be handled. A state that comes in
+    while the handler is busy replaces the one waiting, so only the newest is
+    handled, and the handler is never run twice at once. cancel() stops the
+    worker when the game ends, and calls wake so a handler blocked waiting on
+    the board returns.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[GameState], None],
+        logger: logging.Logger,
+        name: str | None = None,
+        wake: Callable[[], None] | None = None,
+    ) -> None:
+        """make a worker, start() it to begin handling states
+        @param: handler - handles a state, it may block. NicLinkGameOver from
+                it stops the worker
+        @param: logger - where to log handler errors
+        @param: name - the thread name
+        @param: wake - called by cancel() to make a blocked handler return,
+                ie: set NicLinkManager.game_over, which makes await_move
+                return None
+        """
+        threading.Thread.__init__(self, name=name, daemon=True)
+
+        self.handler = handler
+        self.logger = logger
+        self.wake = wake
+
+        # guards everything bellow
+        self._cond = threading.Condition()
+        # the newest state not handled yet, None if there is none
+        self._pending: GameState | None = None
+        # how many states were replaced before they were handled
+        self.coalesced = 0
+        self.cancelled = False
+
+    def put(self, game_state: GameState) -> None:
+        """handle a state once the handler is free. This never blocks
+        @param: game_state - the newest state of the game
+        """
+        with self._cond:
+            if self.cancelled:
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+                self.logger.debug("StateWorker: dropping stale %s", self._pending)
+            self._pending = game_state
+            self._cond.notify_all()
+
+    def cancel(self) -> None:
+        """stop handling states. A handler blocked waiting is woken with
+        wake, and the state it is handling is finished first
+        """
+        with self._cond:
+            self.cancelled = True
+            self._pending = None
+            self._cond.notify_all()
+        if self.wake is not None:
+            self.wake()
+
+    def run(self) -> None:
+        """handle the newest state, until cancelled"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self.cancelled)
+                if self.cancelled:
+                    return
+                game_state, self._pending = self._pending, None
+
+            try:
+                self.handler(game_state)
+            except NicLinkGameOver:
+                self.logger.info("StateWorker: game over, stopping")
+                self.cancel()
+                return
+            except NoMove as err:
+                # the game ended, or a newer state is waiting
+                self.logger.info("StateWorker: no move for %s: %s", game_state, err)
+            except Exception as err:
+                self.logger.error(
+                    "StateWorker: handling %s failed: %s", game_state, err
+                )
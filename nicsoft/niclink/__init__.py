@@ -1,2 +1,6 @@
-from . import _niclink, driver
+from . import driver
+from .async_driver import AsyncNicLinkManager
+from .backend import BoardBackend, Capabilities
 from .driver import NicLinkManager
+from .led_frame import LedFrame
+from .simulated import SimulatedBoard
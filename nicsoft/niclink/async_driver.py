@@ -0,0 +1,203 @@
+"""An asyncio front end for the NicLink driver."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+import chess
+
+from .driver import NicLinkManager
+from .led_frame import LedFrame
+from .nl_exceptions import ExitNicLink, IllegalMove, NoMove
+
+
+class AsyncNicLinkManager:
+    """drive a NicLinkManager from an asyncio event loop. Waiting on the board
+    never blocks the loop, and cancelling a wait ends it right away.
+
+    ie:
+        board = await AsyncNicLinkManager.create(refresh_delay=2)
+        async for move in board.moves():
+            ...
+    """
+
+    def __init__(self, nl_inst: NicLinkManager) -> None:
+        """wrap a NicLinkManager. Make this in the event loop it is used in
+        @param: nl_inst - the NicLinkManager to drive. It does not need to be
+                started, and can still be used from other threads
+        """
+        self.nl_inst = nl_inst
+        self.logger = nl_inst.logger
+        self._loop = asyncio.get_running_loop()
+
+        # replaced with a new event on every board change, so every waiter
+        # on the old event wakes
+        self._board_changed = asyncio.Event()
+        nl_inst.add_board_listener(self._on_board_change)
+
+    @classmethod
+    async def create(
+        cls, refresh_delay: float, logger: logging.Logger | None = None, **kwargs
+    ) -> "AsyncNicLinkManager":
+        """connect to the board without blocking the loop, and wrap it
+        @param: refresh_delay, logger, **kwargs - see NicLinkManager
+        """
+        nl_inst = await asyncio.to_thread(
+            NicLinkManager, refresh_delay, logger, **kwargs
+        )
+        return cls(nl_inst)
+
+    async def __aenter__(self) -> "AsyncNicLinkManager":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """stop listening to the board, and disconnect from it"""
+        self.nl_inst.remove_board_listener(self._on_board_change)
+        self.nl_inst.kill_switch.set()
+        await asyncio.to_thread(self.nl_inst.disconnect)
+
+    ### board changes ###
+    def _on_board_change(self, board_seq: int) -> None:
+        """called from the board watcher thread"""
+        self._loop.call_soon_threadsafe(self._wake_waiters)
+
+    def _wake_waiters(self) -> None:
+        self._board_changed.set()
+        self._board_changed = asyncio.Event()
+
+    async def wait_for_board_change(self, seen_seq: int, timeout: float) -> int:
+        """wait for the board to change from when it was at seen_seq.
+        If NicLink is not event driven, this just sleeps for timeout
+        @param: seen_seq - the board_seq the caller last looked at
+        @param: timeout - the longest to wait in seconds
+        @returns: the current board_seq
+        """
+        if not self.nl_inst.event_driven:
+            await asyncio.sleep(timeout)
+            return self.nl_inst.board_seq
+
+        if self.nl_inst.board_seq == seen_seq:
+            try:
+                await asyncio.wait_for(self._board_changed.wait(), timeout)
+            except TimeoutError:
+                pass
+
+        return self.nl_inst.board_seq
+
+    ### moves ###
+    async def await_move(self) -> str | None:
+        """wait for a legal move on the board, see NicLinkManager.await_move.
+        The move is not made on the game board
+        @returns: the move in coordinate notation, None if the game is over
+        """
+        nl_inst = self.nl_inst
+        attempts = 0
+        while not nl_inst.kill_switch.is_set():
+            if nl_inst.game_over.is_set():
+                return None
+
+            try:
+                move = nl_inst.poll_for_move()
+            except NoMove:
+                # a move is being made, wait for the board to change
+                attempts += 1
+                self.logger.debug("NoMove from chessboard. Attempt: %s", attempts)
+                await self.wait_for_board_change(
+                    nl_inst._checked_seq, nl_inst.no_move_delay
+                )
+                continue
+            except IllegalMove as err:
+                attempts += 1
+                self.logger.error(
+                    "\nIllegal Move: %s | waiting for the board to change.\n", err
+                )
+                await self.wait_for_board_change(
+                    nl_inst._checked_seq, nl_inst.refresh_delay
+                )
+                continue
+
+            if move is not None:
+                self.logger.info(
+                    "move %s made on external board. there where %s attempts",
+                    move,
+                    attempts,
+                )
+                return move
+
+            await self.wait_for_board_change(
+                nl_inst._checked_seq, nl_inst.refresh_delay
+            )
+
+        raise ExitNicLink("in AsyncNicLinkManager.await_move(): kill_switch is set")
+
+    async def moves(self) -> AsyncIterator[str]:
+        """yield every move made on the board, until the game is over. Each
+        move is made on the game board before it is yielded
+        """
+        while True:
+            move = await self.await_move()
+            if move is None:
+                return
+            self.nl_inst.make_move_game_board(move)
+            yield move
+
+    def set_game_board(self, board: chess.Board) -> None:
+        """set the game board, see NicLinkManager.set_game_board"""
+        self.nl_inst.set_game_board(board)
+
+    def opponent_moved(self, move: str) -> None:
+        """see NicLinkManager.opponent_moved"""
+        self.nl_inst.opponent_moved(move)
+
+    ### led's and sound ###
+    async def flush_leds(self) -> None:
+        """wait for the led frames submitted so far to reach the board"""
+        await asyncio.to_thread(self.nl_inst.led_scheduler.flush)
+
+    async def set_all_leds(self, frame: LedFrame, hold: float = 0.0) -> None:
+        """show a frame on the board, and wait for it to get there
+        @param: frame - the frame to show
+        @param: hold - show it at least this long before the next frame
+        """
+        self.nl_inst.set_all_leds(frame, hold=hold)
+        await self.flush_leds()
+
+    async def set_move_leds(self, move: str) -> None:
+        """light the squares of a move, see NicLinkManager.set_move_leds"""
+        self.nl_inst.set_move_leds(move)
+        await self.flush_leds()
+
+    async def turn_off_all_leds(self) -> None:
+        """turn off all the led's on the board"""
+        self.nl_inst.turn_off_all_leds()
+        await self.flush_leds()
+
+    async def signal_lights(self, sig_num: int) -> None:
+        """show a signal on the board, see NicLinkManager.signal_lights"""
+        self.nl_inst.signal_lights(sig_num)
+        await self.flush_leds()
+
+    async def gameover_lights(self) -> None:
+        """show the game over lights"""
+        self.nl_inst.gameover_lights()
+        await self.flush_leds()
+
+    async def beep(self) -> None:
+        """make the chessboard beep"""
+        await asyncio.to_thread(self.nl_inst.beep)
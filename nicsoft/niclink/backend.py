@@ -0,0 +1,151 @@
+"""What NicLink needs from the thing it talks to the board with."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+### backends ###
+# a backend has the functions of the _niclink module. The ones in BoardBackend
+# are needed, the rest are optional and Capabilities says which it has. The
+# backends are:
+#   _niclink / _niclink.Board - the board over usb, wrapped in a UsbBackend
+#   nl_bluetooth / nl_bluetooth.BleBoard - the board over bluetooth
+#   simulated.SimulatedBoard - no board, for testing
+
+from typing import Protocol
+
+from .led_scheduler import WRITE_INTERVAL
+
+# the usb layer answers get_fen with this when it has no board
+USB_FEN_ERROR = "ERROR"
+
+# the functions a backend needs to be polled for the board's battery and
+# firmware, see telemetry.py
+TELEMETRY_FUNCTIONS = ("get_battery", "get_mcu_version", "get_ble_version")
+# and to stream the games stored on the board, see stored_games.py
+STORED_GAME_FUNCTIONS = (
+    "get_file_count",
+    "start_file",
+    "next_file_position",
+    "delete_file",
+    "realtime_mode",
+)
+
+
+class BoardBackend(Protocol):
+    """the functions every backend has"""
+
+    def connect(self) -> None:
+        """connect to the board. It may not have sent a position yet"""
+
+    def disconnect(self) -> None:
+        """disconnect from the board"""
+
+    def get_fen(self) -> str:
+        """get the board fen of the board, empty if it has not sent one"""
+
+    def set_all_leds(self, frame: bytes) -> None:
+        """write an 8 byte led frame to the board, see LedFrame"""
+
+    def lights_out(self) -> None:
+        """turn off all the led's"""
+
+    def beep(self) -> None:
+        """make the board beep"""
+
+
+class Capabilities:
+    """what a backend can do on top of BoardBackend. The driver uses it to
+    take the fastest path the backend supports. A backend can give it's own
+    as a capabilities attribute, else it is worked out from the functions
+    the backend has.
+    """
+
+    def __init__(
+        self,
+        realtime_callbacks: bool = False,
+        min_write_interval: float = WRITE_INTERVAL,
+        packed_positions: bool = False,
+        change_times: bool = False,
+        reconnects: bool = False,
+        telemetry: bool = False,
+        stored_games: bool = False,
+    ) -> None:
+        """
+        @param: realtime_callbacks - wait_for_change() blocks until the
+                board reports a new position, so the board need not be polled
+        @param: min_write_interval - the least time between led writes in
+                seconds
+        @param: packed_positions - get_position() gives the 32 packed bytes,
+                see position.py
+        @param: change_times - last_change_ns() gives when the position last
+                changed
+        @param: reconnects - the backend reconnects to the board on it's own,
+                and reconnect_count() counts it
+        @param: telemetry - the battery and firmware can be queried
+        @param: stored_games - the games stored on the board can be streamed
+        """
+        self.realtime_callbacks = realtime_callbacks
+        self.min_write_interval = min_write_interval
+        self.packed_positions = packed_positions
+        self.change_times = change_times
+        self.reconnects = reconnects
+        self.telemetry = telemetry
+        self.stored_games = stored_games
+
+    @classmethod
+    def of(cls, backend) -> "Capabilities":
+        """get the capabilities of a backend"""
+        capabilities = getattr(backend, "capabilities", None)
+        if isinstance(capabilities, Capabilities):
+            return capabilities
+
+        return cls(
+            realtime_callbacks=hasattr(backend, "wait_for_change"),
+            packed_positions=hasattr(backend, "get_position"),
+            change_times=hasattr(backend, "last_change_ns"),
+            reconnects=hasattr(backend, "reconnect_count"),
+            telemetry=all(hasattr(backend, name) for name in TELEMETRY_FUNCTIONS),
+            stored_games=all(hasattr(backend, name) for name in STORED_GAME_FUNCTIONS),
+        )
+
+    def __repr__(self) -> str:
+        flags = ", ".join(f"{name}={value!r}" for name, value in vars(self).items())
+        return f"Capabilities({flags})"
+
+
+class UsbBackend:
+    """the _niclink module, or a _niclink.Board, as a backend. The usb layer
+    answers get_fen with an error message when it has no board, this makes
+    that an empty fen like the other backends. Everything else is passed
+    through.
+    """
+
+    def __init__(self, link) -> None:
+        """
+        @param: link - the _niclink module, or a _niclink.Board
+        """
+        self.link = link
+        self.capabilities = Capabilities.of(link)
+
+    def __repr__(self) -> str:
+        return f"UsbBackend({self.link!r})"
+
+    def __getattr__(self, name: str):
+        # only called for what is not set here, ie: the _niclink functions
+        return getattr(self.link, name)
+
+    def get_fen(self) -> str:
+        fen = self.link.get_fen()
+        if fen.startswith(USB_FEN_ERROR):
+            return ""
+        return fen
@@ -19,49 +19,128 @@ import logging
 import sys
 import threading
 import time
+from collections.abc import Callable, Iterator, Sequence
 
 # pip libraries
 import chess
-import numpy as np
-import numpy.typing as npt
 
-from . import _niclink
+try:
+    from . import _niclink
+except ImportError:
+    # the native module is not built. NicLinkManager needs a backend then,
+    # ie: simulated.SimulatedBoard
+    _niclink = None
 
 # mine
+from .backend import Capabilities, UsbBackend
+from .latency import CHANGE_SEEN, HID_READ, MOVE_FOUND, LatencyTracker
+from .led_frame import CASTLING_FRAMES, MOVE_FRAMES, ZEROS, LedFrame
+from .led_scheduler import LedScheduler
+from .move_detector import IN_PROGRESS, MoveDetector, build_premove_index
+from .position import (
+    board_fen_from_position,
+    position_from_board_fen,
+    position_hash,
+    update_hash,
+)
+from .recorder import FrameRecorder
+from .stored_games import StoredGame, stored_games
+from .telemetry import TELEMETRY_INTERVAL, TelemetryPoller
 from .nl_exceptions import ExitNicLink, IllegalMove, NoMove, NoNicLinkFen
 
 ### CONSTANTS ###
-ONES = np.array(
-    [
-        "11111111",
-        "11111111",
-        "11111111",
-        "11111111",
-        "11111111",
-        "11111111",
-        "11111111",
-        "11111111",
-    ],
-    dtype=np.str_,
-)
-ZEROS = np.array(
-    [
-        "00000000",
-        "00000000",
-        "00000000",
-        "00000000",
-        "00000000",
-        "00000000",
-        "00000000",
-        "00000000",
-    ],
-    dtype=np.str_,
-)
-
-FILES = np.array(["a", "b", "c", "d", "e", "f", "g", "h"])
+# the frames shown by signal_lights(sig_num)
+SIGNALS = {
+    # signal 1 - ring of lights
+    1: LedFrame.from_led_map(
+        [
+            "11111111",
+            "10000001",
+            "10111101",
+            "10100101",
+            "10100101",
+            "10111101",
+            "10000001",
+            "11111111",
+        ]
+    ),
+    # signal 2 - black half lit up
+    2: LedFrame.from_led_map(
+        [
+            "00000000",
+            "00000000",
+            "00000000",
+            "00000000",
+            "11111111",
+            "11111111",
+            "11111111",
+            "11111111",
+        ]
+    ),
+    # signal 3 - white half lit up
+    3: LedFrame.from_led_map(
+        [
+            "11111111",
+            "11111111",
+            "11111111",
+            "11111111",
+            "00000000",
+            "00000000",
+            "00000000",
+            "00000000",
+        ]
+    ),
+    # Signal 4 - center line
+    4: LedFrame.from_led_map(
+        [
+            "11111111",
+            "00000000",
+            "00000000",
+            "11111111",
+            "11111111",
+            "00000000",
+            "00000000",
+            "11111111",
+        ]
+    ),
+    # Signal 5 - center cross
+    5: LedFrame.from_led_map(
+        [
+            "00011000",
+            "01011010",
+            "00011000",
+            "11111111",
+            "11111111",
+            "00011000",
+            "01011010",
+            "00011000",
+        ]
+    ),
+    # Signal 6 - crazy lights
+    6: LedFrame.from_led_map(
+        [
+            "11000011",
+            "11011011",
+            "00011000",
+            "01100110",
+            "01100110",
+            "00011000",
+            "11011011",
+            "11000011",
+        ]
+    ),
+}
+
+# the frame shown by gameover_lights()
+GAMEOVER_LIGHTS = SIGNALS[1]
 
 NO_MOVE_DELAY = 0.03  # I think having a logger delay makes board unresponsive
 
+# how long the board watcher blocks in the native layer before checking if it
+# should exit, in milliseconds
+BOARD_WATCH_TIMEOUT_MS = 1000
+
+# how long signal_lights shows a signal before the last move comes back
 LIGHT_THREAD_DELAY = 0.2
 
 # get a logger, should have structured the module better
@@ -78,8 +157,26 @@ class NicLinkManager(threading.Thread):
         thread_sleep_delay=1,
         bluetooth: bool = False,
         debug: bool = True,
+        event_driven: bool = True,
+        backend=None,
+        device_path: str | None = None,
+        telemetry_interval: float = TELEMETRY_INTERVAL,
     ):
-        """initialize the link to the chessboard, and set up NicLink"""
+        """initialize the link to the chessboard, and set up NicLink
+        @param: bluetooth - connect to the board over bluetooth, see
+                nl_bluetooth. Ignored if a backend is given
+        @param: event_driven - wait on board change notifications from the
+                native layer instead of polling the board for a move. Only
+                if the backend has them, see backend.Capabilities
+        @param: backend - what to talk to the board with, see backend.py.
+                _niclink if None, or pass a simulated.SimulatedBoard to run
+                without a board
+        @param: device_path - the hid path of the board to use, from
+                list_devices(). The first board found if None. Ignored if a
+                backend is given
+        @param: telemetry_interval - how often to poll the board's battery
+                and stored games in seconds, see telemetry.py
+        """
 
         # initialize the thread, as a daemon
         threading.Thread.__init__(self, daemon=True)
@@ -93,17 +190,82 @@ class NicLinkManager(threading.Thread):
         else:
             self.logger = logger
 
-        # if bluetooth:
-        #    # connect the board w bluetooth
-        #    self.nl_interface = nl_bluetooth
-        # else:
+        if backend is None and bluetooth:
+            # connect the board w bluetooth. bleak is only needed for this, so
+            # only import it now
+            from . import nl_bluetooth
+
+            backend = nl_bluetooth
         # connect with the external board usb
-        self.nl_interface = _niclink
+        if backend is None:
+            if _niclink is None:
+                raise ImportError(
+                    "the _niclink module is not built, and no backend was given"
+                )
+            if device_path is None:
+                backend = UsbBackend(_niclink)
+            else:
+                # a board of it's own, so many boards can be used at once
+                backend = UsbBackend(_niclink.Board(device_path))
+        self.nl_interface = backend
+        self.device_path = device_path
+        # what the backend can do, so we take the fastest path it has
+        self.capabilities = Capabilities.of(backend)
+        self.logger.info("backend %s: %s", backend, self.capabilities)
 
         self.refresh_delay = refresh_delay
 
         self.debug = debug
 
+        # ## board change notification ###
+        # board_seq is bumped every time the board reports a new position,
+        # and board_changed is notified when it is
+        if event_driven and not self.capabilities.realtime_callbacks:
+            self.logger.warning("the backend can not notify us, polling the board")
+            event_driven = False
+        self.event_driven = event_driven
+        self.board_seq = 0
+        self.board_changed = threading.Condition()
+        # the board_seq check_for_move last looked at
+        self._checked_seq = 0
+        # the last position got from the board and it's zobrist hash, see
+        # external_hash()
+        self._external: tuple[bytes, int] = (b"", 0)
+        # bumped every time NicLink changes or replaces the game_board, see
+        # move_detector()
+        self.game_board_version = 0
+        # called with the new board_seq from the watcher thread on a change
+        self._board_listeners: list[Callable[[int], None]] = []
+        # set every time the native layer reconnects to the board after it
+        # went away, see _resync_board()
+        self.board_reconnected = threading.Event()
+
+        # times each move from the board reading it to it being used
+        self.latency = LatencyTracker()
+
+        # records the positions the board reports, see start_recording()
+        self.recorder: FrameRecorder | None = None
+        # the last position recorded
+        self._recorded_position = b""
+        # how long to wait for the board to change after NoMove
+        if event_driven:
+            self.no_move_delay = refresh_delay
+        else:
+            self.no_move_delay = NO_MOVE_DELAY
+
+        # led frames are written to the board from the scheduler's thread, so
+        # nobody waits on the board's write interval
+        self.led_scheduler = LedScheduler(
+            self._write_leds, self.logger, self.capabilities.min_write_interval
+        )
+        self.led_scheduler.start()
+
+        # caches the battery level, firmware versions and stored game count.
+        # It only queries the board when the led's are idle
+        self.telemetry = TelemetryPoller(
+            self.nl_interface, self.led_scheduler, self.logger, telemetry_interval
+        )
+
         try:
             self.connect()
         except RuntimeError:
@@ -116,6 +278,8 @@ and turned on?"
         # set NicLink values to defaults
         self.reset()
 
+        self.telemetry.start()
+
         # IE:
         # ### Treading Events ###
         # # a way to kill the program from outside
@@ -129,6 +293,13 @@ and turned on?"
         # and such
         self.lock = threading.Lock()
 
+        if self.event_driven:
+            # wake await_move when the board changes, rather than polling
+            self.board_watcher = threading.Thread(
+                target=self._watch_board, daemon=True
+            )
+            self.board_watcher.start()
+
     def start_960(self, starting_fen: str) -> None:
         """Start a chess 960 game
 
@@ -148,6 +319,7 @@ and turned on?"
         # but change starting board to be our starting fen
         self.starting_fen = starting_fen
         self.game_board = chess.Board(self.starting_fen)
+        self.game_board_version += 1
 
         self.logger.info(
             "start_960(...): 960 game started. Initial fen: %s", self.starting_fen
@@ -180,55 +352,230 @@ and turned on?"
             "\n\n _run_game(...): game_over event set, resetting NicLink\n"
         )
 
+    def _watch_board(self) -> None:
+        """wait on board changes in the native layer, and notify
+        self.board_changed when there is one. Run's in it's own thread
+        """
+        seq = 0
+        reconnects = self._reconnect_count()
+        while not self.kill_switch.is_set():
+            # this blocks in the native layer with the GIL released
+            new_seq = self.nl_interface.wait_for_change(seq, BOARD_WATCH_TIMEOUT_MS)
+            if new_seq == seq:
+                continue
+            seq = new_seq
+
+            # a reconnect wakes us too
+            new_reconnects = self._reconnect_count()
+            if new_reconnects != reconnects:
+                reconnects = new_reconnects
+                self._resync_board()
+
+            with self.board_changed:
+                self.board_seq += 1
+                self.board_changed.notify_all()
+                board_seq = self.board_seq
+
+            for listener in list(self._board_listeners):
+                try:
+                    listener(board_seq)
+                except Exception as err:
+                    self.logger.error("board listener failed: %s", err)
+
+    def _reconnect_count(self) -> int:
+        """how many times the native layer has reconnected to the board, 0
+        if the backend does not reconnect on it's own
+        """
+        if self.capabilities.reconnects:
+            return self.nl_interface.reconnect_count()
+        return 0
+
+    def _resync_board(self) -> None:
+        """the board went away and is back. It has lost it's led's, and may
+        have been changed while it was gone. Put the led's back, and show
+        where the board differs from the game. Run's in the watcher thread
+        """
+        self.logger.warning("board reconnected, resyncing with the game board")
+        self.board_reconnected.set()
+
+        # the led's the board had go back in the next write interval
+        self.led_scheduler.repaint()
+
+        position = self.get_position()
+        if not position:
+            return
+        board_hash = self.external_hash(position)
+        if (
+            board_hash == self.move_detector().hash
+            or board_hash in self.position_index()
+        ):
+            # the board is the game, or a move was made on it while it was
+            # gone. check_for_move will find it
+            return
+
+        external_board = chess.Board()
+        external_board.set_board_fen(board_fen_from_position(position))
+        self.show_board_diff(external_board, self.game_board)
+
+    def add_board_listener(self, listener: Callable[[int], None]) -> None:
+        """call a function every time the board changes. It is called from
+        the board watcher thread, so it should be quick and thread safe
+        @param: listener - called with the new board_seq
+        """
+        self._board_listeners.append(listener)
+
+    def remove_board_listener(self, listener: Callable[[int], None]) -> None:
+        """stop calling a function added with add_board_listener"""
+        self._board_listeners.remove(listener)
+
+    def start_recording(self, path: str) -> None:
+        """record the positions the board reports to a frame log, see
+        recorder.py. When event driven every change is recorded by the board
+        watcher. When polling only the positions poll_for_move() sees are,
+        so a position the board passes through between polls is missed
+        @param: path - the log to append to
+        """
+        self.stop_recording()
+        self.recorder = FrameRecorder(path)
+        self._recorded_position = b""
+        self._record_position(self.get_position())
+        if self.event_driven:
+            self.add_board_listener(self._on_board_change_record)
+        self.logger.info("recording board positions to %s", path)
+
+    def stop_recording(self) -> None:
+        """stop recording board positions, and close the log"""
+        if self.recorder is None:
+            return
+        if self.event_driven:
+            self.remove_board_listener(self._on_board_change_record)
+        self.recorder.close()
+        self.recorder = None
+
+    def _on_board_change_record(self, board_seq: int) -> None:
+        """record the board's position, is a board listener"""
+        self._record_position(self.get_position())
+
+    def _record_position(self, position: bytes) -> None:
+        """record a position got from the board, if it is not the one
+        recorded last
+        """
+        recorder = self.recorder
+        if recorder is None or not position or position == self._recorded_position:
+            return
+        self._recorded_position = position
+
+        ns = None
+        if self.capabilities.change_times:
+            ns = self.nl_interface.last_change_ns() or None
+        recorder.record(position, ns)
+
+    def wait_for_board_change(self, seen_seq: int, timeout: float) -> int:
+        """wait for the board to change from when it was at seen_seq.
+        If NicLink is not event driven, this just sleeps for timeout
+        @param: seen_seq - the board_seq the caller last looked at
+        @param: timeout - the longest to wait in seconds
+        @returns: the current board_seq
+        """
+        if not self.event_driven:
+            time.sleep(timeout)
+            return self.board_seq
+
+        with self.board_changed:
+            self.board_changed.wait_for(
+                lambda: self.board_seq != seen_seq, timeout=timeout
+            )
+            return self.board_seq
+
     def _connect(self):
         self.nl_interface.connect()
-        time.sleep(self.thread_sleep_delay)
         test_fen = self.nl_interface.get_fen()
         self.logger.info("_connect() -> fen '%s'" % test_fen)
         return test_fen
 
-    def connect(self, bluetooth: bool = False) -> None:
-        """connect to the chessboard
-        @param: bluetooth - should we use bluetooth
+    def connect(self) -> None:
+        """connect to the chessboard, and wait for it to report a position.
+        Bluetooth or usb is picked when NicLinkManager is made
         """
 
-        if bluetooth:
-            raise NotImplementedError
-
         test_fen = self._connect()
-        # connect to the chessboard, this must be done first
+        # the backend keeps trying to connect to the board on it's own,
+        # so wait for it to report a position rather than reconnecting
+        seq = 0
         while not test_fen:
+            self.logger.info("no fen from the board yet, waiting for it.")
+            seq = self._wait_for_backend(seq)
             test_fen = self.nl_interface.get_fen()
-            if not test_fen:
-                self.logger.info("Failed to get fen, reconnecting.")
-                self.disconnect()
-                time.sleep(self.thread_sleep_delay)
-                self.connect()
-                time.sleep(self.thread_sleep_delay)
-                test_fen = self.nl_interface.get_fen()
 
         self.logger.info("Board initialized. initial fen: |%s|" % test_fen)
 
+    def _wait_for_backend(self, seq: int) -> int:
+        """wait for the backend to report a position after seq, or poll it
+        again after a while if it can not tell us
+        @returns: the backend's sequence number, 0 if it has none
+        """
+        if self.capabilities.realtime_callbacks:
+            return self.nl_interface.wait_for_change(seq, BOARD_WATCH_TIMEOUT_MS)
+        time.sleep(BOARD_WATCH_TIMEOUT_MS / 1000)
+        return seq
+
     def disconnect(self) -> None:
         """disconnect from the chessboard"""
+        # let the led's that are waiting get to the board first
+        self.led_scheduler.flush(timeout=self.thread_sleep_delay)
+        self.telemetry.stop()
+        self.stop_recording()
         self.nl_interface.disconnect()
         self.logger.info("\n-- Board disconnected --\n")
 
+    ### board telemetry, see telemetry.py ###
+    @property
+    def battery(self) -> int | None:
+        """the battery level in percent, None if it has not been got yet"""
+        return self.telemetry.battery
+
+    @property
+    def mcu_version(self) -> str | None:
+        """the version of the board's mcu firmware"""
+        return self.telemetry.mcu_version
+
+    @property
+    def ble_version(self) -> str | None:
+        """the version of the board's bluetooth firmware"""
+        return self.telemetry.ble_version
+
+    @property
+    def stored_game_count(self) -> int | None:
+        """how many games the board has stored"""
+        return self.telemetry.file_count
+
+    def stored_games(self, delete: bool = False) -> Iterator[StoredGame]:
+        """stream the games stored on the board off of it, see
+        stored_games.py. The board is in upload mode until the iterator is
+        done, so do not run this during a game
+        @param: delete - delete each game once it is read, without an ack
+        """
+        if not self.capabilities.stored_games:
+            raise ValueError("the backend can not get the games stored on the board")
+        return self._stored_games(delete)
+
+    def _stored_games(self, delete: bool) -> Iterator[StoredGame]:
+        """stream the stored games, with the telemetry poller paused so it's
+        queries do not get mixed up with the files being sent
+        """
+        self.telemetry.pause()
+        try:
+            yield from stored_games(self.nl_interface, delete)
+        finally:
+            self.telemetry.resume()
+
     def beep(self) -> None:
         """make the chessboard beep"""
         self.nl_interface.beep()
 
     def reset(self) -> None:
         """reset NicLink"""
-
-        # reset starting fen
-        self.starting_fen = None
-        # this instances game board
-        self.game_board = chess.Board()
-        # the last move the user has played
-        self.last_move = None
-        # turn off all the lights
-        self.turn_off_all_leds()
+        self.clear_game()
 
         # ## Treading Events ###
         # a way to kill the program from outside
@@ -239,6 +586,29 @@ and turned on?"
 
         self.logger.debug("NicLinkManager reset\n")
 
+    def clear_game(self) -> None:
+        """forget the game being played, for a new one. Unlike reset() the
+        threading Events are kept, so it is safe while other threads wait
+        on them
+        """
+        # reset starting fen
+        self.starting_fen = None
+        # this instances game board
+        self.game_board = chess.Board()
+        self.game_board_version += 1
+        # the last move the user has played
+        self.last_move = None
+        # follows the move being made on the external board, for the
+        # game_board position it was made for. see move_detector()
+        self._move_detector: MoveDetector | None = None
+        # what the game_board was when it was made
+        self._move_detector_key: tuple | None = None
+        # the premove index of the game_board, see premove_index()
+        self._premove_index: dict[int, str] = {}
+        self._premove_index_key: tuple | None = None
+        # turn off all the lights
+        self.turn_off_all_leds()
+
     def set_led(self, square: str, status: bool) -> None:
         """set an led at a given square to a status
         @param: square (square: a1, e4 etc)
@@ -246,26 +616,12 @@ and turned on?"
         @side_effect: changes led on chessboard
         """
 
-        # find the file number by iteration
-        found = False
-        letter = square[0]
-
-        file_num = 0
-        while file_num < 8:
-            if letter == FILES[file_num]:
-                found = True
-                break
-            file_num += 1
-
-        # find the number by straight conversion, and some math.
-        num = int(square[1]) - 1  # it's 0 based
+        # change the frame we want shown, so the led's are all set through
+        # the led scheduler. raises ValueError on a bad square
+        frame = self.led_scheduler.desired.copy()
+        frame.set_square(square, status)
 
-        if not found:
-            raise ValueError(f"{square[1]} is not a valid file")
-
-        # this is supper fd, but the chessboard internally starts counting at
-        # h8
-        self.nl_interface.set_led(7 - num, 7 - file_num, status)
+        self.set_all_leds(frame)
 
     def set_move_leds(self, move: str) -> None:
         """highlight a move. Light up the origin and destination led
@@ -275,42 +631,58 @@ and turned on?"
         """
         self.logger.info("man.set_move_leds( %s ) called\n", move)
 
-        move_led_map = build_led_map_for_move(move)
+        move_led_map = build_led_map_for_move(move, self.is_castling_move(move))
         # log led map
         self.logger.debug("move led map created. Move: %s \n map: ", move)
         log_led_map(move_led_map, self.logger)
 
         self.set_all_leds(move_led_map)
 
-    def set_all_leds(self, light_board: npt.NDArray[np.str_]) -> None:
-        """set all led's on ext. chess board
-        @param: light_board - a list of len 8 made up of
-                str of len 8 with the 1 for 0 off
+    def is_castling_move(self, move: str) -> bool:
+        """is a move a standard castle on the game_board? The move can be
+        on the game_board or about to be made on it.
+        @param: move - a move in uci
+        """
+        if move[:4] not in CASTLING_FRAMES:
+            return False
+
+        # the king is on the origin before the move, and the destination after
+        return chess.KING in (
+            self.game_board.piece_type_at(chess.parse_square(move[:2])),
+            self.game_board.piece_type_at(chess.parse_square(move[2:4])),
+        )
+
+    def set_all_leds(
+        self, light_board: LedFrame | Sequence[str], hold: float = 0.0
+    ) -> None:
+        """set all led's on ext. chess board. This does not block, the frame
+        is written by the led scheduler
+        @param: light_board - a LedFrame, or an old style led map. ie: a list
+                of len 8 made up of str of len 8 with the 1 for 0 off
                 for the led of that square
+        @param: hold - show these led's at least this long (seconds) before
+                the next set_all_leds replaces them
         """
+        if not isinstance(light_board, LedFrame):
+            light_board = LedFrame.from_led_map(light_board)
+
         self.logger.debug(
-            "set_all_leds(light_board: np.ndarray[np.str_]):  \
+            "set_all_leds(light_board: LedFrame):  \
 called with following light_board:"
         )
 
         log_led_map(light_board, self.logger)
 
-        # the pybind11 use 8 str, because it is difficult
-        # to use complex data structures between languages
-        self.nl_interface.set_all_leds(
-            str(light_board[0]),
-            str(light_board[1]),
-            str(light_board[2]),
-            str(light_board[3]),
-            str(light_board[4]),
-            str(light_board[5]),
-            str(light_board[6]),
-            str(light_board[7]),
-        )
+        self.led_scheduler.submit(light_board, hold)
+
+    def _write_leds(self, light_board: LedFrame) -> None:
+        """write a frame to the board, called from the led scheduler"""
+        # the native layer takes the frame as the 8 bytes sent to the board
+        self.nl_interface.set_all_leds(bytes(light_board))
 
     def turn_off_all_leds(self) -> None:
         """turn off all the leds"""
-        self.nl_interface.lights_out()
+        self.set_all_leds(ZEROS)
 
     def signal_lights(self, sig_num: int) -> None:
         """signal the user via displaying a set of lights on the board
@@ -323,113 +695,18 @@ called with following light_board:"
                     6 - random stuff
         @side effect - change the light's on the chess board
         """
-        if sig_num == 1:
-            # signal 1 - ring of lights
-
-            sig = np.array(
-                [
-                    "11111111",
-                    "10000001",
-                    "10111101",
-                    "10100101",
-                    "10100101",
-                    "10111101",
-                    "10000001",
-                    "11111111",
-                ],
-                dtype=np.str_,
-            )
-            self.set_all_leds(sig)
-        elif sig_num == 2:
-            # signal 2 - black half lit up
-            sig = np.array(
-                [
-                    "00000000",
-                    "00000000",
-                    "00000000",
-                    "00000000",
-                    "11111111",
-                    "11111111",
-                    "11111111",
-                    "11111111",
-                ],
-                dtype=np.str_,
-            )
-
-            self.set_all_leds(sig)
-        elif sig_num == 3:
-            # signal 3 - white half lit up
-            sig = np.array(
-                [
-                    "11111111",
-                    "11111111",
-                    "11111111",
-                    "11111111",
-                    "00000000",
-                    "00000000",
-                    "00000000",
-                    "00000000",
-                ],
-                dtype=np.str_,
-            )
-            self.set_all_leds(sig)
-        elif sig_num == 4:
-            # Signal 4 - center line
-            sig = np.array(
-                [
-                    "11111111",
-                    "00000000",
-                    "00000000",
-                    "11111111",
-                    "11111111",
-                    "00000000",
-                    "00000000",
-                    "11111111",
-                ],
-                dtype=np.str_,
-            )
-            self.set_all_leds(sig)
-        elif sig_num == 5:
-            # Signal 5 - center cross
-            sig = np.array(
-                [
-                    "00011000",
-                    "01011010",
-                    "00011000",
-                    "11111111",
-                    "11111111",
-                    "00011000",
-                    "01011010",
-                    "00011000",
-                ],
-                dtype=np.str_,
-            )
-            self.set_all_leds(sig)
-        elif sig_num == 6:
-            # Signal 6 - crazy lights
-            sig = np.array(
-                [
-                    "11000011",
-                    "11011011",
-                    "00011000",
-                    "01100110",
-                    "01100110",
-                    "00011000",
-                    "11011011",
-                    "11000011",
-                ],
-                dtype=np.str_,
-            )
-            self.set_all_leds(sig)
+        if sig_num in SIGNALS:
+            # hold the signal so the last move does not replace it right away
+            self.set_all_leds(SIGNALS[sig_num], hold=LIGHT_THREAD_DELAY)
 
         if self.last_move is not None:
-            time.sleep(LIGHT_THREAD_DELAY)
             self.set_move_leds(self.last_move)
 
     def get_fen(self) -> str:
         """get the board fen from chessboard"""
 
         fen = ""
+        seq = 0
         while not fen:
             fen = self.nl_interface.get_fen()
 
@@ -437,6 +714,34 @@ called with following light_board:"
                 return fen
             else:
                 self.logger.warning(f"falsy fen got from board. fen '%s'" % fen)
+                seq = self._wait_for_backend(seq)
+
+    def get_position(self) -> bytes:
+        """get the packed position from the chessboard, see position.py. It
+        is empty if the board has not sent a position yet
+        """
+        if self.capabilities.packed_positions:
+            return self.nl_interface.get_position()
+
+        # a board that only gives us a fen
+        fen = self.nl_interface.get_fen()
+        return position_from_board_fen(fen) if fen else b""
+
+    def external_hash(self, position: bytes) -> int:
+        """get the zobrist hash of a position got from the board. It is
+        updated from the squares that changed since the last position
+        @param: position - the packed position from get_position()
+        """
+        last_position, last_hash = self._external
+        if position is last_position or position == last_position:
+            return last_hash
+
+        if len(position) == len(last_position):
+            new_hash = update_hash(last_hash, last_position, position)
+        else:
+            new_hash = position_hash(position)
+        self._external = (position, new_hash)
+        return new_hash
 
     def put_board_fen_on_board(self, board_fen: str) -> chess.Board:
         """show just the board part of fen on asci chessboard,
@@ -455,6 +760,51 @@ called with following light_board:"
         print(tmp_board)
         return tmp_board
 
+    def move_detector(self) -> MoveDetector:
+        """get the move detector for the game_board. It is made once per ply,
+        the first time it is needed
+        """
+        key = self._game_board_key()
+        if self._move_detector is None or self._move_detector_key != key:
+            self._move_detector = MoveDetector(self.game_board)
+            self._move_detector_key = key
+            self.logger.debug(
+                "move detector made, %s positions", len(self._move_detector.index)
+            )
+
+        return self._move_detector
+
+    def _game_board_key(self) -> tuple:
+        """what the game_board is, it changes when the game_board does"""
+        # a move made on the game_board from outside NicLink changes the
+        # move stack, one made by NicLink bumps the version
+        move_stack = self.game_board.move_stack
+        return (
+            self.game_board_version,
+            id(self.game_board),
+            len(move_stack),
+            move_stack[-1] if move_stack else None,
+        )
+
+    def premove_index(self) -> dict[int, str]:
+        """get the index of positions reached by our legal replies made on
+        the board before the opponent's last move, see build_premove_index.
+        It is made once per ply, the first time it is needed
+        """
+        key = self._game_board_key()
+        if self._premove_index_key != key:
+            self._premove_index = build_premove_index(self.game_board)
+            self._premove_index_key = key
+
+        return self._premove_index
+
+    def position_index(self) -> dict[int, str]:
+        """get the index of positions reachable by a legal move on the
+        game_board.
+        @returns: dict of position hash -> move in uci, see external_hash()
+        """
+        return self.move_detector().index
+
     def find_move_from_fen_change(
         self, new_fen: str
     ) -> str:  # a move in coordinate notation
@@ -464,39 +814,55 @@ called with following light_board:"
         to parse move from
         return: the move in coordinate notation
         """
-        old_fen = self.game_board.board_fen()
-        if new_fen == old_fen:
-            self.logger.debug("no fen difference. fen was %s", old_fen)
-            raise NoMove("No fen difference")
-
-        self.logger.debug("new_fen %s", new_fen)
-        self.logger.debug("old fen %s", old_fen)
+        return self.find_move_from_position_change(position_from_board_fen(new_fen))
 
-        # get a list of the legal moves
-        legal_moves = list(self.game_board.legal_moves)
+    def find_move_from_position_change(
+        self, new_position: bytes, new_hash: int | None = None
+    ) -> str:  # a move in coordinate notation
+        """get the move that occurred to change the game_board into a given
+        packed position.
+        @param: new_position the 32 bytes of the pos. of external board
+        to parse move from
+        @param: new_hash the hash of new_position, if it is known
+        return: the move in coordinate notation
+        """
+        if new_hash is None:
+            new_hash = position_hash(new_position)
+        detector = self.move_detector()
+        if new_hash == detector.hash:
+            self.logger.debug("no position difference.")
+            raise NoMove("No fen difference")
 
-        tmp_board = self.game_board.copy()
-        self.logger.debug(
-            "+++ find_move_from_fen_change(...) called +++\n\
+        # only print the boards when debugging, this is a hot path
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("new_fen %s", board_fen_from_position(new_position))
+            self.logger.debug("old fen %s", self.game_board.board_fen())
+            self.logger.debug(
+                "+++ find_move_from_position_change(...) called +++\n\
 current board: \n%s\n board we are using to check legal moves: \n%s\n",
-            self.put_board_fen_on_board(self.get_fen()),
-            self.game_board,
-        )
-        # find move by brute force
-        for move in legal_moves:
-            # self.logger.info(move)
-            tmp_board.push(move)  # Make the move on the board
+                self.put_board_fen_on_board(board_fen_from_position(new_position)),
+                self.game_board,
+            )
 
-            # Check if the board's fen matches the new fen
-            if tmp_board.board_fen() == new_fen:
-                self.logger.info("move was found to be: %s", move)
+        # follow the move on the board, for the legal moves of this ply
+        move = detector.update_position(new_position, new_hash)
+        if move is not None:
+            self.logger.info("move was found to be: %s", move)
 
-                return move.uci()  # Return the last move
+            return move
 
-            tmp_board.pop()  # Undo the move and try another
+        if detector.state == IN_PROGRESS:
+            # a piece is in the air, or a capture or castle is half done.
+            # wait for the board to settle
+            self.logger.debug(
+                "move in progress. lifted: %s placed: %s",
+                chess.SquareSet(detector.lifted),
+                chess.SquareSet(detector.placed),
+            )
+            raise NoMove("move in progress")
 
         error_board = chess.Board()
-        error_board.set_board_fen(new_fen)
+        error_board.set_board_fen(board_fen_from_position(new_position))
         self.show_board_diff(error_board, self.game_board)
         message = f"Board we see:\n{str(error_board)}\nis not a possible  \
 result from a legal move on:\n{str(self.game_board)}\n"
@@ -504,93 +870,126 @@ result from a legal move on:\n{str(self.game_board)}\n"
         raise IllegalMove(message)
 
     def check_game_board_against_external(self) -> bool:
-        """check if the external board is a given board fen
-        @param fen: str: the fen the ext board should be
-        @returns: if the external board fen is == the fen
+        """check if the external board is the game board
+        @returns: if the external board position is == the game board's
         """
-        nl_fen = self.nl_interface.get_fen()
+        position = self.get_position()
+        if not position:
+            return False
+        return self.external_hash(position) == self.move_detector().hash
+
+    def poll_for_move(self) -> str | None:
+        """look at the external board for a move once, without waiting for
+        it to change. If there is a move update self.last_move
+        @returns: the move got from the chessboard, or None if there is none
+        @raises: NoMove if a move is still being made, IllegalMove if the
+                 board is not a legal move from the game board
+        """
+        # remember what board change we are looking at, so one that lands
+        # while we check is not missed
+        self._checked_seq = self.board_seq
+
+        # get current position on the external board
+        new_position = self.get_position()
+        seen_ns = time.monotonic_ns()
+
+        if not new_position:
+            raise NoMove("No position from chessboard")
+        if not self.event_driven:
+            # the board watcher records the changes when event driven
+            self._record_position(new_position)
+        new_hash = self.external_hash(new_position)
+
+        detector = self.move_detector()
+        # check if you just have not moved the opponent's piece
+        if new_hash == detector.previous_hash:
+            self.logger.debug(
+                "board fen is the board fen before opponent move made on  \
+                chessboard. Returning"
+            )
+            return None
+
+        if new_hash == detector.hash:
+            self.logger.debug("no change in fen.")
+            self.turn_off_all_leds()
+            return None
+
+        # a change has occurred on the chessboard
+        # check to see if the game is over
+        if self.game_over.is_set():
+            return None
 
-        return self.game_board.board_fen() == nl_fen
+        # check if the move is valid, and set last move
+        move = self.find_move_from_position_change(new_position, new_hash)
+        self._time_move(seen_ns)
+        with self.lock:
+            self.last_move = move
+            return self.last_move
+
+    def premove_for(self) -> str | None:
+        """find a move the player made on the board while it was the
+        opponent's turn, so it can be sent as soon as the opponent's move
+        lands. Does not wait, and does not change the game_board. Set the
+        game_board with the opponent's move made on it first
+        @returns: our move in uci if the board is the game_board after one of
+                  our legal moves, with or without the opponent's move made on
+                  it. None if not
+        """
+        position = self.get_position()
+        if not position:
+            return None
+        seen_ns = time.monotonic_ns()
+        board_hash = self.external_hash(position)
+
+        move = self.move_detector().index.get(board_hash)
+        if move is None:
+            move = self.premove_index().get(board_hash)
+        if move is None:
+            return None
+
+        self.logger.info("premove found: %s", move)
+        self._time_move(seen_ns)
+        with self.lock:
+            self.last_move = move
+        return move
+
+    def _time_move(self, seen_ns: int) -> None:
+        """start timing a move that was just found
+        @param: seen_ns - when the position it was found from was got
+        """
+        if self.capabilities.change_times:
+            self.latency.start(HID_READ, self.nl_interface.last_change_ns())
+            self.latency.mark(CHANGE_SEEN, seen_ns)
+        else:
+            self.latency.start(CHANGE_SEEN, seen_ns)
+        self.latency.mark(MOVE_FOUND)
 
     def check_for_move(self) -> bool | str:
         """check if there has been a move on the chessboard, and see if
-        is is valid. If so update self.last_move
+        is is valid. If so update self.last_move. Waits for the board to
+        change, at most refresh_delay, when there is no move
         @returns: self.last_move - the move got from the chessboard
         """
-        # ensure the move was valid
-
-        # get current fen on the external board
-        new_fen = self.nl_interface.get_fen()
-
-        if new_fen is None:
-            raise ValueError("No fen from chessboard")
         try:
-            # will cause an index error if game_board has no moves
-            last_move = self.game_board.pop()
-
-            # check if you just have not moved the opponent's piece
-            if new_fen == self.game_board.board_fen():
-                self.logger.debug(
-                    "board fen is the board fen before opponent move made on  \
-                    chessboard. Returning"
-                )
-                self.game_board.push(last_move)
-                time.sleep(self.refresh_delay)
-                return False
-
-            self.game_board.push(last_move)
-        except IndexError:
-            last_move = False  # if it is an empty list of moves
-
-        if new_fen != self.game_board.board_fen:
-            # a change has occurred on the chessboard
-            # check to see if the game is over
-            if self.game_over.is_set():
-                return False
-
-            # check if the move is valid, and set last move
-            try:
-                self.last_move = self.find_move_from_fen_change(new_fen)
-            except IllegalMove as err:
-                log_handled_exception(err)
-                self.logger.warning(
-                    "\n===== move not valid, undue it and try again.  \
+            move = self.poll_for_move()
+        except IllegalMove as err:
+            log_handled_exception(err)
+            self.logger.warning(
+                "\n===== move not valid, undue it and try again.  \
 it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
-                    self.game_board.turn,
-                    self.game_board,
-                )
-                try:
-                    # show the board diff from what we are checking for legal
-                    # moves
-                    self.logger.info(
-                        "diff from board we are checking legal moves on:\n"
-                    )
-                    current_board = chess.Board(new_fen)
-                    self.show_board_diff(current_board, self.game_board)
-                    # pause for the refresh_delay and allow other threads to
-                    # run
-
-                    time.sleep(self.refresh_delay)
-                    return False
-
-                except ValueError as err:
-                    self.logger.info("value error: %s", err)
-                    log_handled_exception(err)
-                    time.sleep(self.refresh_delay)
-                    return False
-
-            # return the move
-            with self.lock:
-                return self.last_move
-
-        else:
-            self.logger.debug("no change in fen.")
-            self.turn_off_all_leds()
-            # pause for a refresher
-            time.sleep(self.refresh_delay)
+                self.game_board.turn,
+                self.game_board,
+            )
+            move = None
 
+        if move is None:
+            if not self.game_over.is_set():
+                # pause until the board changes, or for a refresh
+                self.wait_for_board_change(self._checked_seq, self.refresh_delay)
             return False
 
+        return move
+
     def await_move(self) -> str | None:
         """wait for legal move, and return it in coordinate notation after
         making it on internal board
@@ -624,10 +1023,10 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
                 continue
 
             except NoMove:
-                # no move made, wait refresh_delay and continue
+                # no move made, wait for the board to change and continue
                 attempts += 1
                 self.logger.debug("NoMove from chessboard. Attempt: %s", attempts)
-                time.sleep(NO_MOVE_DELAY)
+                self.wait_for_board_change(self._checked_seq, self.no_move_delay)
 
                 continue
 
@@ -635,12 +1034,12 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
                 # IllegalMove made, waiting then trying again
                 attempts += 1
                 self.logger.error(
-                    "\nIllegal Move: %s | waiting NO_MOVE_DELAY= %s and"
+                    "\nIllegal Move: %s | waiting no_move_delay= %s and"
                     + " checking again.\n",
                     err,
-                    NO_MOVE_DELAY,
+                    self.no_move_delay,
                 )
-                time.sleep(NO_MOVE_DELAY)
+                self.wait_for_board_change(self._checked_seq, self.no_move_delay)
                 continue
 
         # exit Niclink
@@ -666,6 +1065,7 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
         """
         self.logger.info("move made on game board. move %s", move)
         self.game_board.push_uci(move)
+        self.game_board_version += 1
         self.logger.debug(
             "made move on internal  nl game board, BOARD POST MOVE:\n%s",
             self.game_board,
@@ -681,6 +1081,7 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
     def set_game_board_fen(self, fen: str) -> None:
         """set the internal game board fen"""
         self.set_board_fen(self.game_board, fen)
+        self.game_board_version += 1
 
     def show_fen_on_board(self, fen: str) -> chess.Board:
         """print a fen on on a chessboard
@@ -707,10 +1108,11 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
         """
         with self.lock:
             self.game_board = board
+            self.game_board_version += 1
 
     def gameover_lights(self) -> None:
         """show some fireworks"""
-        self.nl_interface.gameover_lights()
+        self.set_all_leds(GAMEOVER_LIGHTS)
 
     def square_in_last_move(self, square: str) -> bool:
         """is the square in the last move?
@@ -743,35 +1145,26 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
         # for building the diff array that work's for the way we set led's
         diff_squares = []  # what squares are the diff's on
 
-        diff_map = np.copy(ZEROS)
+        diff_map = ZEROS.copy()
 
-        for n in range(0, 8):
-            # handle diff's for a file
-            for a in range(ord("a"), ord("h")):
+        for py_square in chess.SQUARES:
+            if board1.piece_at(py_square) != board2.piece_at(py_square):
                 # get the square in algebraic notation form
-                square = chr(a) + str(n + 1)  # real life is not 0 based
-                py_square = chess.parse_square(square)
-                if board1.piece_at(py_square) != board2.piece_at(py_square):
-                    # record the diff in diff array, while
-                    # keeping the last move lit up
-                    if not self.square_in_last_move(square):
-                        diff = True
-                        self.logger.info(
-                            """man.show_board_diff(...): Diff found at \
-                            square %s""",
-                            square,
-                        )
-
-                    # add square to list off diff squares
-                    diff_cords = square_cords(square)
-                    diff_squares.append(square)
-
-                    row = str(diff_map[diff_cords[1]])
-
-                    diff_map[diff_cords[1]] = (
-                        row[: diff_cords[0]] + "1" + row[diff_cords[0] + 1 :]
+                square = chess.square_name(py_square)
+                # record the diff in diff array, while
+                # keeping the last move lit up
+                if not self.square_in_last_move(square):
+                    diff = True
+                    self.logger.info(
+                        """man.show_board_diff(...): Diff found at \
+                        square %s""",
+                        square,
                     )
 
+                # add square to list off diff squares
+                diff_squares.append(square)
+                diff_map.set_square(py_square)
+
         if diff:
             # set all the led's that differ
             self.set_all_leds(diff_map)
@@ -847,33 +1240,35 @@ it is white's turn? %s =====\n board we are using to check for moves:\n%s\n",
         self.set_move_leds(move)
 
 
-# === helper functions ===
-def square_cords(square) -> tuple[int, int]:
-    """find coordinates for a given square on the chess board. (0, 0)
-    is a1.
-    @params: square - std algebraic square, ie b3, a8
-    @returns: tuple of the (x, y) coord of the square (0 based) (file, rank)
-    """
-    rank = int(square[1]) - 1  # it's 0 based
-
-    # find the file number by iteration
-    found = False
-    letter = square[0]
-    file_num = 0
-    while file_num < 8:
-        if letter == FILES[file_num]:
-            found = True
-            break
-        file_num += 1
+def list_devices() -> list[str]:
+    """get the hid paths of every chessboard plugged in"""
+    if _niclink is None:
+        raise ImportError("the _niclink module is not built")
+    return _niclink.list_devices()
 
-    if not found:
-        raise ValueError(f"{square[0]} is not a valid file")
 
-    return (file_num, rank)
+def connect_all(
+    refresh_delay: float, logger: logging.Logger | None = None, **kwargs
+) -> dict[str, NicLinkManager]:
+    """connect to every chessboard plugged in, each with a NicLinkManager
+    of it's own
+    @param: refresh_delay, logger, **kwargs - see NicLinkManager
+    @returns: hid path -> the NicLinkManager for the board at it
+    """
+    return {
+        path: NicLinkManager(refresh_delay, logger, device_path=path, **kwargs)
+        for path in list_devices()
+    }
 
 
-def log_led_map(led_map: npt.NDArray[np.str_], loggr) -> None:
+# === helper functions ===
+def log_led_map(led_map: LedFrame | Sequence[str], loggr) -> None:
     """log led map pretty 8th file to the top"""
+    if not loggr.isEnabledFor(logging.DEBUG):
+        return
+    if isinstance(led_map, LedFrame):
+        led_map = led_map.rows()
+
     loggr.debug("\nLOG LED map:\n")
     loggr.debug(str(led_map[7]))
     loggr.debug(str(led_map[6]))
@@ -885,46 +1280,20 @@ def log_led_map(led_map: npt.NDArray[np.str_], loggr) -> None:
     loggr.debug(str(led_map[0]))
 
 
-def build_led_map_for_move(move: str) -> npt.NDArray[np.str_]:
-    """build the led_map for a given uci move
+def build_led_map_for_move(move: str, castling: bool = False) -> LedFrame:
+    """get the led_map for a given uci move. It is looked up in the
+    precomputed frames, so copy() it before changing it
     @param: move - move in uci
-    @return: constructed led_map
+    @param: castling - the move is a castle, light the rook's squares too
+    @return: the led_map
     """
-    zeros = "00000000"
-    logger.debug("build_led_map_for_move(%s)", move)
-
-    led_map = np.copy(ZEROS)
-
-    # get the square cords and the coordinates
-    s1 = move[:2]
-    s2 = move[2:]
-    s1_cords = square_cords(s1)
-    s2_cords = square_cords(s2)
-
-    # if they are not on the same rank
-    if s1_cords[1] != s2_cords[1]:
-        # set 1st square
-        led_map[s1_cords[1]] = zeros[: s1_cords[0]] + "1" + zeros[s1_cords[0] :]
-        logger.debug("map after 1st move cord (cord): %s", s1_cords)
-        log_led_map(led_map, logger)
-        # set second square
-        led_map[s2_cords[1]] = zeros[: s2_cords[0]] + "1" + zeros[s2_cords[0] :]
-        logger.debug("led map made for move: %s\n", move)
-        log_led_map(led_map, logger)
-    # if they are on the same rank
-    else:
-        rank = list(zeros)
-        rank[s1_cords[0]] = "1"
-        rank[s2_cords[0]] = "1"
-
-        logger.debug("led rank computed: %s", rank)
-
-        rank_str = "".join(rank)
-
-        # insert into led_map as numpy string
-        led_map[s1_cords[1]] = np.str_(rank_str)
+    if castling and move[:4] in CASTLING_FRAMES:
+        return CASTLING_FRAMES[move[:4]]
 
-    return led_map
+    try:
+        return MOVE_FRAMES[move[:4]]
+    except KeyError:
+        raise ValueError(f"{move} is not a valid uci move")
 
 
 # ==== logger setup ====
@@ -0,0 +1,135 @@
+"""Where the time goes between a piece landing and the move being sent."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import threading
+import time
+
+### the stages of a move, in order ###
+# the native read thread got the position that completed the move
+HID_READ = "hid_read"
+# check_for_move saw the new position
+CHANGE_SEEN = "change_seen"
+# the move was found from the position
+MOVE_FOUND = "move_found"
+# await_move returned the move to the lichess game
+HAS_MOVED = "has_moved"
+# the move was sent to lichess, make_move returned
+MOVE_SENT = "move_sent"
+
+STAGES = (HID_READ, CHANGE_SEEN, MOVE_FOUND, HAS_MOVED, MOVE_SENT)
+
+# the first stage to the last stage of a move
+TOTAL = "total"
+
+# buckets in a histogram. Bucket n counts latencies of less than 2**n us
+BUCKETS = 40
+
+
+class LatencyTracker:
+    """time each move through the stages in STAGES, and keep a log2
+    histogram of the latency from each stage to the next.
+    Times are time.monotonic_ns(), which is the clock the native layer uses.
+    """
+
+    def __init__(self) -> None:
+        # guards everything bellow, stages are marked from many threads
+        self._lock = threading.Lock()
+        # stage -> ns, for the move being timed
+        self._marks: dict[str, int] = {}
+        # "stage -> next stage" or TOTAL -> counts for each bucket
+        self.histograms: dict[str, list[int]] = {}
+        # same keys -> the largest latency seen, in us
+        self.max_us: dict[str, int] = {}
+
+    def start(self, stage: str, ns: int | None = None) -> None:
+        """start timing a new move. The move that was being timed is recorded
+        with the stages it got to
+        @param: stage - the first stage of the move
+        @param: ns - when the stage happened, now if None
+        """
+        with self._lock:
+            self._record()
+            self._marks = {stage: time.monotonic_ns() if ns is None else ns}
+
+    def mark(self, stage: str, ns: int | None = None) -> None:
+        """mark a stage of the move being timed. Ignored if no move is being
+        timed
+        @param: stage - the stage the move got to
+        @param: ns - when it happened, now if None
+        """
+        with self._lock:
+            if self._marks:
+                self._marks[stage] = time.monotonic_ns() if ns is None else ns
+
+    def finish(self, stage: str | None = None) -> None:
+        """record the move being timed
+        @param: stage - mark this last stage first, if given
+        """
+        if stage is not None:
+            self.mark(stage)
+        with self._lock:
+            self._record()
+
+    def _record(self) -> None:
+        """add the move being timed to the histograms. Call with _lock held"""
+        marks = [
+            (stage, self._marks[stage]) for stage in STAGES if stage in self._marks
+        ]
+        self._marks = {}
+        if len(marks) < 2:
+            return
+
+        for (stage, start), (next_stage, end) in zip(marks, marks[1:]):
+            self._add(f"{stage} -> {next_stage}", end - start)
+        self._add(TOTAL, marks[-1][1] - marks[0][1])
+
+    def _add(self, key: str, ns: int) -> None:
+        us = max(ns, 0) // 1000
+        histogram = self.histograms.setdefault(key, [0] * BUCKETS)
+        histogram[min(us.bit_length(), BUCKETS - 1)] += 1
+        self.max_us[key] = max(self.max_us.get(key, 0), us)
+
+    def summary(self) -> str:
+        """get the histograms as text, one line a stage. pNN are the upper
+        bound of the bucket the percentile falls in
+        """
+        lines = ["move latency (us):"]
+        with self._lock:
+            for key, histogram in self.histograms.items():
+                count = sum(histogram)
+                percentiles = " ".join(
+                    f"p{percentile}<{_percentile(histogram, count, percentile)}"
+                    for percentile in (50, 90, 99)
+                )
+                lines.append(f"  {key}: n={count} {percentiles} max={self.max_us[key]}")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """forget every move timed so far"""
+        with self._lock:
+            self._marks = {}
+            self.histograms = {}
+            self.max_us = {}
+
+
+def _percentile(histogram: list[int], count: int, percentile: int) -> int:
+    """the upper bound of the bucket a percentile falls in, in us"""
+    target = count * percentile / 100
+    seen = 0
+    for bucket, bucket_count in enumerate(histogram):
+        seen += bucket_count
+        if seen >= target:
+            return 1 << bucket
+    return 1 << (len(histogram) - 1)
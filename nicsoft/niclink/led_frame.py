@@ -0,0 +1,165 @@
+"""A frame of the 64 LED's on a ChessNut air, packed into 8 bytes."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+from collections.abc import Iterable, Sequence
+
+import chess
+
+# all 64 led's on
+ALL_BITS = (1 << 64) - 1
+
+
+def _square_bit(square: chess.Square) -> int:
+    """the bit for a square in a frame. The frame is big endian, rank 8 is the
+    first byte and in each byte the a file is the high bit. This is the order
+    the board takes them in.
+    """
+    return 1 << (chess.square_rank(square) * 8 + 7 - chess.square_file(square))
+
+
+# square -> bit in a frame
+SQUARE_BITS = [_square_bit(square) for square in chess.SQUARES]
+
+
+def parse_square(square: chess.Square | str) -> chess.Square:
+    """get a python-chess square from a square name (ie: e4) or a square"""
+    if isinstance(square, str):
+        return chess.parse_square(square[:2])
+    return square
+
+
+class LedFrame:
+    """the state of all the led's on the board. Treat the frames shared by
+    NicLink (ie: ZEROS) as constants, and copy() them before changing them.
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: int = 0) -> None:
+        """make a frame
+        @param: bits - 64 bit int, see _square_bit for the layout
+        """
+        self.bits = bits & ALL_BITS
+
+    @classmethod
+    def from_squares(cls, squares: Iterable[chess.Square | str]) -> "LedFrame":
+        """make a frame with the given squares lit
+        @param: squares - squares as names (ie: e4) or python-chess squares
+        """
+        bits = 0
+        for square in squares:
+            bits |= SQUARE_BITS[parse_square(square)]
+        return cls(bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LedFrame":
+        """make a frame from the 8 bytes sent to the board"""
+        if len(data) != 8:
+            raise ValueError(f"a led frame is 8 bytes, got {len(data)}")
+        return cls(int.from_bytes(data, "big"))
+
+    @classmethod
+    def from_led_map(cls, led_map: Sequence[str]) -> "LedFrame":
+        """make a frame from an old style led map
+        @param: led_map - 8 str of len 8, index 0 is rank 1 and the first
+                char in each is the a file. "1" is on
+        """
+        bits = 0
+        for rank, row in enumerate(led_map):
+            bits |= int(str(row), 2) << (rank * 8)
+        return cls(bits)
+
+    def copy(self) -> "LedFrame":
+        """get a copy of this frame"""
+        return LedFrame(self.bits)
+
+    def set_square(self, square: chess.Square | str, status: bool = True) -> None:
+        """set the led for a square
+        @param: square - the square name (ie: e4) or python-chess square
+        @param: status - True for on, False for off
+        """
+        if status:
+            self.bits |= SQUARE_BITS[parse_square(square)]
+        else:
+            self.bits &= ~SQUARE_BITS[parse_square(square)]
+
+    def clear_square(self, square: chess.Square | str) -> None:
+        """turn the led off for a square"""
+        self.set_square(square, False)
+
+    def is_lit(self, square: chess.Square | str) -> bool:
+        """is the led for a square on?"""
+        return bool(self.bits & SQUARE_BITS[parse_square(square)])
+
+    def lit_squares(self) -> list[chess.Square]:
+        """get the squares that are lit in this frame"""
+        return [square for square in chess.SQUARES if self.bits & SQUARE_BITS[square]]
+
+    def rows(self) -> list[str]:
+        """get this frame as an old style led map, index 0 is rank 1"""
+        return [format((self.bits >> (rank * 8)) & 0xFF, "08b") for rank in range(8)]
+
+    def __bytes__(self) -> bytes:
+        return self.bits.to_bytes(8, "big")
+
+    def __or__(self, other: "LedFrame") -> "LedFrame":
+        return LedFrame(self.bits | other.bits)
+
+    def __and__(self, other: "LedFrame") -> "LedFrame":
+        return LedFrame(self.bits & other.bits)
+
+    def __xor__(self, other: "LedFrame") -> "LedFrame":
+        return LedFrame(self.bits ^ other.bits)
+
+    def __invert__(self) -> "LedFrame":
+        return LedFrame(~self.bits)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LedFrame):
+            return NotImplemented
+        return self.bits == other.bits
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
+
+    def __str__(self) -> str:
+        """the frame with rank 8 at the top"""
+        return "\n".join(reversed(self.rows()))
+
+    def __repr__(self) -> str:
+        return f"LedFrame(0x{self.bits:016x})"
+
+
+# all the led's off and on
+ZEROS = LedFrame()
+ONES = LedFrame(ALL_BITS)
+
+# uci move (ie: e2e4) -> frame with the origin and destination lit, for every
+# pair of squares
+MOVE_FRAMES = {
+    chess.SQUARE_NAMES[origin] + chess.SQUARE_NAMES[destination]: LedFrame(
+        SQUARE_BITS[origin] | SQUARE_BITS[destination]
+    )
+    for origin in chess.SQUARES
+    for destination in chess.SQUARES
+}
+
+# the king move of a castle -> frame with the rook's squares lit as well
+CASTLING_FRAMES = {
+    "e1g1": LedFrame.from_squares(("e1", "g1", "h1", "f1")),
+    "e1c1": LedFrame.from_squares(("e1", "c1", "a1", "d1")),
+    "e8g8": LedFrame.from_squares(("e8", "g8", "h8", "f8")),
+    "e8c8": LedFrame.from_squares(("e8", "c8", "a8", "d8")),
+}
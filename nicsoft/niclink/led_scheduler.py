@@ -0,0 +1,171 @@
+"""Send LED frames to the board without making callers wait on it."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+from .led_frame import LedFrame
+
+# the board only takes a write every 200 ms, see WRITE_INTERVAL in EasyLink.cpp
+WRITE_INTERVAL = 0.2
+
+
+class LedScheduler(threading.Thread):
+    """write LedFrames to the board in it's own thread. Only the newest frame
+    is kept, frames that are superseded before they are written are dropped,
+    and there is at most one write per write_interval.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[LedFrame], None],
+        logger: logging.Logger,
+        write_interval: float = WRITE_INTERVAL,
+    ) -> None:
+        """make a scheduler, start() it to begin writing
+        @param: write - writes a frame to the board, may block
+        @param: logger - where to log write errors
+        @param: write_interval - the least time between writes in seconds
+        """
+        threading.Thread.__init__(self, daemon=True)
+
+        self.write = write
+        self.logger = logger
+        self.write_interval = write_interval
+
+        # guards everything bellow
+        self._cond = threading.Condition()
+        # frames waiting to be written, as (frame, hold). A newer frame
+        # replaces the waiting frames that have no hold
+        self._pending: list[tuple[LedFrame, float]] = []
+        # the last frame written to the board
+        self.current: LedFrame | None = None
+        # the last frame submitted
+        self.desired = LedFrame()
+        # are we writing to the board right now
+        self._writing = False
+        # time.monotonic() the last write finished
+        self._last_write = 0.0
+        self._stopped = False
+
+    def submit(self, frame: LedFrame, hold: float = 0.0) -> None:
+        """show a frame on the board as soon as the write interval allows.
+        This never blocks.
+        @param: frame - the frame to show
+        @param: hold - show the frame at least this long before the next,
+                a frame with a hold is never dropped
+        """
+        with self._cond:
+            # drop the waiting frames nobody needs to see
+            while self._pending and not self._pending[-1][1]:
+                self._pending.pop()
+
+            self._pending.append((frame, hold))
+            self.desired = frame
+            self._cond.notify_all()
+
+    def repaint(self) -> None:
+        """write the desired frame again, even if the board should be showing
+        it. ie: after the board reconnects and has lost it's led's
+        """
+        with self._cond:
+            self.current = None
+        self.submit(self.desired)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """wait for all the submitted frames to be written
+        @param: timeout - the longest to wait in seconds, None is forever
+        @returns: if every frame was written
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._writing, timeout=timeout
+            )
+
+    def wait_idle(self, quiet: float, timeout: float | None = None) -> bool:
+        """wait for the scheduler to have nothing to write, and to have
+        written nothing for quiet seconds. For other writes to the board
+        that should not hold up a frame
+        @param: quiet - how long there must have been no write, in seconds
+        @param: timeout - the longest to wait in seconds, None is forever
+        @returns: if the scheduler is idle, False if we timed out or it stopped
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._stopped:
+                delay = None
+                if not self._pending and not self._writing:
+                    delay = self._last_write + quiet - time.monotonic()
+                    if delay <= 0:
+                        return True
+
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    delay = remaining if delay is None else min(delay, remaining)
+
+                self._cond.wait(delay)
+
+            return False
+
+    def stop(self) -> None:
+        """stop the scheduler thread, frames not written are dropped"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def run(self) -> None:
+        """write the frames as they come in"""
+        # when the board will take the next write
+        next_write = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopped)
+
+                # wait out the write interval. frames submitted while we wait
+                # replace the one we would have written
+                delay = next_write - time.monotonic()
+                while delay > 0 and not self._stopped:
+                    self._cond.wait(delay)
+                    delay = next_write - time.monotonic()
+
+                if self._stopped:
+                    return
+
+                frame, hold = self._pending.pop(0)
+                if frame == self.current and not hold:
+                    # the board is already showing it
+                    self._cond.notify_all()
+                    continue
+
+                self._writing = True
+
+            written = False
+            try:
+                self.write(frame)
+                written = True
+            except Exception as err:
+                self.logger.error("LedScheduler: failed to write frame: %s", err)
+
+            with self._cond:
+                if written:
+                    self.current = frame
+                self._writing = False
+                self._last_write = time.monotonic()
+                next_write = self._last_write + max(self.write_interval, hold)
+                self._cond.notify_all()
@@ -0,0 +1,218 @@
+"""Work out the move being made on the board, one board change at a time."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import chess
+
+from .position import (
+    changed_squares,
+    position_from_board,
+    position_from_board_fen,
+    position_hash,
+    square_key,
+)
+
+### detector states ###
+# the board is the game board
+SETTLED = "settled"
+# squares have changed, and a legal move could still be on the way
+IN_PROGRESS = "in progress"
+# the board is the game board after a legal move
+MOVED = "moved"
+# no legal move can explain the board
+ILLEGAL = "illegal"
+
+
+def build_position_index(
+    board: chess.Board, base_hash: int | None = None
+) -> tuple[dict[int, str], list[int]]:
+    """map the hash of the packed position reached by each legal move on a
+    board to that move. Each hash is made from the board's hash by changing
+    only the keys of the squares the move touches, see position.py
+    @param: board - the board to index the legal moves of
+    @param: base_hash - the hash of the board's position, if it is known
+    @returns: (index, touched) - dict of position hash -> move in uci, and
+              the mask of squares each legal move touches
+    """
+    if base_hash is None:
+        base_hash = position_hash(position_from_board(board))
+
+    index = {}
+    touched = []
+    tmp_board = board.copy(stack=False)
+    for move in tmp_board.legal_moves:
+        mask = touched_squares(tmp_board, move)
+        touched.append(mask)
+
+        move_hash = base_hash
+        squares = list(chess.scan_forward(mask))
+        for square in squares:
+            move_hash ^= square_key(square, _symbol(tmp_board, square))
+        tmp_board.push(move)
+        for square in squares:
+            move_hash ^= square_key(square, _symbol(tmp_board, square))
+        tmp_board.pop()
+
+        # every legal move reaches a different position, promotions to
+        # different pieces included. keep the first move if that ever changes
+        index.setdefault(move_hash, move.uci())
+
+    return index, touched
+
+
+def build_premove_index(board: chess.Board) -> dict[int, str]:
+    """map the hash of the position reached by making each of our legal
+    replies on the board before the opponent's last move was made on it, to
+    that reply. ie: the player moved while it was the opponent's turn, and
+    has not made the opponent's move on the board yet. Replies that touch the
+    squares of the opponent's move need it on the board, and are left out
+    @param: board - the game board with the opponent's move made on it
+    @returns: dict of position hash -> move in uci, empty if the board has no
+              moves
+    """
+    if not board.move_stack:
+        return {}
+    before = board.copy(stack=1)
+    opponent_touched = touched_squares(before, before.pop())
+    base_hash = position_hash(position_from_board(before))
+
+    index = {}
+    tmp_board = board.copy(stack=False)
+    for move in tmp_board.legal_moves:
+        mask = touched_squares(tmp_board, move)
+        if mask & opponent_touched:
+            continue
+
+        move_hash = base_hash
+        squares = list(chess.scan_forward(mask))
+        for square in squares:
+            move_hash ^= square_key(square, _symbol(before, square))
+        tmp_board.push(move)
+        for square in squares:
+            move_hash ^= square_key(square, _symbol(tmp_board, square))
+        tmp_board.pop()
+
+        index.setdefault(move_hash, move.uci())
+
+    return index
+
+
+def _symbol(board: chess.BaseBoard, square: chess.Square) -> str | None:
+    """get the symbol of the piece on a square, None if it is empty"""
+    piece = board.piece_at(square)
+    return piece.symbol() if piece else None
+
+
+def touched_squares(board: chess.Board, move: chess.Move) -> int:
+    """get a mask of the squares a move changes on the board
+    @param: board - the board before the move
+    @param: move - a legal move on board
+    @returns: int with bit n set if square n changes
+    """
+    mask = chess.BB_SQUARES[move.from_square] | chess.BB_SQUARES[move.to_square]
+    if board.is_castling(move):
+        # the king ends on the g or c file, and the rook on the f or d file.
+        # the rook starts in the corner, or on the destination in 960
+        rank = chess.square_rank(move.from_square)
+        if board.is_kingside_castling(move):
+            files = (6, 5, 7)  # g, f and h
+        else:
+            files = (2, 3, 0)  # c, d and a
+        for file in files:
+            mask |= chess.BB_SQUARES[chess.square(file, rank)]
+    elif board.is_en_passant(move):
+        # the captured pawn is behind the destination
+        captured = chess.square(
+            chess.square_file(move.to_square), chess.square_rank(move.from_square)
+        )
+        mask |= chess.BB_SQUARES[captured]
+
+    return mask
+
+
+class MoveDetector:
+    """follow a move being made on the external board for one ply of the
+    game board. A capture or castle goes through board positions that are
+    not a legal move (the piece lifted, two pieces missing and so on). The
+    detector keeps track of which squares were lifted and placed, and only
+    calls the board illegal when no legal move can be made of them.
+    """
+
+    def __init__(self, board: chess.Board) -> None:
+        """get ready to detect a move on a board
+        @param: board - the game board, it is not changed
+        """
+        # the packed position of the game board, see position.py, and it's
+        # hash
+        self.position = position_from_board(board)
+        self.hash = position_hash(self.position)
+        # position hash -> uci for every legal move, and the mask of the
+        # squares each legal move touches
+        self.index, self.touched = build_position_index(board, self.hash)
+
+        # the hash of the position before the last move, None at the start of
+        # the game
+        self.previous_hash: int | None = None
+        if board.move_stack:
+            tmp_board = board.copy(stack=1)
+            tmp_board.pop()
+            self.previous_hash = position_hash(position_from_board(tmp_board))
+
+        self.state = SETTLED
+        # masks of the squares that are empty now, and the squares that have
+        # a different piece now
+        self.lifted = 0
+        self.placed = 0
+
+    def update(self, new_fen: str) -> str | None:
+        """look at a new board fen from the external board
+        @param: new_fen - the board fen on the external board
+        @returns: see update_position
+        """
+        return self.update_position(position_from_board_fen(new_fen))
+
+    def update_position(
+        self, new_position: bytes, new_hash: int | None = None
+    ) -> str | None:
+        """look at a new packed position from the external board
+        @param: new_position - the 32 bytes from the board
+        @param: new_hash - the hash of new_position, if it is known
+        @returns: the move in uci if the board is the game board after a legal
+                  move, None if not. see self.state for why not
+        """
+        if new_hash is None:
+            new_hash = position_hash(new_position)
+
+        if new_hash == self.hash:
+            self.state = SETTLED
+            self.lifted = self.placed = 0
+            return None
+
+        move = self.index.get(new_hash)
+        if move is not None:
+            self.state = MOVED
+            return move
+
+        # find what squares have changed
+        self.lifted, self.placed = changed_squares(self.position, new_position)
+
+        # is there a legal move that touches all the changed squares?
+        changed = self.lifted | self.placed
+        for touched in self.touched:
+            if changed & ~touched == 0:
+                self.state = IN_PROGRESS
+                return None
+
+        self.state = ILLEGAL
+        return None
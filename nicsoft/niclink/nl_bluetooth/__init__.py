@@ -5,235 +5,325 @@
 # You should have received a copy of the GNU General Public License along
 # with NicLink. If not, see <https://www.gnu.org/licenses/>.
 
+""" A api for getting the FEN etc. from the board with bluetooth. It has the
+functions of the _niclink module, so it can be the backend of a
+NicLinkManager """
+
 import asyncio
+import logging
+import threading
+import time
 
+import chess
 from bleak import BleakClient
 
-from .constants import (INITIALIZASION_CODE, MASKLOW, READCONFIRMATION,
-                        READDATA, WRITECHARACTERISTICS, convertDict)
+from ..driver import GAMEOVER_LIGHTS
+from ..led_frame import LedFrame
+from ..position import POSITION_SIZE, board_fen_from_position
+from .constants import (
+    BEEP_CODE,
+    HEAD_BUFFER,
+    INITIALIZASION_CODE,
+    LED_CODE,
+    READDATA,
+    UPLOAD_MODE_CODE,
+    WRITECHARACTERISTICS,
+)
 from .discovery import GetChessnutAirDevices
-""" A api for getting the FEN etc. from the board with bluetooth """
-currentFEN = None
-oldData = None
-CLIENT = None
-# the values for specifying the square in rowan led
-ROW_SQUARE_VALUES = [128, 64, 32, 16, 8, 4, 2, 1]
 
-# keeps track of what led's are on.
-led = bytearray([0x0A, 0x08, 0x1, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+logger = logging.getLogger(__name__)
 
+# how long to scan for the board, in seconds
+SCAN_TIMEOUT = 10.0
 
-def connect() -> None:  # -> bool:
-    """try to connect to the board over bluetooth"""
-    connect = GetChessnutAirDevices()
-    # get device
-    asyncio.run(connect.discover())
-    # connect to device
-    asyncio.run(run(connect))
+# how long to wait before trying to reconnect to a board that went away, in
+# seconds
+RECONNECT_DELAY = 1.0
 
+# how long connect() waits for the board to send it's first position, in
+# seconds
+FIRST_POSITION_TIMEOUT = 5.0
 
-def disconnect():
-    """disscoiiect from the chessboard"""
-    print("BLUETOOTH DISCONECT. WHY WOULD I cALL THIS?")
 
+class BleBoard:
+    """a ChessNut air over bluetooth. bleak is asyncio, so the board is run
+    from an event loop in a thread of it's own, and the calls here hand their
+    work to it. Positions come in as notifications, like the read thread in
+    EasyLink.cpp.
+    """
 
-def beep():
-    """make the chessboard beep"""
-    print("BEEP")
+    def __init__(self, address: str | None = None) -> None:
+        """make a board, connect() to it to use it
+        @param: address - the bluetooth address of the board, the first
+                ChessNut air found if None
+        """
+        self.address = address
+
+        # the one event loop the client lives in
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="nl_bluetooth", daemon=True
+        )
+        self._thread.start()
+
+        self._client: BleakClient | None = None
+        # should we reconnect when the board goes away
+        self._reconnect = False
+
+        # guards everything bellow, and is notified when the position changes
+        self._cond = threading.Condition()
+        # the current position, as the 32 packed bytes the board sends
+        self.position = b""
+        # bumped every time the board reports a new position, or reconnects
+        self.seq = 0
+        # time.monotonic_ns() of the last change
+        self.change_ns = 0
+        # bumped every time we reconnect to the board
+        self.reconnects = 0
+
+        # the last led frame written, for set_led() and reconnecting. Guarded
+        # by _cond
+        self.frame = LedFrame()
+
+    def _run(self, coro, timeout: float | None = None):
+        """run a coroutine in the event loop, and wait for it's result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    ### connecting ###
+    async def _connect(self) -> None:
+        """find the board, connect to it and start the notifications"""
+        address = self.address
+        if address is None:
+            devices = GetChessnutAirDevices()
+            device = await devices.discover(SCAN_TIMEOUT)
+            if device is None:
+                raise RuntimeError("No chessnut Air devices found")
+            address = device.address
+            # find the same board again when reconnecting
+            self.address = address
+
+        client = BleakClient(address, disconnected_callback=self._on_disconnect)
+        await client.connect()
+        self._client = client
+
+        await client.start_notify(READDATA, self._on_notification)
+        # real time mode, the board sends the position on every change
+        await client.write_gatt_char(WRITECHARACTERISTICS, INITIALIZASION_CODE)
+        logger.info("connected to %s over bluetooth", address)
+
+    def _on_disconnect(self, client: BleakClient) -> None:
+        """called by bleak in the event loop when the board goes away"""
+        if self._reconnect:
+            logger.warning("bluetooth board went away, reconnecting")
+            self._loop.create_task(self._reconnect_board())
+
+    async def _reconnect_board(self) -> None:
+        """keep trying to connect to the board, until we do or are told to
+        stop
+        """
+        while self._reconnect:
+            try:
+                await self._connect()
+            except Exception as err:
+                logger.info("bluetooth reconnect failed: %s", err)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
 
+            # put the led's back, they went out with the board
+            with self._cond:
+                frame = self.frame
+            await self._write(LED_CODE + bytes(frame))
+            with self._cond:
+                self.reconnects += 1
+                self.seq += 1
+                self._cond.notify_all()
+            return
+
+    def _on_notification(self, characteristic, data: bytearray) -> None:
+        """called by bleak in the event loop for every report from the board.
+        Reports come in fast, so this only compares the raw bytes, the fen is
+        made when it is asked for
+        """
+        if len(data) < POSITION_SIZE + 2 or not data.startswith(HEAD_BUFFER):
+            return
+        position = bytes(memoryview(data)[2 : POSITION_SIZE + 2])
+        # the board reports the same position over and over, only a new
+        # position is a change. Only this thread sets it, so no lock is needed
+        # to check
+        if position == self.position:
+            return
+
+        with self._cond:
+            self.position = position
+            self.seq += 1
+            self.change_ns = time.monotonic_ns()
+            self._cond.notify_all()
+
+    async def _write(self, data: bytes) -> None:
+        """write a command to the board"""
+        if self._client is None or not self._client.is_connected:
+            logger.warning("bluetooth board is not connected, dropping a write")
+            return
+        await self._client.write_gatt_char(WRITECHARACTERISTICS, data)
+
+    ### the _niclink functions ###
+    def connect(self) -> None:
+        """connect to the board, and wait for it to send a position. If it
+        does not in FIRST_POSITION_TIMEOUT get_fen() is empty until it does
+        """
+        self._reconnect = True
+        self._run(self._connect())
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self.position, timeout=FIRST_POSITION_TIMEOUT
+            ):
+                logger.warning("the bluetooth board has not sent a position yet")
+
+    def disconnect(self) -> None:
+        self._reconnect = False
+        if self._client is not None:
+            self._run(self._client.disconnect())
+            self._client = None
+
+    def upload_mode(self) -> bool:
+        self._run(self._write(UPLOAD_MODE_CODE))
+        return True
+
+    def realtime_mode(self) -> bool:
+        self._run(self._write(INITIALIZASION_CODE))
+        return True
+
+    def get_fen(self) -> str:
+        with self._cond:
+            position = self.position
+        return board_fen_from_position(position) if position else ""
+
+    def get_position(self) -> bytes:
+        with self._cond:
+            return self.position
+
+    def last_change_ns(self) -> int:
+        with self._cond:
+            return self.change_ns
+
+    def reconnect_count(self) -> int:
+        with self._cond:
+            return self.reconnects
+
+    def wait_for_change(self, seq: int, timeout_ms: int) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != seq, timeout=timeout_ms / 1000)
+            return self.seq
+
+    def set_led(self, x: int, y: int, status: bool) -> None:
+        # x is the rank from 8, and y the bit in it, bit 7 is the a file. As
+        # in ChessLink::setLed
+        with self._cond:
+            frame = self.frame.copy()
+            frame.set_square(chess.square(7 - y, 7 - x), status)
+        self._write_frame(frame)
+
+    def set_all_leds(self, *frame: bytes | str) -> None:
+        if len(frame) == 1:
+            self._write_frame(LedFrame.from_bytes(frame[0]))
+        else:
+            # 8 str, rank 1 first
+            self._write_frame(LedFrame.from_led_map(frame))
+
+    def lights_out(self) -> None:
+        self._write_frame(LedFrame())
+
+    def gameover_lights(self) -> None:
+        self._write_frame(GAMEOVER_LIGHTS)
+
+    def beep(self) -> None:
+        self._run(self._write(BEEP_CODE))
 
-def get_FEN() -> str | None:
-    """get the FEN from the chessboard over bluetooth"""
-    print("BLUETOOTH get fen")
-    return currentFEN
+    def _write_frame(self, frame: LedFrame) -> None:
+        with self._cond:
+            self.frame = frame
+        self._run(self._write(LED_CODE + bytes(frame)))
 
 
-def lightsOut():
-    """turn off all the chessboard lights"""
-    print("lights out bt")
-    led = bytearray(
-        [0x0A, 0x08, 0x1, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
-    # send the led bytearray with all zero for last 8 bytes
-    CLIENT.write_gatt_char(WRITECHARACTERISTICS, led)
+# the board the module functions use, made when it is first needed
+_board: BleBoard | None = None
 
 
-def set_led(x, y, status) -> None:
-    """set a led on the chessboard"""
-    set_bit(led, y, status)
+def board() -> BleBoard:
+    """get the board the module functions use"""
+    global _board
+    if _board is None:
+        _board = BleBoard()
+    return _board
 
-    CLIENT.write_gatt_char(WRITECHARACTERISTICS, led)
 
+def connect() -> None:
+    """find the first ChessNut air, and connect to it over bluetooth"""
+    board().connect()
 
-def set_all_leds(ln1, ln2, ln3, ln4, ln5, ln6, ln7, ln8):
-    raise NotImplemented
 
+def disconnect() -> None:
+    """disconnect from the chessboard"""
+    board().disconnect()
 
-def updateFEN(data):
-    """update the currentFEN
-        first two bytes should be 0x01 0x24.
-        The next 32 bytes specify the position.
 
-        Each square has a value specifying the piece:
-    Value 0 1 2 3 4 5 6 7 8 9 A B C
-    Piece . q k b p n R P r B N Q K
+def upload_mode() -> bool:
+    """switch to upload mode"""
+    return board().upload_mode()
 
-            q k b p n R P r B N Q K
 
-    Each of the 32 bytes represents two squares with the order being the squares labelled
-    H8,G8,F8...C1,B1,A1. Within each byte the lower 4 bits represent the first square and the
-    higher 4 bits represent the second square. This means that if the 32 bits were written out in
-    normal hex characters the pairs would actually appear reversed.
-    For example, the 32 bytes for the normal starting position with black on the 7th and 8th ranks
-    would be shown as:
-    58 23 31 85 44 44 44 44 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00
-    00 77 77 77 77 A6 C9 9B 6A
-    So the first byte's value of 0x58 means a black rook (0x8) on H8 and a black knight (0x5) on
-    G8 and the second byte's value of 0x23 means a black bishop (0x3) on F8 and a black king (0x2)
-    on E8.
-    """
-    chessboard = [8]
-    for col_num in range(0, 8):
-        empty = 0  # a value for setting empty part's of the fen
-        row = reversed(data[col_num * 4:col_num * 4 + 4])
-        print(row)
-        # chessboard[col_num] = row
-        byte_num = 0
-        convertedRow = []
-        for b in row:
-            breakpoint()
-            if b >> 4 == 0:
-                empty += 1
-                breakpoint()
-                continue
-            convertedRow[byte_num] = (convertDict[b >> 4],
-                                      convertDict[b & MASKLOW])
-            byte_num += 1
-
-        chessboard[col_num] = convertedRow
-    print(chessboard)
-
-
-def set_bit(v, index, x):
-    """Set the index:th bit of v to 1 if x is truthy,
-    else to 0, and return the new value."""
-    mask = 1 << index  # Compute mask, an integer with just bit 'index' set.
-    v &= ~mask  # Clear the bit indicated by the mask (if x is False)
-    if x:
-        v |= mask  # If x was True, set the bit indicated by the mask.
-    return v  # Return the result, we're done.
-
-
-def printBoard(data):
-    """Print the board in a human readable format.
-        first two bytes should be 0x01 0x24.
-        The next 32 bytes specify the position.
-
-        Each square has a value specifying the piece:
-    Value 0 1 2 3 4 5 6 7 8 9 A B C
-    Piece . q k b p n R P r B N Q K
-
-            q k b p n R P r B N Q K
-
-    Each of the 32 bytes represents two squares with the order being the squares labelled
-    H8,G8,F8...C1,B1,A1. Within each byte the lower 4 bits represent the first square and the
-    higher 4 bits represent the second square. This means that if the 32 bits were written out in
-    normal hex characters the pairs would actually appear reversed.
-    For example, the 32 bytes for the normal starting position with black on the 7th and 8th ranks
-    would be shown as:
-    58 23 31 85 44 44 44 44 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00
-    00 77 77 77 77 A6 C9 9B 6A
-    So the first byte's value of 0x58 means a black rook (0x8) on H8 and a black knight (0x5) on
-    G8 and the second byte's value of 0x23 means a black bishop (0x3) on F8 and a black king (0x2)
-    on E8.
-    """
-    for counterColum in range(0, 8):
-        print(8 - counterColum, " ", end=" ")
-        row = reversed(data[counterColum * 4:counterColum * 4 + 4])
-        for b in row:
-            print(convertDict[b >> 4], convertDict[b & MASKLOW], end=" ")
-        print("")
-    print("    a b c d e f g h\n\n")
-
-
-async def leds(data):
-    """Switch on all non empty squares.
-        The other data sent to the board controls the leds. There are two control bytes and 8 data
-    bytes:
-    0x0A 0x08 <R8> <R7> <R6> <R5> <R4> <R3> <R2> <R1>
-    where the 8 bytes represent the leds with one byte for each row of the board. The first byte
-    is for the row furthest away (labelled A8..H8).
-    For each byte the value is determined by whether the led for each square needs to be on
-    or off. If the square is off then it will have a value of 0 and if it needs to be on then the value
-    will be based on the square position in the row, with values being:
-    128 64 32 16 8 4 2 1
-    The values for all the squares in the row are added together, meaning the maximum value of
-    the byte is 255 which would occur if all of the leds in the row were turned on. So to show
-    the move E2-E4 (with the board in the normal, non-flipped position) the ten bytes (including
-    the controls) would be:
-    0A 08 00 00 00 00 08 00 08 00
-    To turn off all leds you just send the 10 bytes with the last 8 bytes all as zero values
-    """
+def realtime_mode() -> bool:
+    """switch to real time mode"""
+    return board().realtime_mode()
+
+
+def get_fen() -> str:
+    """get the board fen from the chessboard, empty if it has not sent one"""
+    return board().get_fen()
+
+
+def get_position() -> bytes:
+    """get the 32 packed bytes of the position, see position.py"""
+    return board().get_position()
 
-    led = bytearray(
-        [0x0A, 0x08, 0x1, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
-    for counterColum in range(0, 8):
-        row = data[counterColum * 4:counterColum * 4 + 4]
-        for counter, b in enumerate(row):
-            v = led[counterColum + 2]
-            n1 = convertDict[b & MASKLOW]
-            if n1.isalnum():
-                v = set_bit(v, counter * 2, 1)
-                led[counterColum + 2] = v
-            n2 = convertDict[b >> 4]
-            if n2.isalnum():
-                v = set_bit(v, counter * 2 + 1, 1)
-                led[counterColum + 2] = v
-
-    await CLIENT.write_gatt_char(WRITECHARACTERISTICS, led)
-
-
-async def run(connect, debug=False):
-    """Connect to the device and run the notification handler.
-    then read the data from the device. after 100 seconds stop the notification handler.
+
+def last_change_ns() -> int:
+    """get time.monotonic_ns() of the last position change"""
+    return board().last_change_ns()
+
+
+def reconnect_count() -> int:
+    """get how many times the board has been reconnected to"""
+    return board().reconnect_count()
+
+
+def wait_for_change(seq: int, timeout_ms: int) -> int:
+    """block until the position changes from the one at seq, or timeout_ms
+    passes. Returns the current sequence number
     """
-    print("device.adress: ", connect.device.address)
-
-    async def notification_handler(characteristic, data):
-        """Handle the notification from the device and print the board."""
-        global oldData
-        # print("data: ", ''.join('{:02x}'.format(x) for x in data))
-        if data[2:34] != oldData:
-            # printBoard(data[2:34])
-            updateFEN(data[2:34])
-            await leds(data[2:34])
-            oldData = data[2:34].copy()
-
-    global CLIENT
-    async with BleakClient(connect.device) as client:
-        # TODO: this global variable is a derty trick
-        CLIENT = client
-        print(f"Connected: {client.is_connected}")
-        # send initialisation string
-        await client.start_notify(READDATA, notification_handler
-                                  )  # start the notification handler
-        await client.write_gatt_char(WRITECHARACTERISTICS, INITIALIZASION_CODE
-                                     )  # send initialisation string
-        await asyncio.sleep(100.0)  # wait 100 seconds
-        await client.stop_notify(READDATA)  # stop the notification handler
+    return board().wait_for_change(seq, timeout_ms)
 
 
-def gameover_lights() -> None:
-    """just to remind me"""
-    raise NotImplemented
+def set_led(x: int, y: int, status: bool) -> None:
+    """set a led on the chessboard"""
+    board().set_led(x, y, status)
 
 
-def lights_out():
-    raise NotImplemented
+def set_all_leds(*frame: bytes | str) -> None:
+    """set all the led's from an 8 byte frame, or 8 str rank 1 first"""
+    board().set_all_leds(*frame)
 
 
-if __name__ == "__main__":
-    c = GetChessnutAirDevices()
-    # get device
-    asyncio.run(c.discover())
-    # connect to device
-    asyncio.run(run(c))
+def lights_out() -> None:
+    """turn off all the chessboard lights"""
+    board().lights_out()
+
+
+def gameover_lights() -> None:
+    """show the game over lights"""
+    board().gameover_lights()
+
+
+def beep() -> None:
+    """make the chessboard beep"""
+    board().beep()
@@ -3,6 +3,13 @@
 # When the board is first connected it is necessary to send it a three
 # byte initialisation code:
 INITIALIZASION_CODE = b"\x21\x01\x00"
+# it switches the board to real time mode, this switches it to upload mode:
+UPLOAD_MODE_CODE = b"\x21\x01\x01"
+# the led's are set with these two bytes, then a byte a rank from rank 8. The
+# a file is the high bit, as in a LedFrame
+LED_CODE = b"\x0a\x08"
+# beep at 1000 hz for 200 ms, as ChessLink::beep does
+BEEP_CODE = b"\x0b\x04\x03\xe8\x00\xc8"
 # The board will then send back a three byte confirmation code:
 CONFIRMATION_CHARACTERISTICS = b"\x21\x01\x00"
 # The signals from the board consist of a sequence of 38 bytes. The first
@@ -2,11 +2,7 @@
 See pdf file Chessnut_comunications.pdf
 for more information."""
 
-import asyncio
-import logging
-
-
-from bleak import BleakScanner, BleakClient
+from bleak import BleakScanner
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
 
@@ -32,20 +28,23 @@ class GetChessnutAirDevices:
         """Callback for each discovered device.
         return True if the device name is in the list of
         valid device names otherwise it returns False"""
-        if any(ext in device.name for ext in self.deviceNameList):
+        if device.name and any(ext in device.name for ext in self.deviceNameList):
             self.device = device
             return True
         else:
             return False
 
-    async def discover(self, timeout=10.0):
-        """Scan for chessnut Air devices"""
+    async def discover(self, timeout=10.0) -> BLEDevice | None:
+        """Scan for chessnut Air devices
+        @returns: the first device found, None if there is none
+        """
         print("scanning, please wait...")
-        await BleakScanner.find_device_by_filter(self.filter_by_name)
+        await BleakScanner.find_device_by_filter(self.filter_by_name, timeout=timeout)
         if self.device is None:
             print("No chessnut Air devices found")
-            return
+            return None
         print("done scanning")
+        return self.device
 
 
 # if __name__ == "__main__":
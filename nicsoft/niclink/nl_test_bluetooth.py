@@ -5,6 +5,9 @@
 # You should have received a copy of the GNU General Public License along
 # with NicLink. If not, see <https://www.gnu.org/licenses/>.
 
-import nl_bluetooth
+from niclink import nl_bluetooth
 
 nl_bluetooth.connect()
+print(nl_bluetooth.get_fen())
+nl_bluetooth.beep()
+nl_bluetooth.disconnect()
@@ -0,0 +1,329 @@
+"""Rebuild the moves and pgn of games from the board fens the board stored."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+### the board fens file format ###
+# one board fen a line, a blank line between games. Lines starting with # are
+# skipped. ie: what write_board_fens() writes for stored_games.StoredGame's
+
+import argparse
+import sys
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.pgn
+
+from .move_detector import ILLEGAL, MOVED, MoveDetector
+from .position import position_from_board_fen
+
+# how many plies to search for a position when the ones between were missed
+LOOKAHEAD = 3
+
+# the most squares one ply can change, a castle changes 4
+SQUARES_PER_PLY = 4
+
+# the pieces of both colours, for comparing boards
+PIECES = [
+    (piece_type, color) for piece_type in chess.PIECE_TYPES for color in chess.COLORS
+]
+
+
+def search_ahead(
+    board: chess.Board,
+    target: chess.BaseBoard,
+    lookahead: int = LOOKAHEAD,
+    accept: Callable[[chess.Board], bool] | None = None,
+) -> list[chess.Move] | None:
+    """find the moves that take a board to a position, for when the
+    positions between were missed
+    @param: board - the board to search from, it is not changed
+    @param: target - the position to find
+    @param: lookahead - the most plies to search
+    @param: accept - if given, only a board at target it returns True for
+            is found. ie: one the next position can be reached from
+    @returns: the fewest legal moves that reach target, None if none do
+    """
+    tmp_board = board.copy(stack=False)
+    for depth in range(1, lookahead + 1):
+        moves: list[chess.Move] = []
+        if _search(tmp_board, target, depth, moves, set(), accept):
+            return moves
+    return None
+
+
+def _search(
+    board: chess.Board,
+    target: chess.BaseBoard,
+    depth: int,
+    moves: list[chess.Move],
+    seen: set[tuple],
+    accept: Callable[[chess.Board], bool] | None,
+) -> bool:
+    """depth first search for target, exactly depth plies from board"""
+    diff = 0
+    for piece_type, color in PIECES:
+        diff |= board.pieces_mask(piece_type, color) ^ target.pieces_mask(
+            piece_type, color
+        )
+    if depth == 0:
+        return diff == 0 and (accept is None or accept(board))
+    # too many squares differ to fix in the plies left
+    if chess.popcount(diff) > SQUARES_PER_PLY * depth:
+        return False
+
+    # the moves to a position can differ in the en passant and castling
+    # rights they leave, so those are part of the key
+    key = (
+        board.board_fen(),
+        board.turn,
+        board.castling_rights,
+        board.ep_square,
+        depth,
+    )
+    if key in seen:
+        return False
+    seen.add(key)
+
+    for move in board.legal_moves:
+        board.push(move)
+        moves.append(move)
+        found = _search(board, target, depth - 1, moves, seen, accept)
+        board.pop()
+        if found:
+            return True
+        moves.pop()
+    return False
+
+
+def rebuild_moves(
+    board_fens: Iterable[str], board: chess.Board, lookahead: int = LOOKAHEAD
+) -> int:
+    """work out the moves that made a sequence of board fens, and make them
+    on a board. Each fen is looked at like find_move_from_fen_change does:
+    a repeated fen or a move half made is passed over, a fen a legal move
+    away is that move. A fen that is neither is searched for lookahead plies
+    ahead, in case the fens between were missed
+    @param: board_fens - the board fens of the game, in order
+    @param: board - the board the game starts from, the moves are made on it
+    @param: lookahead - the most plies to search for a fen
+    @returns: how many fens could not be made into a move, and were skipped
+    """
+    skipped = 0
+    detector = MoveDetector(board)
+    # (how many moves were searched for, the fen searched for) for the last
+    # fen, if it's moves were searched for
+    searched: tuple[int, chess.BaseBoard] | None = None
+    for board_fen in board_fens:
+        move = detector.update_position(position_from_board_fen(board_fen))
+        if detector.state == MOVED:
+            board.push_uci(move)
+            searched = None
+        elif detector.state == ILLEGAL:
+            target = chess.BaseBoard(board_fen)
+            moves = search_ahead(board, target, lookahead)
+            if moves is None and searched is not None:
+                moves = _search_again(board, searched, target, lookahead)
+            if moves is None:
+                skipped += 1
+                continue
+            for found in moves:
+                board.push(found)
+            searched = (len(moves), target)
+        else:
+            # the same fen again, or a move being made
+            continue
+        detector = MoveDetector(board)
+
+    return skipped
+
+
+def _search_again(
+    board: chess.Board,
+    searched: tuple[int, chess.BaseBoard],
+    target: chess.BaseBoard,
+    lookahead: int,
+) -> list[chess.Move] | None:
+    """the moves searched for the last fen may be the ones played in another
+    order, one that lost an en passant or castling right the next fen needs.
+    Search for the last fen again, for moves the next fen can be reached
+    after. If found the last moves are taken back off of board
+    @param: board - the board after the moves searched for
+    @param: searched - (how many moves, the fen they were searched for)
+    @param: target - the next fen
+    @returns: the moves from board, after the last ones are taken back, to
+              target. None if there are none
+    """
+    plies, last_target = searched
+    before = board.copy()
+    for _ in range(plies):
+        before.pop()
+
+    after: list[chess.Move] = []
+
+    def reaches_target(tmp_board: chess.Board) -> bool:
+        moves = search_ahead(tmp_board, target, lookahead)
+        after[:] = moves or []
+        return moves is not None
+
+    moves = search_ahead(before, last_target, plies, reaches_target)
+    if moves is None:
+        return None
+    for _ in range(plies):
+        board.pop()
+    return moves + after
+
+
+def rebuild_game(
+    board_fens: list[str],
+    headers: dict[str, str] | None = None,
+    lookahead: int = LOOKAHEAD,
+) -> chess.pgn.Game:
+    """rebuild a game from the board fens the board stored
+    @param: board_fens - the board fens of the game, in order
+    @param: headers - pgn headers for the game
+    @param: lookahead - see rebuild_moves
+    @returns: the game. It's comment says how many fens were skipped
+    """
+    board = chess.Board()
+    skipped = 0
+    if board_fens and board_fens[0] != chess.STARTING_BOARD_FEN:
+        # the game did not start at the start. try both sides to move first,
+        # and keep the one that skips the fewest fens with the fewest moves
+        best = None
+        for turn in chess.COLORS:
+            tmp_board = chess.Board(None)
+            tmp_board.set_board_fen(board_fens[0])
+            tmp_board.turn = turn
+            tmp_board.castling_rights = chess.BB_CORNERS
+            tmp_board.castling_rights = tmp_board.clean_castling_rights()
+            tmp_skipped = rebuild_moves(board_fens, tmp_board, lookahead)
+            score = (tmp_skipped, len(tmp_board.move_stack))
+            if best is None or score < best[2]:
+                best = (tmp_board, tmp_skipped, score)
+        board, skipped, _ = best
+    else:
+        skipped = rebuild_moves(board_fens, board, lookahead)
+
+    # the board keeps where it started, so the pgn gets a FEN header if needed
+    game = chess.pgn.Game.from_board(board)
+    if headers:
+        for name, value in headers.items():
+            game.headers[name] = value
+    outcome = board.outcome()
+    game.headers["Result"] = outcome.result() if outcome else "*"
+    if skipped:
+        game.comment = f"{skipped} board positions could not be made into moves"
+
+    return game
+
+
+def _rebuild_pgn(task: tuple[list[str], dict[str, str], int]) -> str:
+    """rebuild a game in a worker process, and give back it's pgn"""
+    board_fens, headers, lookahead = task
+    return str(rebuild_game(board_fens, headers, lookahead))
+
+
+def rebuild_pgns(
+    games: Iterable[list[str]],
+    headers: dict[str, str] | None = None,
+    lookahead: int = LOOKAHEAD,
+    workers: int | None = None,
+) -> list[str]:
+    """rebuild many games at once, in a process pool
+    @param: games - the board fens of each game
+    @param: headers - pgn headers for every game. Each game also gets it's
+            number as the Round
+    @param: lookahead - see rebuild_moves
+    @param: workers - how many processes to use, one per cpu if None
+    @returns: the pgn of each game, in the order given
+    """
+    tasks = [
+        (board_fens, {**(headers or {}), "Round": str(number)}, lookahead)
+        for number, board_fens in enumerate(games, 1)
+    ]
+    if len(tasks) <= 1 or workers == 1:
+        return [_rebuild_pgn(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_rebuild_pgn, tasks, chunksize=4))
+
+
+def read_board_fens(path: str) -> list[list[str]]:
+    """read the games in a board fens file
+    @param: path - the file
+    @returns: the board fens of each game
+    """
+    games: list[list[str]] = [[]]
+    with open(path) as board_fens_file:
+        for line in board_fens_file:
+            line = line.strip()
+            if line.startswith("#"):
+                continue
+            if not line:
+                if games[-1]:
+                    games.append([])
+                continue
+            games[-1].append(line)
+
+    return [board_fens for board_fens in games if board_fens]
+
+
+def write_board_fens(path: str, games: Iterable[Iterable[str]]) -> None:
+    """write games to a board fens file, ie: the games got from
+    NicLinkManager.stored_games()
+    @param: path - the file, it is appended to
+    @param: games - the board fens of each game
+    """
+    with open(path, "a") as board_fens_file:
+        for board_fens in games:
+            board_fens_file.write("\n".join(board_fens) + "\n\n")
+
+
+def main() -> None:
+    """rebuild the pgn of the games in board fens files"""
+    parser = argparse.ArgumentParser(
+        description="rebuild pgn from the board fens of games stored on a board"
+    )
+    parser.add_argument("files", nargs="+", help="board fens files")
+    parser.add_argument("-o", "--output", help="the pgn file to write, or stdout")
+    parser.add_argument("--event", default="?", help="the Event header")
+    parser.add_argument("--site", default="?", help="the Site header")
+    parser.add_argument("--date", default="????.??.??", help="the Date header")
+    parser.add_argument(
+        "--lookahead",
+        type=int,
+        default=LOOKAHEAD,
+        help="how many plies to search for a position after missed ones",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="how many processes to use, one per cpu"
+    )
+    args = parser.parse_args()
+
+    games = [board_fens for path in args.files for board_fens in read_board_fens(path)]
+    headers = {"Event": args.event, "Site": args.site, "Date": args.date}
+    pgns = rebuild_pgns(games, headers, args.lookahead, args.workers)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for pgn in pgns:
+            output.write(pgn + "\n\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""The position as the ChessNut air sends it: 32 bytes, two squares a byte."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import random
+from functools import lru_cache
+
+import chess
+
+# the bytes in a packed position
+POSITION_SIZE = 32
+
+# nibble -> piece symbol, None for an empty square. 13 - 15 are not used
+NIBBLE_PIECES: tuple[str | None, ...] = (
+    None, "q", "k", "b", "p", "n", "R", "P", "r", "B", "N", "Q", "K", None, None, None,
+)  # fmt: skip
+
+# piece symbol -> nibble
+PIECE_NIBBLES = {
+    piece: nibble for nibble, piece in enumerate(NIBBLE_PIECES) if piece is not None
+}
+
+# byte -> (square in the low nibble, square in the high nibble). Byte 0 is h8
+# and g8, byte 31 is b1 and a1
+BYTE_SQUARES = tuple(
+    (
+        chess.square(7 - 2 * (byte % 4), 7 - byte // 4),
+        chess.square(6 - 2 * (byte % 4), 7 - byte // 4),
+    )
+    for byte in range(POSITION_SIZE)
+)
+
+# square -> (byte, shift) of the square's nibble
+SQUARE_NIBBLES = [(0, 0)] * 64
+for _byte, (_low, _high) in enumerate(BYTE_SQUARES):
+    SQUARE_NIBBLES[_low] = (_byte, 0)
+    SQUARE_NIBBLES[_high] = (_byte, 4)
+
+# byte value -> (piece in the low nibble, piece in the high nibble)
+BYTE_PIECES = tuple(
+    (NIBBLE_PIECES[value & 0x0F], NIBBLE_PIECES[value >> 4]) for value in range(256)
+)
+
+# byte value -> the two squares of it in fen order, the high nibble (the
+# square nearer the a file) first, and "1" for an empty square
+BYTE_FEN = tuple(
+    "".join(piece or "1" for piece in reversed(pieces)) for pieces in BYTE_PIECES
+)
+
+# runs of empty squares in a fen rank, longest first
+EMPTY_RUNS = tuple(("1" * run, str(run)) for run in range(8, 1, -1))
+
+# how many decoded positions to keep. A game goes back and forth between a
+# handful of positions as pieces are lifted and placed
+POSITION_CACHE_SIZE = 256
+
+# an empty board
+EMPTY_POSITION = bytes(POSITION_SIZE)
+
+### zobrist hashing ###
+# every piece on every square has a random 64 bit key, and a position's hash
+# is the xor of the keys of it's pieces. So the hash of a changed position only
+# needs the keys of the squares that changed, and positions are compared as
+# ints. The seed is fixed, so hashes are the same every run
+ZOBRIST_SEED = 0x4E69634C696E6B
+_zobrist_random = random.Random(ZOBRIST_SEED)
+
+# square -> nibble -> key. An empty square's key is 0, so an empty board's
+# hash is 0
+SQUARE_KEYS = tuple(
+    (0,) + tuple(_zobrist_random.getrandbits(64) for _ in range(1, 16))
+    for _ in range(64)
+)
+
+# byte -> byte value -> the key of both the squares in it
+BYTE_KEYS = tuple(
+    tuple(
+        SQUARE_KEYS[low][value & 0x0F] ^ SQUARE_KEYS[high][value >> 4]
+        for value in range(256)
+    )
+    for low, high in BYTE_SQUARES
+)
+
+
+def squares_from_position(position: bytes) -> list[str | None]:
+    """get the piece symbol on each square of a packed position, None if
+    empty. Index is the python-chess square, ie: 0 is a1
+    """
+    squares: list[str | None] = [None] * 64
+    for (low, high), value in zip(BYTE_SQUARES, position):
+        squares[low], squares[high] = BYTE_PIECES[value]
+
+    return squares
+
+
+@lru_cache(maxsize=POSITION_CACHE_SIZE)
+def board_fen_from_position(position: bytes) -> str:
+    """get the board fen of a packed position
+    @param: position - the 32 bytes from the board
+    @returns: the board part of a fen, ie: 8/8/8/8/8/8/8/8 for an empty board
+    """
+    # a rank is 4 bytes, the h file first, so each rank is them backwards
+    ranks = []
+    for start in range(0, POSITION_SIZE, 4):
+        ranks.append(
+            BYTE_FEN[position[start + 3]]
+            + BYTE_FEN[position[start + 2]]
+            + BYTE_FEN[position[start + 1]]
+            + BYTE_FEN[position[start]]
+        )
+    board_fen = "/".join(ranks)
+    for run, count in EMPTY_RUNS:
+        board_fen = board_fen.replace(run, count)
+
+    return board_fen
+
+
+def position_hash(position: bytes) -> int:
+    """get the zobrist hash of a packed position
+    @param: position - the 32 bytes from the board
+    @returns: the 64 bit hash
+    """
+    position_hash = 0
+    for keys, value in zip(BYTE_KEYS, position):
+        position_hash ^= keys[value]
+
+    return position_hash
+
+
+def update_hash(position_hash: int, old: bytes, new: bytes) -> int:
+    """get the zobrist hash of a position from the hash of the position
+    before it, only looking up the keys of the squares that changed
+    @param: position_hash - the hash of old
+    @param: old - the position we had
+    @param: new - the position we have now
+    @returns: the hash of new
+    """
+    for keys, old_value, new_value in zip(BYTE_KEYS, old, new):
+        if old_value != new_value:
+            position_hash ^= keys[old_value] ^ keys[new_value]
+
+    return position_hash
+
+
+def square_key(square: chess.Square, piece: str | None) -> int:
+    """get the zobrist key of a piece on a square, 0 if it is empty
+    @param: square - the python-chess square
+    @param: piece - the piece symbol, None for empty
+    """
+    if piece is None:
+        return 0
+    return SQUARE_KEYS[square][PIECE_NIBBLES[piece]]
+
+
+def set_square(position: bytearray, square: chess.Square, piece: str | None) -> None:
+    """put a piece on a square of a packed position
+    @param: position - the position to change
+    @param: square - the python-chess square
+    @param: piece - the piece symbol, None for empty
+    """
+    byte, shift = SQUARE_NIBBLES[square]
+    nibble = PIECE_NIBBLES[piece] if piece is not None else 0
+    position[byte] = (position[byte] & ~(0x0F << shift)) | (nibble << shift)
+
+
+def position_from_board(board: chess.BaseBoard) -> bytes:
+    """get the packed position of a python-chess board"""
+    position = bytearray(POSITION_SIZE)
+    for square, piece in board.piece_map().items():
+        set_square(position, square, piece.symbol())
+
+    return bytes(position)
+
+
+def position_from_board_fen(board_fen: str) -> bytes:
+    """get the packed position of a board fen"""
+    return position_from_board(chess.BaseBoard(board_fen))
+
+
+def changed_squares(old: bytes, new: bytes) -> tuple[int, int]:
+    """find the squares that differ between two packed positions
+    @param: old - the position we had
+    @param: new - the position we have now
+    @returns: (lifted, placed) masks, bit n is set if square n is empty now
+              or has a different piece now
+    """
+    lifted = placed = 0
+    for byte, (old_value, new_value) in enumerate(zip(old, new)):
+        if old_value == new_value:
+            continue
+        old_pieces = BYTE_PIECES[old_value]
+        new_pieces = BYTE_PIECES[new_value]
+        for square, old_piece, new_piece in zip(
+            BYTE_SQUARES[byte], old_pieces, new_pieces
+        ):
+            if old_piece == new_piece:
+                continue
+            if new_piece is None:
+                lifted |= chess.BB_SQUARES[square]
+            else:
+                placed |= chess.BB_SQUARES[square]
+
+    return lifted, placed
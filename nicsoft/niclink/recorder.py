@@ -0,0 +1,191 @@
+"""Record the positions the board reports to a compact binary log, and play
+them back."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+### the log format ###
+# the file starts with MAGIC and VERSION, then records follow. Each starts
+# with a tag byte:
+#   SESSION_TAG  - 8 byte little endian time.time_ns() the recording started.
+#                  Each time the log is opened a session is started
+#   POSITION_TAG - varint ns since the last record in the session, then the
+#                  32 byte packed position (see position.py)
+
+import argparse
+import threading
+import time
+from collections.abc import Iterator
+
+import chess
+
+from .move_detector import MOVED, MoveDetector
+from .position import POSITION_SIZE, board_fen_from_position
+
+MAGIC = b"NLFR"
+VERSION = 1
+
+SESSION_TAG = 0x00
+POSITION_TAG = 0x01
+
+
+def encode_varint(value: int) -> bytes:
+    """encode an unsigned int 7 bits a byte, the low bits first"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def decode_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """decode a varint
+    @param: data - the bytes to decode from
+    @param: offset - where the varint starts
+    @returns: (value, the offset after the varint)
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class FrameRecorder:
+    """append positions to a log as they are reported. Each record is flushed
+    when it is written, so a crash loses nothing
+    """
+
+    def __init__(self, path: str) -> None:
+        """open a log to append to, and start a session in it
+        @param: path - the log file, made if it does not exist
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + bytes((VERSION,)))
+
+        self._last_ns = time.monotonic_ns()
+        self._file.write(bytes((SESSION_TAG,)) + time.time_ns().to_bytes(8, "little"))
+        self._file.flush()
+
+    def record(self, position: bytes, ns: int | None = None) -> None:
+        """append a position to the log
+        @param: position - the 32 byte packed position
+        @param: ns - time.monotonic_ns() the board reported it, now if None
+        """
+        if len(position) != POSITION_SIZE:
+            raise ValueError(
+                f"a position is {POSITION_SIZE} bytes, got {len(position)}"
+            )
+        if ns is None:
+            ns = time.monotonic_ns()
+
+        with self._lock:
+            delta = max(ns - self._last_ns, 0)
+            self._last_ns = max(ns, self._last_ns)
+            self._file.write(bytes((POSITION_TAG,)) + encode_varint(delta) + position)
+            self._file.flush()
+
+    def close(self) -> None:
+        """close the log"""
+        with self._lock:
+            self._file.close()
+
+
+def read_frames(path: str) -> Iterator[tuple[int, bytes]]:
+    """read the positions in a log
+    @param: path - the log file
+    @returns: iterator of (ns since the record before, position). The first
+              record of each session is timed from the start of the session
+    """
+    with open(path, "rb") as log:
+        data = log.read()
+
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a NicLink frame log")
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f"{path} is version {data[len(MAGIC)]}, not {VERSION}")
+
+    offset = len(MAGIC) + 1
+    while offset < len(data):
+        tag = data[offset]
+        offset += 1
+        if tag == SESSION_TAG:
+            offset += 8
+        elif tag == POSITION_TAG:
+            delta, offset = decode_varint(data, offset)
+            position = data[offset : offset + POSITION_SIZE]
+            if len(position) != POSITION_SIZE:
+                # the last record was cut off
+                return
+            offset += POSITION_SIZE
+            yield delta, position
+        else:
+            raise ValueError(f"bad record tag {tag} at {offset - 1} in {path}")
+
+
+def replay_steps(path: str) -> list[tuple[float, bytes]]:
+    """get the steps to play a log on a simulated.SimulatedBoard, ie:
+    board.play(replay_steps(path), speed=10)
+    """
+    return [(delta / 1e9, position) for delta, position in read_frames(path)]
+
+
+def detect_moves(path: str, board: chess.Board | None = None) -> list[str]:
+    """find the moves in a log with the move detector, as fast as it can.
+    For testing and benchmarking move detection against recorded games
+    @param: path - the log file
+    @param: board - the game board when the log starts, the starting position
+            if None. It is not changed
+    @returns: the moves found, in uci
+    """
+    board = chess.Board() if board is None else board.copy()
+    detector = MoveDetector(board)
+    moves = []
+    for _, position in read_frames(path):
+        move = detector.update_position(position)
+        if detector.state == MOVED:
+            board.push_uci(move)
+            moves.append(move)
+            detector = MoveDetector(board)
+
+    return moves
+
+
+def main() -> None:
+    """show what is in a log"""
+    parser = argparse.ArgumentParser(description="show a NicLink frame log")
+    parser.add_argument("log", help="the log file")
+    parser.add_argument(
+        "--moves", action="store_true", help="show the moves found in the log"
+    )
+    args = parser.parse_args()
+
+    if args.moves:
+        print(" ".join(detect_moves(args.log)))
+        return
+
+    elapsed = 0
+    for delta, position in read_frames(args.log):
+        elapsed += delta
+        print(f"{elapsed / 1e9:10.3f} {board_fen_from_position(position)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""A simulated ChessNut air, for running NicLink without a board."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import io
+import threading
+import time
+from collections.abc import Iterable
+
+import chess
+import chess.pgn
+
+from .driver import GAMEOVER_LIGHTS
+from .led_frame import LedFrame
+from .position import board_fen_from_position, position_from_board
+
+# how long a player thinks before lifting a piece, in seconds
+THINK_TIME = 1.0
+# how long a piece is in the air, or a captured piece takes to remove
+LIFT_TIME = 0.3
+# how long it takes to put a piece down
+PLACE_TIME = 0.5
+
+# a step of a script: (seconds to wait, packed position the board then has)
+Step = tuple[float, bytes]
+
+
+def move_steps(
+    board: chess.Board,
+    move: chess.Move,
+    think: float = THINK_TIME,
+    lift: float = LIFT_TIME,
+    place: float = PLACE_TIME,
+) -> list[Step]:
+    """the positions a board goes through while a person makes a move on it.
+    The moving piece is lifted, captured pieces are taken off, then the piece
+    is put down. A castle moves the king, then the rook
+    @param: board - the board before the move, it is not changed
+    @param: move - a legal move on board
+    @param: think - the wait before the piece is lifted
+    @param: lift - the wait before each captured piece or rook is lifted
+    @param: place - the wait before each piece is put down
+    @returns: the steps, the last has the position after the move
+    """
+    after = board.copy(stack=False)
+    after.push(move)
+    final = position_from_board(after)
+
+    tmp_board = chess.BaseBoard(board.board_fen())
+    steps: list[Step] = []
+
+    def step(delay: float) -> None:
+        steps.append((delay, position_from_board(tmp_board)))
+
+    piece = tmp_board.remove_piece_at(move.from_square)
+    step(think)
+
+    if board.is_castling(move):
+        # the king first, then the rook
+        king_square = after.king(board.turn)
+        tmp_board.set_piece_at(king_square, piece)
+        step(place)
+        for square in chess.SquareSet(board.rooks & board.occupied_co[board.turn]):
+            if after.piece_at(square) != board.piece_at(square):
+                tmp_board.remove_piece_at(square)
+                step(lift)
+        steps.append((place, final))
+        return steps
+
+    # take the captured pieces off, the one en passant included
+    for square in chess.SquareSet(board.occupied_co[not board.turn]):
+        if after.piece_at(square) != board.piece_at(square):
+            tmp_board.remove_piece_at(square)
+            step(lift)
+
+    steps.append((place, final))
+    return steps
+
+
+def game_steps(
+    game: chess.pgn.Game | str,
+    think: float = THINK_TIME,
+    lift: float = LIFT_TIME,
+    place: float = PLACE_TIME,
+) -> list[Step]:
+    """the positions a board goes through while a game is played on it
+    @param: game - the game, or the pgn of it
+    @param: think, lift, place - see move_steps
+    """
+    if isinstance(game, str):
+        game = chess.pgn.read_game(io.StringIO(game))
+
+    board = game.board()
+    steps: list[Step] = []
+    for move in game.mainline_moves():
+        steps.extend(move_steps(board, move, think, lift, place))
+        board.push(move)
+
+    return steps
+
+
+class SimulatedBoard:
+    """stands in for the _niclink module. Pass it as the backend of a
+    NicLinkManager. Positions are set by hand or played from a script, and
+    the led frames and beeps sent to it are recorded.
+    """
+
+    def __init__(
+        self,
+        board_fen: str = chess.STARTING_BOARD_FEN,
+        write_delay: float = 0.0,
+    ) -> None:
+        """make a simulated board
+        @param: board_fen - the position on the board to start with
+        @param: write_delay - how long an led write takes. A real board
+                can take up to 200 ms
+        """
+        self.write_delay = write_delay
+
+        # guards everything bellow, and is notified when the position changes
+        self._cond = threading.Condition()
+        self.position = position_from_board(chess.BaseBoard(board_fen))
+        # bumped every time the position changes, like fenSeq in NicLink.cpp
+        self.seq = 0
+        # time.monotonic_ns() of the last change
+        self.change_ns = 0
+        self.connected = False
+        # bumped every time the board is unplugged and plugged back in
+        self.reconnects = 0
+
+        # what the board answers queries with
+        self.battery = 100
+        self.mcu_version = "simulated"
+        self.ble_version = "simulated"
+        # the games stored on the board, as the board fens of each, the
+        # oldest first
+        self.stored: list[list[str]] = []
+        # the fens of the stored game being streamed left to send
+        self._file: list[str] | None = None
+        # time.monotonic() of every query, they take a write slot like a led
+        # write does
+        self.queries: list[float] = []
+
+        # (time.monotonic(), frame) for every led frame written
+        self.led_frames: list[tuple[float, LedFrame]] = []
+        # time.monotonic() of every beep
+        self.beeps: list[float] = []
+
+        self._player: threading.Thread | None = None
+        self._stop_playing = threading.Event()
+
+    ### the _niclink functions ###
+    def connect(self) -> None:
+        self.connected = True
+
+    def disconnect(self) -> None:
+        self.stop()
+        self.connected = False
+
+    def upload_mode(self) -> bool:
+        return True
+
+    def realtime_mode(self) -> bool:
+        return True
+
+    def get_fen(self) -> str:
+        with self._cond:
+            position = self.position
+        # empty, like the board before it has sent a position
+        return board_fen_from_position(position) if position else ""
+
+    def get_position(self) -> bytes:
+        with self._cond:
+            return self.position
+
+    def last_change_ns(self) -> int:
+        with self._cond:
+            return self.change_ns
+
+    def reconnect_count(self) -> int:
+        with self._cond:
+            return self.reconnects
+
+    def wait_for_change(self, seq: int, timeout_ms: int) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != seq, timeout=timeout_ms / 1000)
+            return self.seq
+
+    def set_led(self, x: int, y: int, status: bool) -> None:
+        # x is the rank from 8, and y the bit in it, bit 7 is the a file. As
+        # in ChessLink::setLed
+        frame = self.current_frame().copy()
+        frame.set_square(chess.square(7 - y, 7 - x), status)
+        self._write_frame(frame)
+
+    def set_all_leds(self, *frame: bytes | str) -> None:
+        if len(frame) == 1:
+            self._write_frame(LedFrame.from_bytes(frame[0]))
+        else:
+            # 8 str, rank 1 first
+            self._write_frame(LedFrame.from_led_map(frame))
+
+    def lights_out(self) -> None:
+        self._write_frame(LedFrame())
+
+    def gameover_lights(self) -> None:
+        self.lights_out()
+        self._write_frame(GAMEOVER_LIGHTS)
+
+    def beep(self) -> None:
+        with self._cond:
+            self.beeps.append(time.monotonic())
+
+    def get_battery(self) -> int:
+        return self._query(self.battery)
+
+    def get_mcu_version(self) -> str:
+        return self._query(self.mcu_version)
+
+    def get_ble_version(self) -> str:
+        return self._query(self.ble_version)
+
+    def get_file_count(self) -> int:
+        return self._query(len(self.stored))
+
+    def start_file(self) -> bool:
+        with self._cond:
+            if not self.stored:
+                self._file = None
+                return False
+            # the board sends the same game until it is deleted
+            self._file = list(self.stored[0])
+            return True
+
+    def next_file_position(self, timeout_ms: int) -> str | None:
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        with self._cond:
+            if self._file is None:
+                raise TimeoutError("no stored game is being streamed")
+            if not self._file:
+                return None
+            return self._file.pop(0)
+
+    def delete_file(self) -> bool:
+        with self._cond:
+            if self.stored:
+                del self.stored[0]
+            self._file = None
+            return True
+
+    def _query(self, answer):
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        with self._cond:
+            self.queries.append(time.monotonic())
+        return answer
+
+    def _write_frame(self, frame: LedFrame) -> None:
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        with self._cond:
+            self.led_frames.append((time.monotonic(), frame))
+
+    ### driving the simulation ###
+    def current_frame(self) -> LedFrame:
+        """get the last led frame written, all off if there is none"""
+        with self._cond:
+            if not self.led_frames:
+                return LedFrame()
+            return self.led_frames[-1][1]
+
+    def set_position(self, position: bytes) -> None:
+        """put a packed position on the board, see position.py"""
+        with self._cond:
+            if position == self.position:
+                return
+            self.position = position
+            self.seq += 1
+            self.change_ns = time.monotonic_ns()
+            self._cond.notify_all()
+
+    def reconnect(self, board_fen: str | None = None) -> None:
+        """unplug the board and plug it back in. It's led's go out
+        @param: board_fen - what is on the board when it comes back, the
+                position it had if None
+        """
+        with self._cond:
+            self.led_frames.append((time.monotonic(), LedFrame()))
+            if board_fen is not None:
+                self.position = position_from_board(chess.BaseBoard(board_fen))
+                self.change_ns = time.monotonic_ns()
+            self.reconnects += 1
+            # a reconnect wakes the waiters, like in NicLink.cpp
+            self.seq += 1
+            self._cond.notify_all()
+
+    def store_game(self, game: chess.pgn.Game | str) -> None:
+        """store a game on the board, like the board does when it is played
+        on without a connection
+        @param: game - the game, or the pgn of it
+        """
+        if isinstance(game, str):
+            game = chess.pgn.read_game(io.StringIO(game))
+
+        board = game.board()
+        board_fens = [board.board_fen()]
+        for move in game.mainline_moves():
+            board.push(move)
+            board_fens.append(board.board_fen())
+
+        with self._cond:
+            self.stored.append(board_fens)
+
+    def set_board_fen(self, board_fen: str) -> None:
+        """put a board fen on the board"""
+        self.set_position(position_from_board(chess.BaseBoard(board_fen)))
+
+    def play(self, steps: Iterable[Step], speed: float = 1.0) -> None:
+        """play a script on the board in a thread of it's own
+        @param: steps - the script, see move_steps and game_steps
+        @param: speed - how many times faster than real time to play it
+        """
+        self.stop()
+        self._stop_playing.clear()
+        self._player = threading.Thread(
+            target=self._play, args=(list(steps), speed), daemon=True
+        )
+        self._player.start()
+
+    def _play(self, steps: list[Step], speed: float) -> None:
+        for delay, position in steps:
+            if self._stop_playing.wait(delay / speed):
+                return
+            self.set_position(position)
+
+    def wait_played(self, timeout: float | None = None) -> bool:
+        """wait for the script being played to finish
+        @returns: if it has finished
+        """
+        if self._player is None:
+            return True
+        self._player.join(timeout)
+        return not self._player.is_alive()
+
+    def stop(self) -> None:
+        """stop playing the script"""
+        self._stop_playing.set()
+        player = self._player
+        if player is not None and player is not threading.current_thread():
+            player.join()
+        self._player = None
@@ -0,0 +1,106 @@
+"""Stream the games stored on the board off of it."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+from collections.abc import Iterator
+
+# how long to wait for the next position of a game, in seconds. The board
+# sends a game in one go, so a long wait is a stalled transfer
+FILE_TIMEOUT = 10.0
+
+
+class StoredGame:
+    """a game stored on the board, streamed as it is read. Iterate over it for
+    the board fens of the game as they arrive from the board. It can be
+    iterated again, the fens got so far are kept.
+    """
+
+    def __init__(self, nl_interface, timeout: float = FILE_TIMEOUT) -> None:
+        """a game that start_file() has been called for
+        @param: nl_interface - the backend streaming the game
+        @param: timeout - how long to wait for each position in seconds
+        """
+        self.nl_interface = nl_interface
+        self.timeout = timeout
+
+        # the board fens got so far
+        self.board_fens: list[str] = []
+        # has the whole game been got
+        self.complete = False
+        # should the game be deleted from the board, see ack()
+        self.acked = False
+
+    def __iter__(self) -> Iterator[str]:
+        index = 0
+        while True:
+            if index < len(self.board_fens):
+                yield self.board_fens[index]
+                index += 1
+            elif self.complete or self._read_next() is None:
+                return
+
+    def _read_next(self) -> str | None:
+        """get the next board fen from the board
+        @returns: the fen, None if the game has ended
+        @raises: TimeoutError if the board stopped sending the game
+        """
+        fen = self.nl_interface.next_file_position(int(self.timeout * 1000))
+        if fen is None:
+            self.complete = True
+            return None
+
+        self.board_fens.append(fen)
+        return fen
+
+    def read_all(self) -> list[str]:
+        """get the rest of the game from the board
+        @returns: every board fen of the game
+        """
+        for _ in self:
+            pass
+        return self.board_fens
+
+    def ack(self) -> None:
+        """the game has been saved, it can be deleted from the board"""
+        self.acked = True
+
+
+def stored_games(
+    nl_interface, delete: bool = False, timeout: float = FILE_TIMEOUT
+) -> Iterator[StoredGame]:
+    """stream the games stored on the board, the oldest first. The board only
+    sends it's oldest game, so the next game can only be got once the one
+    before is deleted. A game is deleted after it is ack()ed, or after it is
+    read if delete is set. This stops at the first game that is kept.
+    The board is put back in real time mode when this is done.
+    ie:
+        for game in stored_games(nl_interface):
+            save(game.read_all())
+            game.ack()
+    @param: nl_interface - the backend to get the games from
+    @param: delete - delete every game once it is read, without an ack
+    @param: timeout - how long to wait for each position in seconds
+    """
+    try:
+        while nl_interface.start_file():
+            game = StoredGame(nl_interface, timeout)
+            yield game
+
+            # finish the transfer, so the board is ready for the next request
+            game.read_all()
+            if not (game.acked or delete):
+                return
+            nl_interface.delete_file()
+    finally:
+        nl_interface.realtime_mode()
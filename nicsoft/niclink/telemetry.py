@@ -0,0 +1,154 @@
+"""Poll the board's battery, firmware versions and stored games in the
+background."""
+
+#  NicLink is free software: you can redistribute it and/or modify it under
+#  the terms of the gnu general public license as published by the free
+#  software foundation, either version 3 of the license, or (at your option)
+#  any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but without any
+#  warranty; without even the implied warranty of merchantability or fitness
+#  for a particular purpose.
+#  see the gnu general public license for more details.
+#
+#  you should have received a copy of the gnu general public license along with
+#  NicLink. if not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import time
+
+from .led_scheduler import LedScheduler
+
+# how often to poll the battery and stored games, in seconds
+TELEMETRY_INTERVAL = 60.0
+
+# how long the led's must have been left alone before we query the board, in
+# seconds. A query takes a write slot, so an led frame could wait on it
+QUIET_TIME = 1.0
+
+# how long to wait for the led's to go quiet before trying again next poll
+IDLE_TIMEOUT = 10.0
+
+# the values polled, as (attribute, backend function). Versions do not change
+# while the board is connected, so they are only got once
+VERSIONS = (
+    ("mcu_version", "get_mcu_version"),
+    ("ble_version", "get_ble_version"),
+)
+READINGS = (
+    ("battery", "get_battery"),
+    ("file_count", "get_file_count"),
+)
+
+
+class TelemetryPoller(threading.Thread):
+    """query the board for it's battery level, firmware versions and stored
+    game count, and cache them. Queries are only made when the led scheduler
+    has been idle for a while, so they do not hold up the led's of a game.
+    Values are None until they have been got.
+    """
+
+    def __init__(
+        self,
+        nl_interface,
+        led_scheduler: LedScheduler,
+        logger: logging.Logger,
+        interval: float = TELEMETRY_INTERVAL,
+        quiet: float = QUIET_TIME,
+    ) -> None:
+        """make a poller, start() it to begin polling
+        @param: nl_interface - the backend to query, see NicLinkManager
+        @param: led_scheduler - the scheduler writing to the same board
+        @param: logger - where to log query errors
+        @param: interval - how long between polls in seconds
+        @param: quiet - how long the led's must be idle before a query
+        """
+        threading.Thread.__init__(self, daemon=True)
+
+        self.nl_interface = nl_interface
+        self.led_scheduler = led_scheduler
+        self.logger = logger
+        self.interval = interval
+        self.quiet = quiet
+
+        # the battery level in percent
+        self.battery: int | None = None
+        # the firmware versions
+        self.mcu_version: str | None = None
+        self.ble_version: str | None = None
+        # how many games the board has stored
+        self.file_count: int | None = None
+        # time.monotonic() of the last complete poll
+        self.updated: float | None = None
+
+        self._stopped = threading.Event()
+        # guards the two bellow, and is notified when they change
+        self._cond = threading.Condition()
+        # how many pause() calls are not resumed yet
+        self._paused = 0
+        # is a query being made
+        self._querying = False
+
+    def poll(self) -> bool:
+        """query the board for every value it supports, once
+        @returns: if every value was got, False if the led's were busy or we
+                  were stopped
+        """
+        queries = [
+            (attribute, function)
+            for attribute, function in VERSIONS
+            # an empty version is a query the board did not answer
+            if not getattr(self, attribute)
+        ]
+        queries.extend(READINGS)
+
+        for attribute, function in queries:
+            if not hasattr(self.nl_interface, function):
+                continue
+            # wait for the led's to be left alone before each query
+            idle = self.led_scheduler.wait_idle(self.quiet, timeout=IDLE_TIMEOUT)
+            if not idle or self._stopped.is_set():
+                return False
+
+            with self._cond:
+                if self._paused:
+                    return False
+                self._querying = True
+            try:
+                value = getattr(self.nl_interface, function)()
+            except Exception as err:
+                self.logger.error("TelemetryPoller: %s failed: %s", function, err)
+                continue
+            finally:
+                with self._cond:
+                    self._querying = False
+                    self._cond.notify_all()
+            setattr(self, attribute, value)
+
+        self.updated = time.monotonic()
+        return True
+
+    def run(self) -> None:
+        """poll the board every interval, until stopped"""
+        while not self._stopped.is_set():
+            self.poll()
+            self._stopped.wait(self.interval)
+
+    def pause(self) -> None:
+        """stop querying the board until resume(), ie: while it is streaming
+        stored games. Waits for a query in progress to finish
+        """
+        with self._cond:
+            self._paused += 1
+            self._cond.wait_for(lambda: not self._querying)
+
+    def resume(self) -> None:
+        """query the board again, after pause()"""
+        with self._cond:
+            self._paused = max(self._paused - 1, 0)
+            self._cond.notify_all()
+
+    def stop(self) -> None:
+        """stop polling, a query in progress is finished first"""
+        self._stopped.set()
@@ -0,0 +1,70 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import chess
+
+from nicsoft.lichess.game_board import update_board
+
+
+def replay(move_list: list[str]) -> chess.Board:
+    """a new board with every move made on it"""
+    board = chess.Board()
+    for move in move_list:
+        board.push_uci(move)
+    return board
+
+
+def test():
+    print("\n=====================\n Test Game Board \n=====================\n")
+
+    board = chess.Board()
+    first_board = board
+    moves: list[str] = []
+    # the move lists of the game states, as lichess sends them
+    states = [
+        "",
+        "e2e4",
+        "e2e4 e7e5",
+        "e2e4 e7e5 g1f3",
+        # black takes back g1f3 and e7e5
+        "e2e4",
+        "e2e4 c7c5 g1f3",
+        # the same as before, no new moves
+        "e2e4 c7c5 g1f3",
+        # diverges after e2e4, as if we missed states
+        "e2e4 e7e6 d2d4 d7d5",
+        "e2e4 e7e6 d2d4 d7d5 b1c3",
+    ]
+    for state in states:
+        move_list = state.split(" ")
+        board = update_board(board, moves, move_list, chess.Board)
+        expected = replay(move_list if state else [])
+        if board.move_stack != expected.move_stack or board.fen() != expected.fen():
+            raise AssertionError(f"the board after {state!r} is\n{board}")
+        if moves != [move.uci() for move in expected.move_stack]:
+            raise AssertionError(f"the moves after {state!r} are {moves}")
+        # takebacks are followed on the same board, not made again
+        if board is not first_board:
+            raise AssertionError(f"the board was made again for {state!r}")
+
+    # moves that can not be made on the board we have, ie: it was changed
+    # from outside, are all made again on a new board
+    board.push_uci("h7h6")
+    old_board = board
+    move_list = states[-1].split(" ") + ["g8f6"]
+    board = update_board(board, moves, move_list, chess.Board)
+    if board is old_board or board.fen() != replay(move_list).fen():
+        raise AssertionError(f"the board was not made again\n{board}")
+    if moves != move_list:
+        raise AssertionError(f"the moves made again are {moves}")
+
+    print("the game board is the moves lichess sent")
+
+
+if __name__ == "__main__":
+
+    test()
@@ -0,0 +1,46 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+from niclink.led_frame import CASTLING_FRAMES, MOVE_FRAMES, LedFrame
+
+
+def check(frame: LedFrame, expected: bytes) -> None:
+    """the frame is the bytes the board is sent"""
+    if bytes(frame) != expected:
+        raise AssertionError(f"{frame!r} is {bytes(frame).hex()}, not {expected.hex()}")
+    if LedFrame.from_bytes(expected) != frame:
+        raise AssertionError(f"{expected.hex()} does not make {frame!r}")
+
+
+def test():
+    print("\n=====================\n Test Led Frame \n=====================\n")
+
+    # rank 8 is the first byte, and the a file the high bit of each byte
+    check(LedFrame.from_squares(["a1"]), bytes(7) + b"\x80")
+    check(LedFrame.from_squares(["h8"]), b"\x01" + bytes(7))
+    check(LedFrame.from_squares(["a8", "h1"]), b"\x80" + bytes(6) + b"\x01")
+
+    # a old style led map is the same frame, rank 1 first
+    led_map = ["10000000"] + ["00000000"] * 6 + ["00000001"]
+    if LedFrame.from_led_map(led_map) != LedFrame.from_squares(["a1", "h8"]):
+        raise AssertionError("the led map is not the frame of it's squares")
+    if LedFrame.from_led_map(led_map).rows() != led_map:
+        raise AssertionError("rows() is not the led map")
+
+    check(MOVE_FRAMES["e2e4"], bytes(4) + b"\x08\x00\x08\x00")
+
+    # white castling short lights e1, f1, g1 and h1
+    check(CASTLING_FRAMES["e1g1"], bytes(7) + b"\x0f")
+    # black castling long lights a8, c8, d8 and e8
+    check(CASTLING_FRAMES["e8c8"], b"\xb8" + bytes(7))
+
+    print("the led frames are the bytes the board takes")
+
+
+if __name__ == "__main__":
+
+    test()
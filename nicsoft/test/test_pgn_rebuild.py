@@ -0,0 +1,104 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import chess
+
+from niclink.pgn_rebuild import LOOKAHEAD, rebuild_game, rebuild_moves, search_ahead
+
+# castles both ways, captures en passant and promotes
+SANS = """
+e4 d5 e5 f5 exf6 Nc6 fxg7 Be6 gxh8=Q Qd6 Nf3 O-O-O Bc4 Kb8 O-O
+""".split()
+
+
+def played() -> tuple[list[chess.Move], list[str]]:
+    """the moves of SANS, and the board fen after each"""
+    board = chess.Board()
+    board_fens = []
+    for san in SANS:
+        board.push_san(san)
+        board_fens.append(board.board_fen())
+    return board.move_stack, board_fens
+
+
+def check_moves(board: chess.Board, moves: list[chess.Move], what: str) -> None:
+    """the moves rebuilt are the moves played"""
+    if board.move_stack != moves:
+        got = " ".join(move.uci() for move in board.move_stack)
+        raise AssertionError(f"{what}: rebuilt {got}")
+
+
+def check_fens(board: chess.Board, kept: list[str], plies: int, what: str) -> None:
+    """the moves rebuilt go through every fen kept. The ones dropped can be
+    made another way, ie: f7f6 exf6 for f7f5 exf6 en passant
+    """
+    rebuilt = []
+    tmp_board = chess.Board()
+    for move in board.move_stack:
+        tmp_board.push(move)
+        rebuilt.append(tmp_board.board_fen())
+    if len(rebuilt) != plies or not set(kept) <= set(rebuilt):
+        got = " ".join(move.uci() for move in board.move_stack)
+        raise AssertionError(f"{what}: rebuilt {got}")
+
+
+def test():
+    print("\n=====================\n Test Pgn Rebuild \n=====================\n")
+
+    moves, board_fens = played()
+
+    # every fen, each one twice like the board stores them
+    board = chess.Board()
+    doubled = [board_fen for board_fen in board_fens for _ in range(2)]
+    if rebuild_moves([chess.STARTING_BOARD_FEN] + doubled, board) != 0:
+        raise AssertionError("fens were skipped with none missing")
+    check_moves(board, moves, "all the fens")
+
+    # up to LOOKAHEAD - 1 fens in a row dropped are found by searching ahead,
+    # the en passant and both castles among them
+    for dropped in range(1, LOOKAHEAD):
+        for start in range(len(board_fens) - dropped):
+            kept = board_fens[:start] + board_fens[start + dropped :]
+            board = chess.Board()
+            if rebuild_moves(kept, board) != 0:
+                raise AssertionError(f"skipped fens with {dropped} at {start} gone")
+            check_fens(board, kept, len(moves), f"{dropped} dropped at {start}")
+
+    # too many dropped is skipped, and the game goes on from the fen before
+    board = chess.Board()
+    if rebuild_moves(board_fens[:1] + board_fens[6:], board, lookahead=2) == 0:
+        raise AssertionError("fens too far ahead were not skipped")
+    check_moves(board, moves[:1], "too many fens dropped")
+
+    # the fewest moves to a fen, in any order
+    board = chess.Board()
+    for move in search_ahead(board, chess.BaseBoard(board_fens[2])) or []:
+        board.push(move)
+    if len(board.move_stack) != 3 or board.board_fen() != board_fens[2]:
+        raise AssertionError("search_ahead did not find the 3 plies")
+    if search_ahead(chess.Board(), chess.BaseBoard(board_fens[3])) is not None:
+        raise AssertionError(f"search_ahead found more than {LOOKAHEAD} plies")
+
+    # a game that does not start at the start, with black to move first
+    game = rebuild_game(board_fens[2:])
+    start = chess.Board()
+    for move in moves[:3]:
+        start.push(move)
+    # the move counters can not be known from the board
+    if game.board().epd() != start.epd():
+        raise AssertionError(f"the game started from {game.board().fen()}")
+    if list(game.mainline_moves()) != moves[3:]:
+        raise AssertionError("the game not from the start has the wrong moves")
+    if not game.headers["FEN"].startswith(start.epd()) or game.comment:
+        raise AssertionError("the game not from the start has the wrong headers")
+
+    print("the rebuilt games are the games played")
+
+
+if __name__ == "__main__":
+
+    test()
@@ -0,0 +1,118 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import random
+
+import chess
+
+from niclink.position import (
+    BYTE_SQUARES,
+    POSITION_SIZE,
+    board_fen_from_position,
+    changed_squares,
+    position_from_board,
+    position_from_board_fen,
+    position_hash,
+    update_hash,
+)
+
+# how many random positions to check
+POSITIONS = 500
+
+
+def random_board(rand: random.Random) -> chess.BaseBoard:
+    """a board with random pieces on random squares"""
+    board = chess.BaseBoard(None)
+    for square in chess.SQUARES:
+        if rand.random() < 0.4:
+            board.set_piece_at(
+                square,
+                chess.Piece(rand.choice(chess.PIECE_TYPES), rand.choice(chess.COLORS)),
+            )
+    return board
+
+
+def check_decode(rand: random.Random) -> None:
+    """the decode tables give the board fen python-chess does"""
+    # every pair of pieces in every byte, so every used entry of the tables
+    # is checked
+    symbols = (None, *"pnbrqkPNBRQK")
+    board = chess.BaseBoard(None)
+    for byte in range(POSITION_SIZE):
+        for low in symbols:
+            for high in symbols:
+                board.clear_board()
+                for square, symbol in zip(BYTE_SQUARES[byte], (low, high)):
+                    if symbol is not None:
+                        board.set_piece_at(square, chess.Piece.from_symbol(symbol))
+                position = position_from_board(board)
+                if board_fen_from_position(position) != board.board_fen():
+                    raise AssertionError(f"byte {byte} decodes wrong: {board}")
+
+    for _ in range(POSITIONS):
+        board = random_board(rand)
+        position = position_from_board(board)
+        if board_fen_from_position(position) != board.board_fen():
+            raise AssertionError(f"{board.board_fen()} decodes wrong")
+        if position_from_board_fen(board.board_fen()) != position:
+            raise AssertionError(f"{board.board_fen()} encodes wrong")
+
+    print("the decoded positions are the boards")
+
+
+def check_hash(rand: random.Random) -> None:
+    """update_hash gives the hash a full recompute does, and changed_squares
+    the squares that changed
+    """
+    board = chess.Board()
+    position = position_from_board(board)
+    board_hash = position_hash(position)
+    if position_hash(bytes(POSITION_SIZE)) != 0:
+        raise AssertionError("the empty board does not hash to 0")
+
+    for _ in range(POSITIONS):
+        # a move, or a few squares changed at random like a board being set up
+        old_board = board.copy()
+        if rand.random() < 0.7 and not board.is_game_over():
+            board.push(rand.choice(list(board.legal_moves)))
+        else:
+            board = random_board(rand)
+            board = chess.Board(board.board_fen() + " w - - 0 1")
+
+        new_position = position_from_board(board)
+        board_hash = update_hash(board_hash, position, new_position)
+        if board_hash != position_hash(new_position):
+            raise AssertionError(f"the hash of {board.board_fen()} is wrong")
+
+        lifted, placed = changed_squares(position, new_position)
+        for square in chess.SQUARES:
+            old_piece = old_board.piece_at(square)
+            new_piece = board.piece_at(square)
+            if (
+                bool(lifted & chess.BB_SQUARES[square])
+                != (old_piece is not None and new_piece is None)
+            ) or (
+                bool(placed & chess.BB_SQUARES[square])
+                != (new_piece is not None and new_piece != old_piece)
+            ):
+                raise AssertionError(f"{chess.SQUARE_NAMES[square]} changed wrong")
+        position = new_position
+
+    print("the updated hashes are the full hashes")
+
+
+def test():
+    print("\n=====================\n Test Packed Position \n=====================\n")
+
+    rand = random.Random(1)
+    check_decode(rand)
+    check_hash(rand)
+
+
+if __name__ == "__main__":
+
+    test()
@@ -0,0 +1,87 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import chess
+
+from niclink import NicLinkManager, SimulatedBoard
+from niclink.move_detector import build_premove_index
+from niclink.position import position_from_board, position_hash
+
+
+def board_after(sans: str) -> chess.Board:
+    """a board with the moves made on it, -- for a move not made"""
+    board = chess.Board()
+    for san in sans.split():
+        board.push_san(san)
+    return board
+
+
+def premove_on(
+    nl: NicLinkManager, board: SimulatedBoard, game: str, on_board: str
+) -> str | None:
+    """set the game board to game, and the chessboard to on_board
+    @returns: the premove found
+    """
+    nl.set_game_board(board_after(game))
+    board.set_board_fen(board_after(on_board).board_fen())
+    return nl.premove_for()
+
+
+def test():
+    print("\n=====================\n Test Premove \n=====================\n")
+
+    board = SimulatedBoard()
+    nl = NicLinkManager(1, None, thread_sleep_delay=0, backend=board)
+
+    # black moved before white's e4 was made on the board
+    premove = premove_on(nl, board, "e4", "-- e5")
+    if premove != "e7e5":
+        raise AssertionError(f"the premove was {premove}, not e7e5")
+
+    # the index is made once for the ply
+    index = nl.premove_index()
+    if nl.premove_for() != "e7e5" or nl.premove_index() is not index:
+        raise AssertionError("the premove index was made again for the same ply")
+
+    # with white's move made on the board too
+    premove = premove_on(nl, board, "e4", "e4 e5")
+    if premove != "e7e5":
+        raise AssertionError(f"the premove was {premove}, not e7e5")
+
+    # Nf6 is illegal after Bb5+
+    premove = premove_on(nl, board, "e4 d6 Bb5+", "e4 d6 -- Nf6")
+    if premove is not None:
+        raise AssertionError(f"the illegal premove {premove} was found")
+    # dxe4 can not be told from a capture of the pawn that moved away
+    premove = premove_on(nl, board, "e4 d5 e5", "e4 d5 -- dxe4")
+    if premove is not None:
+        raise AssertionError(f"the premove {premove} needs white's move")
+
+    # nothing moved
+    premove = premove_on(nl, board, "e4", "")
+    if premove is not None:
+        raise AssertionError(f"a premove {premove} was found with no move")
+
+    # the index is every legal reply, none of them touch f1 or b5
+    game_board = board_after("e4 d6 Bb5+")
+    index = build_premove_index(game_board)
+    replies = {move.uci() for move in game_board.legal_moves}
+    if set(index.values()) != replies:
+        raise AssertionError(f"the premove index is {sorted(index.values())}")
+    for board_hash, move in index.items():
+        before = board_after("e4 d6 --")
+        before.push_uci(move)
+        if position_hash(position_from_board(before)) != board_hash:
+            raise AssertionError(f"{move} has the wrong hash in the index")
+
+    print("the premoves found are the ones made")
+    nl.disconnect()
+
+
+if __name__ == "__main__":
+
+    test()
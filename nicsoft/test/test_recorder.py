@@ -0,0 +1,86 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import time
+
+import chess
+
+from niclink import NicLinkManager, SimulatedBoard
+from niclink.nl_exceptions import NoMove
+from niclink.recorder import FrameRecorder, detect_moves, read_frames
+from niclink.simulated import game_steps
+
+# castles both ways, captures en passant and promotes
+PGN = """
+1. e4 d5 2. e5 f5 3. exf6 Nc6 4. fxg7 Be6 5. gxh8=Q Qd6 6. Nf3 O-O-O
+7. Bc4 Kb8 8. O-O *
+"""
+
+
+def expected_moves() -> list[str]:
+    """the moves of PGN in uci"""
+    board = chess.Board()
+    for san in PGN.split():
+        if not san[0].isdigit() and san != "*":
+            board.push_san(san)
+    return [move.uci() for move in board.move_stack]
+
+
+def test():
+    print("\n=====================\n Test Frame Recorder \n=====================\n")
+
+    steps = game_steps(PGN)
+    moves = expected_moves()
+    log_dir = tempfile.mkdtemp()
+
+    # record the game, and read it back
+    path = os.path.join(log_dir, "game.nlfr")
+    recorder = FrameRecorder(path)
+    ns = time.monotonic_ns()
+    for delay, position in steps:
+        ns += int(delay * 1e9)
+        recorder.record(position, ns)
+    recorder.close()
+
+    frames = list(read_frames(path))
+    if [position for _, position in frames] != [position for _, position in steps]:
+        raise AssertionError("the positions read are not the ones recorded")
+    # the first is timed from when the session started
+    deltas = [int(delay * 1e9) for delay, _ in steps]
+    if [delta for delta, _ in frames][1:] != deltas[1:]:
+        raise AssertionError("the times read are not the ones recorded")
+    if detect_moves(path) != moves:
+        raise AssertionError(f"found {detect_moves(path)} in the log, not {moves}")
+    print(f"{len(frames)} positions recorded and read back")
+
+    # record a board that is polled
+    path = os.path.join(log_dir, "polled.nlfr")
+    board = SimulatedBoard()
+    nl = NicLinkManager(
+        1, None, thread_sleep_delay=0, event_driven=False, backend=board
+    )
+    nl.start_recording(path)
+    for _, position in steps:
+        board.set_position(position)
+        try:
+            move = nl.poll_for_move()
+        except NoMove:
+            continue
+        if move is not None:
+            nl.make_move_game_board(move)
+    nl.disconnect()
+
+    if detect_moves(path) != moves:
+        raise AssertionError(f"found {detect_moves(path)} polling, not {moves}")
+    print("the moves in the logs are the game played")
+
+
+if __name__ == "__main__":
+
+    test()
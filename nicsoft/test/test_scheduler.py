@@ -0,0 +1,169 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import time
+
+import chess
+
+from nicsoft.lichess.game import Game
+from nicsoft.lichess.scheduler import GameScheduler, ScheduledGame
+from nicsoft.niclink import NicLinkManager, SimulatedBoard
+
+logger = logging.getLogger("test_scheduler")
+
+
+def game_event(
+    game_id: str, board: chess.Board, my_turn: bool, seconds_left: float | None
+) -> dict:
+    """a correspondence game as lichess sends it, we play white"""
+    event = {
+        "fullId": game_id + "xxxx",
+        "gameId": game_id,
+        "fen": board.fen(),
+        "color": "white",
+        "lastMove": board.peek().uci() if board.move_stack else "",
+        "source": "friend",
+        "status": {"id": 20, "name": "started"},
+        "variant": {"key": "standard", "name": "Standard"},
+        "speed": "correspondence",
+        "perf": "correspondence",
+        "rated": False,
+        "hasMoved": True,
+        "opponent": {"id": "musaku", "username": "musaku", "rating": 1500},
+        "isMyTurn": my_turn,
+    }
+    if seconds_left is not None:
+        event["secondsLeft"] = seconds_left
+    return event
+
+
+def board_after(sans: str) -> chess.Board:
+    """a board with the moves made on it"""
+    board = chess.Board()
+    for san in sans.split():
+        board.push_san(san)
+    return board
+
+
+class Client:
+    """stands in for the berserk client, with the games given to it"""
+
+    def __init__(self) -> None:
+        self.ongoing: list[dict] = []
+        self.sent: list[tuple[str, str]] = []
+        self.games = self
+        self.board = self
+
+    def get_ongoing(self, count: int) -> list[dict]:
+        return self.ongoing[:count]
+
+    def make_move(self, game_id: str, move: str) -> None:
+        self.sent.append((game_id, move))
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    """wait for condition() to be True"""
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test():
+    print("\n=====================\n Test Game Scheduler \n=====================\n")
+
+    # a game one move behind is brought up to date by making the last move
+    game = ScheduledGame(Game(game_event("a", board_after("e4"), False, None)))
+    board = game.board
+    if not game.update(Game(game_event("a", board_after("e4 e5"), True, None))):
+        raise AssertionError("the position did not change")
+    if game.board is not board or [move.uci() for move in board.move_stack] != ["e7e5"]:
+        raise AssertionError(f"e5 was not made on the board\n{game.board}")
+    if not game.is_my_turn or game.last_move != "e7e5":
+        raise AssertionError("the turn and last move were not updated")
+
+    # one that is further ahead is made from the fen
+    far = board_after("e4 e5 Nf3 Nc6 Bb5")
+    game.update(Game(game_event("a", far, False, None)))
+    if game.board.fen() != far.fen() or game.is_my_turn:
+        raise AssertionError(f"the board was not made from the fen\n{game.board}")
+
+    # the games we are to move in, the least time left first
+    scheduler = GameScheduler(Client(), None, logger)
+    scheduler.add_game(Game(game_event("a", board_after("e4 e5"), True, 5000)))
+    scheduler.add_game(Game(game_event("b", board_after("d4 d5"), True, None)))
+    scheduler.add_game(Game(game_event("c", board_after("c4 c5"), True, 60)))
+    scheduler.add_game(Game(game_event("d", board_after("g3"), False, 10)))
+    waiting = [game.id for game in scheduler.waiting_games()]
+    if waiting != ["c", "a", "b"]:
+        raise AssertionError(f"the games are in the order {waiting}")
+    scheduler.remove_game("c")
+    if scheduler.next_game().id != "a":
+        raise AssertionError("the game removed is still played")
+
+    # play a game on a simulated board, and lease the board away mid game
+    client = Client()
+    client.ongoing = [
+        game_event("a", board_after("e4 e5"), True, 60),
+        game_event("b", board_after("d4"), False, 5000),
+    ]
+    sim = SimulatedBoard(board_after("e4 e5").board_fen())
+    nl = NicLinkManager(1, None, thread_sleep_delay=0, backend=sim)
+    kill_switch = nl.kill_switch
+    scheduler = GameScheduler(client, nl, logger)
+    scheduler.start()
+    if not wait_for(lambda: scheduler.current is not None):
+        raise AssertionError("the scheduler did not put a game on the board")
+    if scheduler.current.id != "a":
+        raise AssertionError(f"{scheduler.current.id} is played first, not a")
+    # the Events the main thread sets are the ones we wait on
+    if nl.kill_switch is not kill_switch:
+        raise AssertionError("the scheduler replaced NicLink's kill switch")
+
+    scheduler.lease_board()
+    if scheduler.current is not None:
+        raise AssertionError("the scheduler is still playing with the board leased")
+    # the real time game is played on the board
+    sim.set_board_fen(chess.STARTING_BOARD_FEN)
+    sim.set_board_fen(board_after("e4").board_fen())
+    time.sleep(0.3)
+    if client.sent:
+        raise AssertionError(f"{client.sent} was sent with the board leased")
+    scheduler.release_board()
+    # it can be given back more than once
+    scheduler.release_board()
+
+    # the game has to be set up again, the real time game is not a move in it
+    if not wait_for(lambda: scheduler.current is not None):
+        raise AssertionError("the scheduler did not take the board back")
+    time.sleep(0.3)
+    if client.sent:
+        raise AssertionError(f"{client.sent} was sent from the real time game")
+    sim.set_board_fen(board_after("e4 e5").board_fen())
+    time.sleep(0.3)
+    sim.set_board_fen(board_after("e4 e5 Nf3").board_fen())
+    if not wait_for(lambda: client.sent):
+        raise AssertionError("the move was not sent once the board was given back")
+    if client.sent != [("a", "g1f3")]:
+        raise AssertionError(f"{client.sent} was sent, not g1f3 in a")
+    # a is not ours to move in anymore, and b is not either
+    if not wait_for(lambda: scheduler.current is None):
+        raise AssertionError("the scheduler is still playing a")
+    if nl.game_board.board_fen() != board_after("e4 e5 Nf3").board_fen():
+        raise AssertionError("the move was not made on NicLink's game board")
+
+    scheduler.stop()
+    nl.disconnect()
+    print("the games are played on the board in turn")
+
+
+if __name__ == "__main__":
+
+    test()
@@ -0,0 +1,57 @@
+#  NicLink is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+#
+#  NicLink is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with NicLink. If not, see <https://www.gnu.org/licenses/>.
+
+import time
+
+import chess
+
+from niclink import NicLinkManager, SimulatedBoard
+from niclink.simulated import game_steps
+
+# castles both ways, captures en passant and promotes
+PGN = """
+1. e4 d5 2. e5 f5 3. exf6 Nc6 4. fxg7 Be6 5. gxh8=Q Qd6 6. Nf3 O-O-O
+7. Bc4 Kb8 8. O-O *
+"""
+
+
+def test():
+    print("\n=====================\n Test Simulated Board \n=====================\n")
+
+    expected = chess.Board()
+    for san in PGN.split():
+        if not san[0].isdigit() and san != "*":
+            expected.push_san(san)
+
+    board = SimulatedBoard()
+    nl = NicLinkManager(1, None, thread_sleep_delay=0, backend=board)
+
+    # play the game 20 times faster than a person would
+    board.play(game_steps(PGN), speed=20)
+
+    start = time.monotonic()
+    moves = []
+    while len(moves) < len(expected.move_stack):
+        move = nl.await_move()
+        nl.make_move_game_board(move)
+        moves.append(move)
+        print(f"{move} at {time.monotonic() - start:.2f} s")
+
+    board.wait_played()
+    print(nl.game_board)
+    print(f"led frames written: {len(board.led_frames)}")
+
+    if nl.game_board.board_fen() != expected.board_fen():
+        raise AssertionError("the moves got do not make the game played")
+    print("the game board is the game played")
+
+    nl.disconnect()
+
+
+if __name__ == "__main__":
+
+    test()
@@ -8,9 +8,9 @@ constexpr unsigned short DEVICE_USAGE_PAGE = 0xFF00;
 // hid write time interval,millisecond
 constexpr unsigned int WRITE_INTERVAL = 200;
 
-// default chess data
-constexpr unsigned char CHESS_PIECES[] = {
-    '0', 'q', 'k', 'b', 'p', 'n', 'R', 'P', 'r', 'B', 'N', 'Q', 'K',
+// default chess data, one for each value of a nibble. 13 - 15 are not used
+constexpr unsigned char CHESS_PIECES[16] = {
+    '0', 'q', 'k', 'b', 'p', 'n', 'R', 'P', 'r', 'B', 'N', 'Q', 'K', '0', '0', '0',
 };
 
 ChessHardConnect::ChessHardConnect() { this->connectStatus = false; }
@@ -68,9 +68,10 @@ ChessHidManager::~ChessHidManager() { hid_exit(); }
 unique_ptr<ChessHidManager> ChessHidConnect::HidManager =
     unique_ptr<ChessHidManager>();
 
-ChessHidConnect::ChessHidConnect() {
+ChessHidConnect::ChessHidConnect(const string &path) {
   this->connectStatus = false;
   this->handle = nullptr;
+  this->path = path;
 }
 
 ChessHidConnect::~ChessHidConnect() {
@@ -109,14 +110,26 @@ bool ChessHidConnect::b_connect(void) {
     return this->connectStatus;
   }
 
-  if (find_hid_vec.size() >= 1) {
-    auto o_handle = hid_open_path(find_hid_vec[0].c_str());
-    this->handle = o_handle ? o_handle : nullptr;
-    this->connectStatus = handle ? true : false;
-    return this->connectStatus;
+  // open our board, or the first one found if we do not have one
+  string open_path;
+  if (this->path.empty()) {
+    if (find_hid_vec.empty()) {
+      return false;
+    }
+    open_path = find_hid_vec[0];
   } else {
-    return false;
+    if (find(find_hid_vec.begin(), find_hid_vec.end(), this->path) ==
+        find_hid_vec.end()) {
+      // our board is not plugged in
+      return false;
+    }
+    open_path = this->path;
   }
+
+  auto o_handle = hid_open_path(open_path.c_str());
+  this->handle = o_handle ? o_handle : nullptr;
+  this->connectStatus = handle ? true : false;
+  return this->connectStatus;
 }
 
 void ChessHidConnect::b_disconnect() {
@@ -152,12 +165,16 @@ ChessLink::ChessLink(ChessHardConnect *chess_connect) {
   this->threadMode = true;
 
   this->fileTransfer = false;
+  this->fileDone = false;
+  this->fileRead = 0;
 
   this->mode = 1;
 
   this->device = unique_ptr<ChessHardConnect>(chess_connect);
 
   this->rCallback = nullptr;
+  this->pCallback = nullptr;
+  this->cCallback = nullptr;
 
   this->ledStatus = {bitset<8>(0), bitset<8>(0), bitset<8>(0), bitset<8>(0),
                      bitset<8>(0), bitset<8>(0), bitset<8>(0), bitset<8>(0)};
@@ -166,17 +183,23 @@ ChessLink::ChessLink(ChessHardConnect *chess_connect) {
 ChessLink::~ChessLink() { this->disconnect(); }
 
 bool ChessLink::setLedInternal() {
+  array<bitset<8>, 8> status;
+  {
+    // the status can be set from another thread while we write
+    lock_guard<mutex> lock(this->ledMutex);
+    status = this->ledStatus;
+  }
   unsigned char buf[] = {
       0x0a,
       0x08,
-      static_cast<unsigned char>(this->ledStatus[0].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[1].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[2].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[3].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[4].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[5].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[6].to_ulong()),
-      static_cast<unsigned char>(this->ledStatus[7].to_ulong()),
+      static_cast<unsigned char>(status[0].to_ulong()),
+      static_cast<unsigned char>(status[1].to_ulong()),
+      static_cast<unsigned char>(status[2].to_ulong()),
+      static_cast<unsigned char>(status[3].to_ulong()),
+      static_cast<unsigned char>(status[4].to_ulong()),
+      static_cast<unsigned char>(status[5].to_ulong()),
+      static_cast<unsigned char>(status[6].to_ulong()),
+      static_cast<unsigned char>(status[7].to_ulong()),
   };
   auto r = this->device->write(buf, sizeof(buf));
   return r ? true : false;
@@ -293,49 +316,83 @@ uint32_t ChessLink::getFileCount() {
 
 vector<string> ChessLink::getFile(bool is_delete) {
   vector<string> file = {};
-  if (this->getFileCount() == 0) {
+  if (!this->startFile()) {
     return file;
   }
 
+  mutex_lock lock(this->fileMutex);
+  if (this->fileCV.wait_for(lock, chrono::seconds(120),
+                            [this] { return this->fileDone; })) {
+    file = this->fileContent;
+    lock.unlock();
+
+    // file get success, delete it
+    if (is_delete) {
+      this->deleteFile();
+    }
+
+  } else {
+    this->fileTransfer = false;
+  }
+  return file;
+}
+
+bool ChessLink::startFile() {
+  if (this->getFileCount() == 0) {
+    return false;
+  }
+
   this->switchUploadMode();
 
+  {
+    lock_guard<mutex> lock(this->fileMutex);
+    this->fileContent.clear();
+    this->fileDone = false;
+    this->fileRead = 0;
+  }
+
   unsigned char buf1[] = {
       0x33,
       0x01,
       0x00,
   };
   auto r1 = this->device->write(buf1, sizeof(buf1));
+  if (r1 <= 0) {
+    return false;
+  }
 
-  if (r1 > 0) {
-    unsigned char buf2[] = {
-        0x34,
-        0x01,
-        0x01,
-    };
-    auto r2 = this->device->write(buf2, sizeof(buf2));
-
-    if (r2 > 0) {
-      mutex_lock lock(this->fileMutex);
-      if (this->fileCV.wait_for(lock, chrono::seconds(120)) ==
-          cv_status::no_timeout) {
-        file = this->fileContent;
-
-        // file get success, delete it
-        if (is_delete) {
-          unsigned char buf3[] = {
-              0x39,
-              0x01,
-              0x00,
-          };
-          this->device->write(buf3, sizeof(buf3));
-        }
+  unsigned char buf2[] = {
+      0x34,
+      0x01,
+      0x01,
+  };
+  auto r2 = this->device->write(buf2, sizeof(buf2));
+  return r2 > 0;
+}
 
-      } else {
-        this->fileTransfer = false;
-      }
-    }
+int ChessLink::nextFilePosition(string &fen, chrono::milliseconds timeout) {
+  mutex_lock lock(this->fileMutex);
+  if (!this->fileCV.wait_for(lock, timeout, [this] {
+        return this->fileRead < this->fileContent.size() || this->fileDone;
+      })) {
+    return -1;
   }
-  return file;
+
+  if (this->fileRead < this->fileContent.size()) {
+    fen = this->fileContent[this->fileRead++];
+    return 1;
+  }
+  return 0;
+}
+
+bool ChessLink::deleteFile() {
+  unsigned char buf[] = {
+      0x39,
+      0x01,
+      0x00,
+  };
+  auto r = this->device->write(buf, sizeof(buf));
+  return r ? true : false;
 }
 
 bool ChessLink::connect() {
@@ -394,41 +451,50 @@ void ChessLink::setRealTimeCallback(RealTimeCallback callback) {
   }
 }
 
-string ChessLink::toFen(unsigned char *data, size_t length) {
+void ChessLink::setRealTimePositionCallback(
+    RealTimePositionCallback callback) {
+  lock_guard<mutex> lock(this->callbackMutex);
+  this->pCallback = callback;
+}
+
+void ChessLink::setReconnectCallback(ReconnectCallback callback) {
+  lock_guard<mutex> lock(this->callbackMutex);
+  this->cCallback = callback;
+}
+
+string ChessLink::toFen(const unsigned char *data, size_t length) {
   if (length <= 32) {
     return "";
   }
-  string fen = "";
+  string fen;
+  // 64 pieces and 7 '/' at most
+  fen.reserve(71);
   int empty = 0;
   for (int i = 0; i < 8; i++) {
     for (int j = 7; j >= 0; j--) {
-      char piece =
-          j % 2 == 0
-              ? CHESS_PIECES[data[(i * 8 + j) / 2 + 2] & 0x0f]
-              : CHESS_PIECES
-                    [data[static_cast<int>(floor((i * 8 + j) / 2 + 2))] >> 4];
-      if (piece == '0')
+      unsigned char square = data[(i * 8 + j) / 2 + 2];
+      char piece = CHESS_PIECES[j % 2 == 0 ? square & 0x0f : square >> 4];
+      if (piece == '0') {
         empty++;
-      else {
-        if (empty > 0) {
-          fen += to_string(empty);
-          empty = 0;
-        }
+        continue;
       }
-      if (piece != '0')
-        fen += piece;
+      if (empty > 0) {
+        fen += static_cast<char>('0' + empty);
+        empty = 0;
+      }
+      fen += piece;
     }
     if (empty > 0)
-      fen += to_string(empty);
+      fen += static_cast<char>('0' + empty);
     if (i < 7)
-      fen += "/";
+      fen += '/';
     empty = 0;
   }
   return fen;
 }
 
-shared_ptr<ChessLink> ChessLink::fromHidConnect() {
-  ChessHardConnect *c = new ChessHidConnect();
+shared_ptr<ChessLink> ChessLink::fromHidConnect(const string &path) {
+  ChessHardConnect *c = new ChessHidConnect(path);
   shared_ptr<ChessLink> r(new ChessLink(c));
 
   thread readThread = thread(
@@ -457,12 +523,18 @@ shared_ptr<ChessLink> ChessLink::fromHidConnect() {
                 lock_guard<mutex> lock(chesslink->fileMutex);
                 chesslink->fileTransfer = true;
                 chesslink->fileContent.clear();
+                chesslink->fileDone = false;
+                chesslink->fileRead = 0;
               }
 
               if (readBuf[0] == 0x37 && readBuf[1] == 0x01 &&
                   readBuf[2] == 0xed) {
                 // get file end
-                chesslink->fileTransfer = false;
+                {
+                  lock_guard<mutex> lock(chesslink->fileMutex);
+                  chesslink->fileTransfer = false;
+                  chesslink->fileDone = true;
+                }
                 chesslink->fileCV.notify_all();
               }
 
@@ -470,12 +542,24 @@ shared_ptr<ChessLink> ChessLink::fromHidConnect() {
               if (readBuf[0] == 0x01) {
                 if (chesslink->fileTransfer) {
                   // if file transfer mode is true
-                  lock_guard<mutex> lock(chesslink->fileMutex);
-                  chesslink->fileContent.push_back(
-                      ChessLink::toFen(readBuf, real_size));
+                  {
+                    lock_guard<mutex> lock(chesslink->fileMutex);
+                    chesslink->fileContent.push_back(
+                        ChessLink::toFen(readBuf, real_size));
+                  }
+                  // wake anyone streaming the file
+                  chesslink->fileCV.notify_all();
 
                 } else {
                   // chessboard piece layout data in Real Time Mode
+                  RealTimePositionCallback positionCallback;
+                  {
+                    lock_guard<mutex> lock(chesslink->callbackMutex);
+                    positionCallback = chesslink->pCallback;
+                  }
+                  if (positionCallback && real_size >= 34) {
+                    positionCallback(readBuf + 2, 32);
+                  }
                   if (chesslink->rCallback) {
                     chesslink->rCallback(ChessLink::toFen(readBuf, real_size));
                   }
@@ -515,6 +599,15 @@ shared_ptr<ChessLink> ChessLink::fromHidConnect() {
                 if (chesslink->mode == 1) {
                   chesslink->switchUploadMode();
                 }
+                ReconnectCallback reconnectCallback;
+                {
+                  lock_guard<mutex> lock(chesslink->callbackMutex);
+                  reconnectCallback = chesslink->cCallback;
+                }
+                if (reconnectCallback) {
+                  reconnectCallback();
+                }
+                continue;
               }
             }
             this_thread::sleep_for(chrono::milliseconds(10));
@@ -3,6 +3,7 @@
 #include "spdlog/spdlog.h"
 #endif
 #include <hidapi/hidapi.h>
+#include <algorithm>
 #include <array>
 #include <atomic>
 #include <bitset>
@@ -10,6 +11,7 @@
 #include <cmath>
 #include <condition_variable>
 #include <cstdint>
+#include <functional>
 #include <iostream>
 #include <memory>
 #include <mutex>
@@ -26,6 +28,14 @@ using mutex_lock = unique_lock<mutex>;
 
 using RealTimeCallback = void (*)(const string);
 
+// gets the 32 byte packed position, two squares a byte, in Real Time Mode
+using RealTimePositionCallback =
+    function<void(const unsigned char *, size_t)>;
+
+// called from the read thread after it has reconnected to a board that went
+// away, and put it back in the mode it was in
+using ReconnectCallback = function<void()>;
+
 class ChessHardConnect {
 private:
   // connect mutex
@@ -98,8 +108,11 @@ private:
   // hid device handle
   hid_device *handle;
 
+  // the hid path of the board to open, empty for the first board found
+  string path;
+
 public:
-  ChessHidConnect();
+  ChessHidConnect(const string &path = "");
   ~ChessHidConnect();
 
   // overload
@@ -166,6 +179,13 @@ private:
   // the file content
   vector<string> fileContent;
 
+  // has the whole file been got, guarded by fileMutex
+  bool fileDone;
+
+  // how many positions of fileContent nextFilePosition has given out,
+  // guarded by fileMutex
+  size_t fileRead;
+
   // file transfer mutex
   mutex fileMutex;
 
@@ -186,8 +206,15 @@ private:
   // The callback function for receiving data in the Real Time Mode
   RealTimeCallback rCallback;
 
-  // change real data to fen
-  static string toFen(unsigned char *, size_t length);
+  // The callback function for receiving the packed position in the Real Time
+  // Mode
+  RealTimePositionCallback pCallback;
+
+  // The callback function for when the read thread reconnects
+  ReconnectCallback cCallback;
+
+  // guards pCallback and cCallback, they are set while the read thread runs
+  mutex callbackMutex;
 
   // led status
   array<bitset<8>, 8> ledStatus;
@@ -236,6 +263,22 @@ public:
   */
   void setRealTimeCallback(RealTimeCallback callback);
 
+  /**
+  set callback for receiving the packed position in the Real Time Mode.
+  It gets the 32 bytes after the report header, no fen is made for it
+  */
+  void setRealTimePositionCallback(RealTimePositionCallback callback);
+
+  /**
+  set callback for when the board went away and the read thread has
+  reconnected to it. The board has lost it's led's and mode by then, the mode
+  is set again before the callback
+  */
+  void setReconnectCallback(ReconnectCallback callback);
+
+  // change real data to fen
+  static string toFen(const unsigned char *, size_t length);
+
   /**
   Control the buzzer to sound
   frequency is sound frequency, 1-65535
@@ -331,8 +374,29 @@ public:
   */
   vector<string> getFile(bool is_delete = true);
 
+  /**
+  start to stream the next saved file, positions can be read with
+  nextFilePosition as they arrive. This method will call switchUploadMode.
+  Like getFile, the same file is sent until it is deleted with deleteFile
+  Returns true if there is a file and it was asked for, false otherwise
+  */
+  bool startFile();
+
+  /**
+  wait for the next position of the file being streamed, up to timeout
+  Returns 1 and sets fen if there is one, 0 if the file has ended, -1 if we
+  timed out
+  */
+  int nextFilePosition(string &fen, chrono::milliseconds timeout);
+
+  /**
+  delete the saved file that was last got
+  Returns true if success, false otherwise
+  */
+  bool deleteFile();
+
   /**
   Create ChessLink from HID connect mode
   */
-  static shared_ptr<ChessLink> fromHidConnect(void);
+  static shared_ptr<ChessLink> fromHidConnect(const string &path = "");
 };
@@ -1,192 +1,562 @@
 #include "EasyLink.h"
+#include <condition_variable>
+#include <cstring>
 #include <iostream>
+#include <memory>
+#include <mutex>
 #include <pybind11/iostream.h>
 #include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
 #include <python3.14/Python.h>
 #include <string>
 
 namespace py = pybind11;
 
-// the link to the board
-shared_ptr<ChessLink> chessLink = nullptr;
-
-// the current FEN
-string currentFen;
-
 /**
- * Set up connection, and set up real time callback
- * creates the shared_ptr<ChessLink> for use by other NicLink stuff
+ * one chessboard, and the position it last reported. Each board has it's own
+ * ChessLink and read thread, so one process can use every board plugged in
  */
-void connect() {
-  chessLink = ChessLink::fromHidConnect();
+class Board : public enable_shared_from_this<Board> {
+private:
+  // the hid path of the board, empty for the first board found
+  string path;
+
+  // the link to the board
+  shared_ptr<ChessLink> chessLink = nullptr;
+
+  // guards chessLink itself. The ChessLink guards it's own reads and writes
+  mutex linkMutex;
+
+  // the current position, as the 32 packed bytes the board sends
+  string currentPosition;
+
+  // the current FEN, made from currentPosition when it is asked for. Empty if
+  // it has not been made yet
+  string currentFen;
+
+  // guards currentPosition, currentFen, fenSeq, lastChangeNs and
+  // reconnectCount. fenChanged wakes threads waiting for a change
+  mutex fenMutex;
+  condition_variable fenChanged;
 
-  // if this is false, we did not connect right
-  if (!chessLink) {
-    cerr << "ERROR: Cannot connect to chessboard" << endl;
-    throw "ERROR: Cannot connect to chessboard";
+  // bumped every time the board reports a new position
+  unsigned long fenSeq = 0;
+
+  // when the read thread got the current position, in ns on the steady
+  // clock. That is CLOCK_MONOTONIC on linux, the clock of python's
+  // time.monotonic_ns()
+  long long lastChangeNs = 0;
+
+  // bumped every time the read thread reconnects to the board
+  unsigned long reconnectCount = 0;
+
+  /**
+   * get the link to the board. Callers keep the copy they get for the whole
+   * call, so connect() can not free the link out from under them
+   * @return the link, nullptr if we have not connected
+   */
+  shared_ptr<ChessLink> getLink() {
+    lock_guard<mutex> lock(linkMutex);
+    return chessLink;
   }
 
-  // because, I don't know how to do async coding in two languages
-  this_thread::sleep_for(chrono::seconds(2));
+  /**
+   * get the link to the board, and complain if there is none
+   * @return the link, nullptr if we have not connected
+   */
+  shared_ptr<ChessLink> getConnectedLink() {
+    shared_ptr<ChessLink> link = getLink();
+    if (link == nullptr) {
+      cerr << "bChessLink is nullptr. Are you sure you are connected to board?"
+           << endl;
+    }
+    return link;
+  }
 
-  // try to switchUploadMode, test connection
-  bool successfulConnect = chessLink->switchUploadMode();
+  /**
+   * take a position from the read thread
+   * @param data: the 32 packed bytes
+   * @param length: the number of bytes
+   */
+  void positionReported(const unsigned char *data, size_t length) {
+    {
+      lock_guard<mutex> lock(fenMutex);
+      // the board reports the same position over and over, only a new
+      // position is a change
+      if (currentPosition.size() == length &&
+          memcmp(currentPosition.data(), data, length) == 0) {
+        return;
+      }
+      // keep the current position up to date, the fen is made when asked for
+      currentPosition.assign(reinterpret_cast<const char *>(data), length);
+      currentFen.clear();
+      fenSeq++;
+      lastChangeNs = chrono::duration_cast<chrono::nanoseconds>(
+                         chrono::steady_clock::now().time_since_epoch())
+                         .count();
+    }
+    // wake anyone blocked in waitForChange
+    fenChanged.notify_all();
+  }
 
-  if (!successfulConnect) {
-    cerr << "ERROR: CAN NOT SWITCH TO UPLOAD MODE." << endl;
-    throw "ERROR: CAN NOT SWITCH TO UPLOAD MODE.";
+  /**
+   * the read thread has reconnected to the board. The position may be the
+   * same, but the board's led's are gone, so wake the waiters anyway
+   */
+  void boardReconnected() {
+    {
+      lock_guard<mutex> lock(fenMutex);
+      reconnectCount++;
+      fenSeq++;
+    }
+    fenChanged.notify_all();
   }
 
-  chessLink->connect();
-  chessLink->beep();
+public:
+  /**
+   * @param path: the hid path of the board, from listDevices(). Empty for the
+   * first board found
+   */
+  Board(const string &path = "") : path(path) {}
 
-  cout << "Setting callback for updating currentFen." << endl;
-  chessLink->setRealTimeCallback([](string s) {
-    // keep the current fen up to date
-    currentFen = s;
-  });
+  /**
+   * get the hid path the board was opened with
+   */
+  string getPath() { return path; }
 
-  chessLink->switchRealTimeMode();
-  cout << "Connect attempted." << endl;
-}
+  /**
+   * Set up connection, and set up real time callback
+   * creates the shared_ptr<ChessLink> for use by the other calls
+   */
+  void connect() {
+    shared_ptr<ChessLink> link = ChessLink::fromHidConnect(path);
 
-/**
- * disconnect from the chessboard over usb
- */
-void disconnect() {
-  if (chessLink == nullptr) {
-    cerr << "chesslink is not connected." << endl;
-    return;
-  }
-  // make sure we are in upload mode
-  chessLink->switchUploadMode();
-  // and shut the door
-  chessLink->disconnect();
-}
+    // if this is false, we did not connect right
+    if (!link) {
+      cerr << "ERROR: Cannot connect to chessboard" << endl;
+      throw "ERROR: Cannot connect to chessboard";
+    }
 
-/**
- * turn off all the lights on the chessboard. The chessboard will be in
- * upload mode after the function is called
- */
-void lightsOut() {
-  if (chessLink == nullptr) {
-    cerr << "chesslink is not connected." << endl;
-    return;
-  }
-
-  // turn off all the lights
-  chessLink->setLed({
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-      bitset<8>("00000000"), //
-  });
-}
+    // try to switchUploadMode, test connection
+    bool successfulConnect = link->switchUploadMode();
 
-/**
- * get the current fen of the board
- * @return the current fen oy the position on the board
- */
-string getFEN() {
-  // if we have not connected throw error and return
-  if (chessLink == nullptr) {
-    cerr << "bChessLink is nullptr. Are you sure you are connected to board?"
-         << endl;
-    return "ERROR: no connection.";
+    if (!successfulConnect) {
+      cerr << "ERROR: CAN NOT SWITCH TO UPLOAD MODE." << endl;
+      throw "ERROR: CAN NOT SWITCH TO UPLOAD MODE.";
+    }
+
+    link->connect();
+    link->beep();
+
+    // let the other calls use the new link
+    {
+      lock_guard<mutex> lock(linkMutex);
+      chessLink = link;
+    }
+
+    cout << "Setting callback for updating currentPosition." << endl;
+    // the read thread can outlive the python object, so it only gets a
+    // weak_ptr to us
+    weak_ptr<Board> weakSelf(shared_from_this());
+    link->setRealTimePositionCallback(
+        [weakSelf](const unsigned char *data, size_t length) {
+          if (shared_ptr<Board> self = weakSelf.lock()) {
+            self->positionReported(data, length);
+          }
+        });
+    link->setReconnectCallback([weakSelf]() {
+      if (shared_ptr<Board> self = weakSelf.lock()) {
+        self->boardReconnected();
+      }
+    });
+
+    link->switchRealTimeMode();
+    cout << "Connect attempted." << endl;
   }
 
-  // return the fen
-  return currentFen;
-}
+  /**
+   * disconnect from the chessboard over usb
+   */
+  void disconnect() {
+    shared_ptr<ChessLink> link = getLink();
+    if (link == nullptr) {
+      cerr << "chesslink is not connected." << endl;
+      return;
+    }
+    // make sure we are in upload mode
+    link->switchUploadMode();
+    // and shut the door
+    link->disconnect();
+  }
 
-/**
- * set an led on the chess board.
- * @param x, y: integers in the 0 - 7 range
- * @param LEDsetting: boolean of the desired setting of the led
- */
-void setLED(int x, int y, bool LEDsetting) {
-  // if we have not connected throw error and return
-  if (chessLink == nullptr) {
-    cerr << "bChessLink is nullptr. Are you sure you are connected to board?"
-         << endl;
-    return;
+  /**
+   * turn off all the lights on the chessboard. The chessboard will be in
+   * upload mode after the function is called
+   */
+  void lightsOut() {
+    shared_ptr<ChessLink> link = getLink();
+    if (link == nullptr) {
+      cerr << "chesslink is not connected." << endl;
+      return;
+    }
+
+    // turn off all the lights
+    link->setLed({
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+        bitset<8>("00000000"), //
+    });
   }
-  if (x > 7 || x < 0) {
-    cerr << "x must be 0 - 7, x is: " << x << endl;
-    return;
+
+  /**
+   * get the current fen of the board
+   * @return the current fen oy the position on the board
+   */
+  string getFEN() {
+    // if we have not connected throw error and return
+    if (getConnectedLink() == nullptr) {
+      return "ERROR: no connection.";
+    }
+
+    lock_guard<mutex> lock(fenMutex);
+    // make the fen once for each new position
+    if (currentFen.empty() && !currentPosition.empty()) {
+      // toFen wants the whole report, header and all
+      string report = "\x01\x24" + currentPosition;
+      currentFen = ChessLink::toFen(
+          reinterpret_cast<const unsigned char *>(report.data()),
+          report.size());
+    }
+    return currentFen;
   }
-  if (y > 7 || y < 0) {
-    cerr << "y must be 0 - 7, y is: " << y << endl;
-    return;
+
+  /**
+   * get the current position of the board as the board sends it. 32 bytes,
+   * two squares a byte, the low nibble first. Byte 0 is h8 and g8, byte 31 is
+   * b1 and a1
+   * @return the packed position, empty if the board has not sent one
+   */
+  string getPosition() {
+    // if we have not connected throw error and return
+    if (getConnectedLink() == nullptr) {
+      return "";
+    }
+
+    lock_guard<mutex> lock(fenMutex);
+    return currentPosition;
   }
 
-  chessLink->setLed((uint8_t)x, (uint8_t)y, LEDsetting);
-}
+  /**
+   * get when the read thread got the current position
+   * @return ns on the steady clock, 0 if there is no position yet
+   */
+  long long getLastChangeNs() {
+    lock_guard<mutex> lock(fenMutex);
+    return lastChangeNs;
+  }
 
-/**
- * set all the led's given std::string's of all the rows
- */
-void setAllLEDs(const std::string rank1, const std::string rank2,
-                const std::string rank3, const std::string rank4,
-                const std::string rank5, const std::string rank6,
-                const std::string rank7, const std::string rank8) {
-
-  chessLink->setLed({
-      bitset<8>(rank8), //
-      bitset<8>(rank7), //
-      bitset<8>(rank6), //
-      bitset<8>(rank5), //
-      bitset<8>(rank4), //
-      bitset<8>(rank3), //
-      bitset<8>(rank2), //
-      bitset<8>(rank1), //
-  });
-}
+  /**
+   * get how many times the read thread has reconnected to the board. It
+   * reconnects on it's own when the board is unplugged and plugged back in
+   */
+  unsigned long getReconnectCount() {
+    lock_guard<mutex> lock(fenMutex);
+    return reconnectCount;
+  }
+
+  /**
+   * block until the board reports a position other than the one it had at
+   * sequence number seq, or until timeoutMs has passed.
+   * @param seq: the last sequence number the caller has seen
+   * @param timeoutMs: how long to wait for a change, in milliseconds
+   * @return the current sequence number, it is == seq if we timed out
+   */
+  unsigned long waitForChange(unsigned long seq, unsigned int timeoutMs) {
+    unique_lock<mutex> lock(fenMutex);
+    fenChanged.wait_for(lock, chrono::milliseconds(timeoutMs),
+                        [this, seq] { return fenSeq != seq; });
+    return fenSeq;
+  }
+
+  /**
+   * set an led on the chess board.
+   * @param x, y: integers in the 0 - 7 range
+   * @param LEDsetting: boolean of the desired setting of the led
+   */
+  void setLED(int x, int y, bool LEDsetting) {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return;
+    }
+    if (x > 7 || x < 0) {
+      cerr << "x must be 0 - 7, x is: " << x << endl;
+      return;
+    }
+    if (y > 7 || y < 0) {
+      cerr << "y must be 0 - 7, y is: " << y << endl;
+      return;
+    }
+
+    link->setLed((uint8_t)x, (uint8_t)y, LEDsetting);
+  }
+
+  /**
+   * set all the led's given std::string's of all the rows
+   */
+  void setAllLEDs(const std::string rank1, const std::string rank2,
+                  const std::string rank3, const std::string rank4,
+                  const std::string rank5, const std::string rank6,
+                  const std::string rank7, const std::string rank8) {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return;
+    }
+
+    link->setLed({
+        bitset<8>(rank8), //
+        bitset<8>(rank7), //
+        bitset<8>(rank6), //
+        bitset<8>(rank5), //
+        bitset<8>(rank4), //
+        bitset<8>(rank3), //
+        bitset<8>(rank2), //
+        bitset<8>(rank1), //
+    });
+  }
+
+  /**
+   * set all the led's from a packed frame of 8 bytes, one for each rank
+   * starting at rank 8. In each byte the a file is the high bit.
+   * @param frame: the 8 byte frame
+   */
+  void setAllLEDsPacked(const std::string &frame) {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return;
+    }
+    if (frame.size() != 8) {
+      cerr << "a led frame must be 8 bytes, got: " << frame.size() << endl;
+      return;
+    }
+
+    link->setLed({
+        bitset<8>(static_cast<unsigned char>(frame[0])), //
+        bitset<8>(static_cast<unsigned char>(frame[1])), //
+        bitset<8>(static_cast<unsigned char>(frame[2])), //
+        bitset<8>(static_cast<unsigned char>(frame[3])), //
+        bitset<8>(static_cast<unsigned char>(frame[4])), //
+        bitset<8>(static_cast<unsigned char>(frame[5])), //
+        bitset<8>(static_cast<unsigned char>(frame[6])), //
+        bitset<8>(static_cast<unsigned char>(frame[7])), //
+    });
+  }
+
+  /**
+   * signal game over via board LED's
+   */
+  void gameoverLights() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return;
+    }
+    lightsOut();
+    // turn off all the lights
+    link->setLed({
+        bitset<8>("11111111"), //
+        bitset<8>("10000001"), //
+        bitset<8>("10111101"), //
+        bitset<8>("10100101"), //
+        bitset<8>("10100101"), //
+        bitset<8>("10111101"), //
+        bitset<8>("10000001"), //
+        bitset<8>("11111111"), //
+    });
+  }
+
+  /**
+   * get the board to beep, switches to uploadMode and leaves the board in
+   * realTimeMode
+   */
+  void beep() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return;
+    }
+    // do the thing
+    link->beep();
+  }
+
+  /**
+   * get the battery level of the board
+   * @return the battery level in percent, 0 if it did not answer
+   */
+  unsigned int getBattery() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return 0;
+    }
+    return link->getBattery();
+  }
+
+  /**
+   * get the version of the board's mcu firmware
+   * @return the version, empty if it did not answer
+   */
+  string getMcuVersion() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return "";
+    }
+    return link->getMcuVersion();
+  }
+
+  /**
+   * get the version of the board's bluetooth firmware
+   * @return the version, empty if it did not answer
+   */
+  string getBleVersion() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return "";
+    }
+    return link->getBleVersion();
+  }
+
+  /**
+   * get how many games the board has stored
+   * @return the number of games, 0 if it did not answer
+   */
+  unsigned int getFileCount() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return 0;
+    }
+    return link->getFileCount();
+  }
+
+  /**
+   * start streaming the oldest game stored on the board. The board is left in
+   * upload mode
+   * @return true if there is a game and it was asked for, false otherwise
+   */
+  bool startFile() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return false;
+    }
+    return link->startFile();
+  }
+
+  /**
+   * wait for the next fen of the game being streamed
+   * @param fen: set to the fen if there is one
+   * @param timeoutMs: how long to wait for it, in milliseconds
+   * @return 1 if there is a fen, 0 if the game has ended, -1 if we timed out
+   */
+  int nextFilePosition(string &fen, unsigned int timeoutMs) {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return -1;
+    }
+    return link->nextFilePosition(fen, chrono::milliseconds(timeoutMs));
+  }
+
+  /**
+   * delete the game that was last streamed from the board
+   * @return true if success, false otherwise
+   */
+  bool deleteFile() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return false;
+    }
+    return link->deleteFile();
+  }
+
+  /**
+   * switch the board to upload mode
+   * @return true if success, false otherwise
+   */
+  bool uploadMode() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return false;
+    }
+    return link->switchUploadMode();
+  }
+
+  /**
+   * switch the board to real time mode
+   * @return true if success, false otherwise
+   */
+  bool realtimeMode() {
+    // if we have not connected throw error and return
+    shared_ptr<ChessLink> link = getConnectedLink();
+    if (link == nullptr) {
+      return false;
+    }
+    return link->switchRealTimeMode();
+  }
+};
+
+// the board the module functions use, the first board found
+shared_ptr<Board> defaultBoard = make_shared<Board>();
 
 /**
- * signal game over via board LED's
+ * the python side of Board::nextFilePosition
+ * @return the next fen as a str, None if the game has ended
+ * @throws TimeoutError if no fen came in timeoutMs
  */
-void gameoverLights() {
-  lightsOut();
-  // turn off all the lights
-  chessLink->setLed({
-      bitset<8>("11111111"), //
-      bitset<8>("10000001"), //
-      bitset<8>("10111101"), //
-      bitset<8>("10100101"), //
-      bitset<8>("10100101"), //
-      bitset<8>("10111101"), //
-      bitset<8>("10000001"), //
-      bitset<8>("11111111"), //
-  });
+py::object nextFilePosition(Board &board, unsigned int timeoutMs) {
+  string fen;
+  int got;
+  {
+    // release the python GIL while we wait on the board
+    py::gil_scoped_release release;
+    got = board.nextFilePosition(fen, timeoutMs);
+  }
+  if (got < 0) {
+    PyErr_SetString(PyExc_TimeoutError,
+                    "timed out waiting for a position of a stored game");
+    throw py::error_already_set();
+  }
+  if (got == 0) {
+    return py::none();
+  }
+  return py::str(fen);
 }
+
 /**
- * get the board to beep, switches to uploadMode and leaves the board in
- * realTimeMode
+ * list the hid paths of every chessboard plugged in
  */
-void beep() {
-  // if we have not connected throw error and return
-  if (chessLink == nullptr) {
-    cerr << "bChessLink is nullptr. Are you sure you are connected to board?"
-         << endl;
-    return;
-  }
-  // do the thing
-  chessLink->beep();
-}
+vector<string> listDevices() { return ChessHidConnect::listDevice(); }
 
 int main() {
   /* connect to the board */
-  connect();
-  chessLink->ChessLink::setLed((uint8_t)4, (uint8_t)4, true);
+  defaultBoard->connect();
+  defaultBoard->setLED(4, 4, true);
 
   while (true) {
-    cout << getFEN();
+    cout << defaultBoard->getFEN();
     this_thread::sleep_for(chrono::seconds(2));
   }
 }
@@ -199,42 +569,189 @@ int main() {
 PYBIND11_MODULE(_niclink, m) {
   m.doc() = "A passthrough between the C++ Chessnut EasyLink SDK and python";
 
+  // every call that talks to the board, or may wait on a lock, releases the
+  // python GIL. LED writes can block for up to 200 ms, and other python
+  // threads should not wait on them
+  using release_gil = py::call_guard<py::gil_scoped_release>;
+
+  m.def("list_devices", &listDevices, release_gil(),
+        "List the hid paths of every chessboard plugged in. [[ () ]]");
+
+  // one chessboard of many. It has the same calls as the module, which use
+  // the first board found
+  py::class_<Board, shared_ptr<Board>>(m, "Board")
+      .def(py::init<const string &>(), py::arg("path") = "",
+           "A chessboard, by it's hid path from list_devices(). An empty "
+           "path is the first board found.")
+      .def_property_readonly("path", &Board::getPath)
+      .def("connect", &Board::connect, release_gil())
+      .def("disconnect", &Board::disconnect, release_gil())
+      .def("upload_mode", &Board::uploadMode, release_gil())
+      .def("realtime_mode", &Board::realtimeMode, release_gil())
+      .def("set_led", &Board::setLED, release_gil())
+      .def("set_all_leds", &Board::setAllLEDs, release_gil())
+      .def("set_all_leds",
+           [](Board &board, py::bytes frame) -> void {
+             std::string packed = frame;
+             // release the python GIL
+             py::gil_scoped_release release;
+             board.setAllLEDsPacked(packed);
+           })
+      .def("lights_out", &Board::lightsOut, release_gil())
+      .def("gameover_lights", &Board::gameoverLights, release_gil())
+      .def("beep", &Board::beep, release_gil())
+      .def("get_fen", &Board::getFEN, release_gil())
+      .def("get_position",
+           [](Board &board) -> py::bytes {
+             std::string position;
+             {
+               // release the python GIL while we wait on the position lock
+               py::gil_scoped_release release;
+               position = board.getPosition();
+             }
+             return py::bytes(position);
+           })
+      .def("last_change_ns", &Board::getLastChangeNs, release_gil())
+      .def("reconnect_count", &Board::getReconnectCount, release_gil())
+      .def("get_battery", &Board::getBattery, release_gil())
+      .def("get_mcu_version", &Board::getMcuVersion, release_gil())
+      .def("get_ble_version", &Board::getBleVersion, release_gil())
+      .def("get_file_count", &Board::getFileCount, release_gil())
+      .def("start_file", &Board::startFile, release_gil())
+      .def("next_file_position", &nextFilePosition)
+      .def("delete_file", &Board::deleteFile, release_gil())
+      .def("wait_for_change", &Board::waitForChange, release_gil());
+
   // connect with a redirected out to py
   /* =======================================
    * connect does not return the chess ptr, but stores it in the cpp memory.
    * This should be called before any other functions that use chess ptr.
    * ======================================*/
-  m.def("connect", &connect,
-        "connect to chess board device with hid even if the device is not "
-        "connected,\nit will automatically connect when the device is plugged "
-        "into the computer");
-  m.def("disconnect", &disconnect, "disconnect from the chessboard.");
+  m.def(
+      "connect", []() { defaultBoard->connect(); }, release_gil(),
+      "connect to chess board device with hid even if the device is not "
+      "connected,\nit will automatically connect when the device is plugged "
+      "into the computer");
+  m.def(
+      "disconnect", []() { defaultBoard->disconnect(); }, release_gil(),
+      "disconnect from the chessboard.");
 
   // switch modes
-  m.def("upload_mode", &ChessLink::switchUploadMode,
-        py::return_value_policy::copy, "Switch to upload mode. [[ () ]]");
-  m.def("realtime_mode", &ChessLink::switchRealTimeMode,
-        py::return_value_policy::copy, "Switch to realtime mode. [[ () ]]");
+  m.def(
+      "upload_mode", []() { return defaultBoard->uploadMode(); },
+      release_gil(), "Switch to upload mode. [[ () ]]");
+  m.def(
+      "realtime_mode", []() { return defaultBoard->realtimeMode(); },
+      release_gil(), "Switch to realtime mode. [[ () ]]");
   // doers
   m.def(
       "set_led",
-      [](int x, int y, bool LEDsetting) -> void {
-        // release the python GIL
-        py::gil_scoped_release release;
-        setLED(x, y, LEDsetting);
+      [](int x, int y, bool LEDsetting) {
+        defaultBoard->setLED(x, y, LEDsetting);
       },
+      release_gil(),
       "Set a LED on the chessboard. [[ void setLED(int x, int y, bool "
       "LEDsetting)]]");
-  m.def("set_all_leds", &setAllLEDs,
-        "Set all LEDs on chessboad via str array. [[ void setAllLEDs(const "
-        "std::string row8, const std::string row7, const std::string row6, "
-        "const std::string row5, const std::string row4, const char row3, "
-        "const std::string row2, const std::string row1)]]");
-  m.def("lights_out", &lightsOut, "turn of all the lights [[ () ]]");
-  m.def("gameover_lights", &gameoverLights,
-        "show a game over lightshow. [[ () ]]");
-  m.def("beep", &beep, "Cause the chessboard to beep. [[ () ]]");
+  m.def(
+      "set_all_leds",
+      [](const std::string rank1, const std::string rank2,
+         const std::string rank3, const std::string rank4,
+         const std::string rank5, const std::string rank6,
+         const std::string rank7, const std::string rank8) {
+        defaultBoard->setAllLEDs(rank1, rank2, rank3, rank4, rank5, rank6,
+                                 rank7, rank8);
+      },
+      release_gil(),
+      "Set all LEDs on chessboad via str array. [[ void setAllLEDs(const "
+      "std::string row8, const std::string row7, const std::string row6, "
+      "const std::string row5, const std::string row4, const char row3, "
+      "const std::string row2, const std::string row1)]]");
+  m.def(
+      "set_all_leds",
+      [](py::bytes frame) -> void {
+        std::string packed = frame;
+        // release the python GIL
+        py::gil_scoped_release release;
+        defaultBoard->setAllLEDsPacked(packed);
+      },
+      "Set all LEDs on chessboard via a packed frame of 8 bytes, rank 8 "
+      "first, the a file is the high bit of each. [[ void "
+      "setAllLEDsPacked(const std::string &frame) ]]");
+  m.def(
+      "lights_out", []() { defaultBoard->lightsOut(); }, release_gil(),
+      "turn of all the lights [[ () ]]");
+  m.def(
+      "gameover_lights", []() { defaultBoard->gameoverLights(); },
+      release_gil(), "show a game over lightshow. [[ () ]]");
+  m.def(
+      "beep", []() { defaultBoard->beep(); }, release_gil(),
+      "Cause the chessboard to beep. [[ () ]]");
   // getters
-  m.def("get_fen", &getFEN, py::return_value_policy::copy,
-        "Get the FEN for the chessboard's cur position. [[ () ]]");
+  m.def(
+      "get_fen", []() { return defaultBoard->getFEN(); }, release_gil(),
+      "Get the FEN for the chessboard's cur position. [[ () ]]");
+  m.def(
+      "get_position",
+      []() -> py::bytes {
+        std::string position;
+        {
+          // release the python GIL while we wait on the position lock
+          py::gil_scoped_release release;
+          position = defaultBoard->getPosition();
+        }
+        return py::bytes(position);
+      },
+      "Get the position on the chessboard as the 32 packed bytes the board "
+      "sends, two squares a byte. [[ () ]]");
+  m.def(
+      "last_change_ns", []() { return defaultBoard->getLastChangeNs(); },
+      release_gil(),
+      "Get when the board's current position was read, in ns on the clock "
+      "of time.monotonic_ns(). [[ () ]]");
+  // each of these waits on an answer from the board, for up to a second
+  m.def(
+      "get_battery", []() { return defaultBoard->getBattery(); },
+      release_gil(), "Get the battery level in percent. [[ () ]]");
+  m.def(
+      "get_mcu_version", []() { return defaultBoard->getMcuVersion(); },
+      release_gil(), "Get the version of the mcu firmware. [[ () ]]");
+  m.def(
+      "get_ble_version", []() { return defaultBoard->getBleVersion(); },
+      release_gil(), "Get the version of the bluetooth firmware. [[ () ]]");
+  m.def(
+      "get_file_count", []() { return defaultBoard->getFileCount(); },
+      release_gil(), "Get how many games the board has stored. [[ () ]]");
+  // streaming the games stored on the board
+  m.def(
+      "start_file", []() { return defaultBoard->startFile(); }, release_gil(),
+      "Start streaming the oldest game stored on the board, the board is left "
+      "in upload mode. Returns false if there is none. [[ () ]]");
+  m.def(
+      "next_file_position",
+      [](unsigned int timeoutMs) {
+        return nextFilePosition(*defaultBoard, timeoutMs);
+      },
+      "Wait for the next fen of the stored game being streamed. Returns None "
+      "when the game has ended, raises TimeoutError if none comes in "
+      "timeout_ms. [[ (unsigned int timeoutMs) ]]");
+  m.def(
+      "delete_file", []() { return defaultBoard->deleteFile(); },
+      release_gil(),
+      "Delete the stored game that was last streamed, so the next can be "
+      "got. [[ () ]]");
+  m.def(
+      "reconnect_count", []() { return defaultBoard->getReconnectCount(); },
+      release_gil(),
+      "Get how many times the board has been reconnected to after it went "
+      "away. A reconnect also wakes wait_for_change. [[ () ]]");
+  m.def(
+      "wait_for_change",
+      [](unsigned long seq, unsigned int timeoutMs) {
+        return defaultBoard->waitForChange(seq, timeoutMs);
+      },
+      release_gil(),
+      "Block until the board position changes from the one at sequence "
+      "number seq, or timeout_ms passes. Returns the current sequence number. "
+      "[[ unsigned long waitForChange(unsigned long seq, unsigned int "
+      "timeoutMs) ]]");
 }